@@ -0,0 +1,214 @@
+"""series schema: the tables and columns added since the baseline
+
+Only additions: new tables (print queue, KOT/invoice counters, KDS event feed,
+sync snapshot/compaction, idempotency keys, running stock balances) and
+nullable columns on existing tables (order running totals, branch code,
+invoice numbering overrides, stock_move.branch_id, sync_event scope).
+Indexes on the existing big tables are built online by 0003; the new columns
+are filled by 0004.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17 02:17:00.507270
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('idempotency_key',
+    sa.Column('device_id', sa.String(length=80), nullable=False),
+    sa.Column('key', sa.String(length=120), nullable=False),
+    sa.Column('endpoint', sa.String(length=200), nullable=False),
+    sa.Column('request_hash', sa.String(length=64), nullable=True),
+    sa.Column('status_code', sa.Integer(), nullable=False),
+    sa.Column('response', sa.Text(), nullable=False),
+    sa.Column('expires_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('deleted_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('device_id', 'key')
+    )
+    with op.batch_alter_table('idempotency_key', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_idempotency_key_expires_at'), ['expires_at'], unique=False)
+
+    op.create_table('invoice_sequence',
+    sa.Column('branch_id', sa.String(length=36), nullable=False),
+    sa.Column('period', sa.String(length=20), nullable=False),
+    sa.Column('last_no', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('deleted_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('branch_id', 'period')
+    )
+    op.create_table('kitchen_ticket_event',
+    sa.Column('seq', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('station_id', sa.String(length=60), nullable=False),
+    sa.Column('ticket_id', sa.String(length=36), nullable=False),
+    sa.Column('type', sa.String(length=20), nullable=False),
+    sa.Column('payload', sa.Text(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('deleted_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('seq')
+    )
+    with op.batch_alter_table('kitchen_ticket_event', schema=None) as batch_op:
+        batch_op.create_index('ix_kitchen_ticket_event_station_seq', ['station_id', 'seq'], unique=False)
+
+    op.create_table('kot_sequence',
+    sa.Column('branch_id', sa.String(length=36), nullable=False),
+    sa.Column('station_id', sa.String(length=60), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('last_no', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('deleted_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('branch_id', 'station_id', 'day')
+    )
+    op.create_table('sync_compaction',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('watermark', sa.Integer(), nullable=False),
+    sa.Column('pruned_through', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('deleted_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('sync_snapshot',
+    sa.Column('entity', sa.String(length=60), nullable=False),
+    sa.Column('entity_id', sa.String(length=36), nullable=False),
+    sa.Column('seq', sa.Integer(), nullable=False),
+    sa.Column('op', sa.String(length=10), nullable=False),
+    sa.Column('payload', sa.Text(), nullable=True),
+    sa.Column('device_id', sa.String(length=36), nullable=True),
+    sa.Column('tenant_id', sa.String(length=36), nullable=True),
+    sa.Column('branch_id', sa.String(length=36), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('deleted_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('entity', 'entity_id')
+    )
+    with op.batch_alter_table('sync_snapshot', schema=None) as batch_op:
+        batch_op.create_index('ix_sync_snapshot_tenant_seq', ['tenant_id', 'seq'], unique=False)
+
+    op.create_table('ingredient_balance',
+    sa.Column('ingredient_id', sa.String(length=36), nullable=False),
+    sa.Column('branch_id', sa.String(length=36), nullable=False),
+    sa.Column('tenant_id', sa.String(length=36), nullable=False),
+    sa.Column('qty', sa.Numeric(precision=12, scale=3), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('deleted_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['ingredient_id'], ['ingredient.id'], ),
+    sa.PrimaryKeyConstraint('ingredient_id', 'branch_id')
+    )
+    op.create_table('print_job',
+    sa.Column('tenant_id', sa.String(length=36), nullable=True),
+    sa.Column('branch_id', sa.String(length=36), nullable=True),
+    sa.Column('printer_id', sa.String(length=36), nullable=False),
+    sa.Column('kind', sa.String(length=20), nullable=False),
+    sa.Column('ref_id', sa.String(length=36), nullable=True),
+    sa.Column('payload', sa.Text(), nullable=False),
+    sa.Column('status', sa.Enum('QUEUED', 'SENDING', 'DONE', 'DEAD', name='printjobstatus'), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('next_attempt_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('last_error', sa.Text(), nullable=True),
+    sa.Column('printed_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('id', sa.String(length=36), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('deleted_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['printer_id'], ['printer.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('print_job', schema=None) as batch_op:
+        batch_op.create_index('ix_print_job_due', ['status', 'next_attempt_at'], unique=False)
+        batch_op.create_index('ix_print_job_ref', ['ref_id'], unique=False)
+
+    with op.batch_alter_table('order', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('subtotal', sa.Numeric(precision=14, scale=4), nullable=True))
+        batch_op.add_column(sa.Column('tax_total', sa.Numeric(precision=14, scale=4), nullable=True))
+        batch_op.add_column(sa.Column('service_charge', sa.Numeric(precision=12, scale=2), nullable=True))
+        batch_op.add_column(sa.Column('packing_charge', sa.Numeric(precision=12, scale=2), nullable=True))
+        batch_op.add_column(sa.Column('round_off', sa.Numeric(precision=12, scale=2), nullable=True))
+        batch_op.add_column(sa.Column('grand_total', sa.Numeric(precision=12, scale=2), nullable=True))
+        batch_op.add_column(sa.Column('paid_total', sa.Numeric(precision=12, scale=2), nullable=True))
+
+    with op.batch_alter_table('branch', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('code', sa.String(length=12), nullable=True))
+        batch_op.create_unique_constraint('uq_branch_code', ['code'])
+
+    with op.batch_alter_table('restaurant_settings', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('invoice_no_format', sa.String(length=60), nullable=True))
+        batch_op.add_column(sa.Column('invoice_seq_reset', sa.String(length=10), nullable=True))
+
+    with op.batch_alter_table('stock_move', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('branch_id', sa.String(length=36), nullable=True))
+
+    with op.batch_alter_table('sync_event', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('tenant_id', sa.String(length=36), nullable=True))
+        batch_op.add_column(sa.Column('branch_id', sa.String(length=36), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('sync_event', schema=None) as batch_op:
+        batch_op.drop_column('branch_id')
+        batch_op.drop_column('tenant_id')
+
+    with op.batch_alter_table('stock_move', schema=None) as batch_op:
+        batch_op.drop_column('branch_id')
+
+    with op.batch_alter_table('restaurant_settings', schema=None) as batch_op:
+        batch_op.drop_column('invoice_seq_reset')
+        batch_op.drop_column('invoice_no_format')
+
+    with op.batch_alter_table('branch', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_branch_code', type_='unique')
+        batch_op.drop_column('code')
+
+    with op.batch_alter_table('order', schema=None) as batch_op:
+        batch_op.drop_column('paid_total')
+        batch_op.drop_column('grand_total')
+        batch_op.drop_column('round_off')
+        batch_op.drop_column('packing_charge')
+        batch_op.drop_column('service_charge')
+        batch_op.drop_column('tax_total')
+        batch_op.drop_column('subtotal')
+
+    with op.batch_alter_table('print_job', schema=None) as batch_op:
+        batch_op.drop_index('ix_print_job_ref')
+        batch_op.drop_index('ix_print_job_due')
+
+    op.drop_table('print_job')
+    op.drop_table('ingredient_balance')
+    with op.batch_alter_table('sync_snapshot', schema=None) as batch_op:
+        batch_op.drop_index('ix_sync_snapshot_tenant_seq')
+
+    op.drop_table('sync_snapshot')
+    op.drop_table('sync_compaction')
+    op.drop_table('kot_sequence')
+    with op.batch_alter_table('kitchen_ticket_event', schema=None) as batch_op:
+        batch_op.drop_index('ix_kitchen_ticket_event_station_seq')
+
+    op.drop_table('kitchen_ticket_event')
+    op.drop_table('invoice_sequence')
+    with op.batch_alter_table('idempotency_key', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_idempotency_key_expires_at'))
+
+    op.drop_table('idempotency_key')
+    if op.get_bind().dialect.name == "postgresql":
+        op.execute("DROP TYPE IF EXISTS printjobstatus")
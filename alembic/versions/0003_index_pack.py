@@ -0,0 +1,58 @@
+"""index pack: foreign keys and hot filter columns
+
+Postgres does not index foreign keys by itself; order detail, billing, the
+KDS board and the daily sales report were scanning order_item, payment,
+kitchen_ticket(_item) and order. The order list keysets and the sync pull
+scope index (added with 0002's columns) are built here too. On Postgres the
+indexes are built with CREATE INDEX CONCURRENTLY (outside a transaction), so
+writes to the big tables are not blocked while they build; IF NOT EXISTS
+makes a re-run after an interrupted build safe. 0004's backfills rely on
+the foreign key indexes.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17 02:02:55.842572
+"""
+from app.migrations import create_index_concurrently, drop_index_concurrently
+
+
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+# (name, table, columns, partial-index predicate)
+INDEXES = [
+    ('ix_user_mobile', 'user', ['mobile'], None),
+    ('ix_menu_category_branch_live', 'menu_category', ['tenant_id', 'branch_id', 'position'], 'deleted_at IS NULL'),
+    ('ix_menu_item_category', 'menu_item', ['category_id'], None),
+    ('ix_item_variant_item_live', 'item_variant', ['item_id'], 'deleted_at IS NULL'),
+    ('ix_modifier_group', 'modifier', ['group_id'], None),
+    ('ix_order_opened_keyset', 'order', ['opened_at', 'order_no', 'id'], None),
+    ('ix_order_branch_opened_keyset', 'order', ['branch_id', 'opened_at', 'order_no', 'id'], None),
+    ('ix_order_branch_status_opened_keyset', 'order', ['branch_id', 'status', 'opened_at', 'order_no', 'id'], None),
+    ('ix_order_branch_status_closed', 'order', ['branch_id', 'status', 'closed_at'], 'closed_at IS NOT NULL'),
+    ('ix_order_item_order', 'order_item', ['order_id'], None),
+    ('ix_order_item_modifier_line', 'order_item_modifier', ['order_item_id'], None),
+    ('ix_kitchen_ticket_order_station', 'kitchen_ticket', ['order_id', 'target_station'], None),
+    ('ix_kitchen_ticket_station_created', 'kitchen_ticket', ['target_station', 'created_at'], None),
+    ('ix_kitchen_ticket_item_ticket', 'kitchen_ticket_item', ['ticket_id'], None),
+    ('ix_payment_order', 'payment', ['order_id'], None),
+    ('ix_invoice_order', 'invoice', ['order_id'], None),
+    ('ix_sync_event_tenant_seq', 'sync_event', ['tenant_id', 'seq'], None),
+    ('ix_sync_event_entity', 'sync_event', ['entity', 'entity_id', 'seq'], None),
+    ('ix_stock_move_ingredient_created', 'stock_move', ['ingredient_id', 'created_at'], None),
+    ('ix_stock_move_created', 'stock_move', ['created_at'], None),
+    ('ix_online_order_provider_ref', 'online_order', ['provider', 'provider_order_id'], None),
+    ('ix_online_order_order', 'online_order', ['order_id'], None),
+]
+
+
+def upgrade() -> None:
+    for name, table, columns, predicate in INDEXES:
+        create_index_concurrently(name, table, columns, where=predicate)
+
+
+def downgrade() -> None:
+    for name, table, _, _ in reversed(INDEXES):
+        drop_index_concurrently(name, table)
@@ -0,0 +1,202 @@
+"""series backfill: fill the columns and tables 0002 added from existing rows
+
+- order running totals (subtotal .. grand_total, paid_total), same formulas
+  as app.services.billing, so upgraded orders skip the lazy recompute
+- stock_move.branch_id for sale moves, from their order
+- ingredient_balance: a tenant-wide row per ingredient and a row per
+  branch that moved it, qty = SUM(stock_move.qty_change)
+- report_daily_sales: provider NULL -> "", a row for every (day, branch,
+  channel, provider) with closed orders, and every row recounted from the
+  orders, since closing/voiding now only adds deltas to an existing row
+- invoice_sequence: the per-branch day counters for today (and yesterday,
+  for deploys around midnight) start after the last invoice numbered by the
+  old INV-YYYYMMDD-NNNN scheme, which counted across all branches
+- sync_event.tenant_id, on a single-tenant install: /sync serves only the
+  caller's tenant, and older events were pushed without one (with several
+  tenants there is no telling whose they were, so they stay unserved)
+
+Every step is a batched_backfill (committed per batch) whose WHERE stops
+matching once a row is done, or a recount that is safe to repeat, so an
+interrupted upgrade resumes here.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17 02:40:12.118204
+"""
+from datetime import datetime, timedelta, timezone
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.migrations import batched_backfill
+
+
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+
+# ── order running totals ─────────────────────────────────────────────────────
+
+# billing._settings: the first settings row, GST-inclusive when there is none
+_INCLUSIVE = "COALESCE((SELECT rs.gst_inclusive_default FROM restaurant_settings rs LIMIT 1), TRUE)"
+_BASE = "(oi.qty * oi.unit_price - COALESCE(oi.line_discount, 0))"
+_RATE = "COALESCE(oi.gst_rate, 0)"
+# billing._line_amounts, 4dp per line
+_TAXABLE = f"CASE WHEN {_INCLUSIVE} THEN ROUND(CAST({_BASE} / (1 + {_RATE} / 100.0) AS NUMERIC), 4) ELSE ROUND(CAST({_BASE} AS NUMERIC), 4) END"
+_TAX = (
+    f"CASE WHEN {_INCLUSIVE} THEN ROUND(CAST({_BASE} - ROUND(CAST({_BASE} / (1 + {_RATE} / 100.0) AS NUMERIC), 4) AS NUMERIC), 4) "
+    f"ELSE ROUND(CAST({_BASE} * {_RATE} / 100.0 AS NUMERIC), 4) END"
+)
+
+
+def _line_sum(expr: str) -> str:
+    return f'(SELECT COALESCE(SUM({expr}), 0) FROM order_item oi WHERE oi.order_id = "order".id AND oi.deleted_at IS NULL)'
+
+
+def _charge(kind: str) -> str:
+    """billing._charges: service / packing charge from the first settings row."""
+    mode = f"(SELECT rs.{kind}_charge_mode FROM restaurant_settings rs LIMIT 1)"
+    value = f"(SELECT rs.{kind}_charge_value FROM restaurant_settings rs LIMIT 1)"
+    return f"COALESCE(CASE {mode} WHEN 'PERCENT' THEN subtotal * {value} / 100.0 WHEN 'FLAT' THEN {value} END, 0)"
+
+
+def _backfill_order_totals() -> None:
+    batched_backfill(
+        "order",
+        f"subtotal = {_line_sum(_TAXABLE)}, tax_total = {_line_sum(_TAX)}, "
+        'paid_total = (SELECT COALESCE(SUM(p.amount), 0) FROM payment p WHERE p.order_id = "order".id)',
+        where="subtotal IS NULL",
+    )
+    # charges and the rounded bill, from the subtotal/tax just stored
+    gross = f"(subtotal + tax_total + {_charge('service')} + {_charge('packing')})"
+    batched_backfill(
+        "order",
+        f"service_charge = ROUND(CAST({_charge('service')} AS NUMERIC), 2), "
+        f"packing_charge = ROUND(CAST({_charge('packing')} AS NUMERIC), 2), "
+        f"grand_total = ROUND(CAST({gross} AS NUMERIC), 0), "
+        f"round_off = ROUND(CAST(ROUND(CAST({gross} AS NUMERIC), 0) - {gross} AS NUMERIC), 2)",
+        where="grand_total IS NULL AND subtotal IS NOT NULL",
+    )
+
+
+# ── stock ────────────────────────────────────────────────────────────────────
+
+def _backfill_stock() -> None:
+    batched_backfill(
+        "stock_move",
+        'branch_id = (SELECT o.branch_id FROM "order" o WHERE o.id = stock_move.ref_order_id)',
+        where="branch_id IS NULL AND ref_order_id IS NOT NULL",
+    )
+    # the (ingredient, branch) keys stock.record_moves keeps, at qty 0
+    op.execute(sa.text(
+        "INSERT INTO ingredient_balance (ingredient_id, branch_id, tenant_id, qty, created_at, updated_at, version) "
+        "SELECT k.ingredient_id, k.branch_id, i.tenant_id, 0, :now, :now, 1 "
+        "FROM (SELECT id AS ingredient_id, '' AS branch_id FROM ingredient "
+        "      UNION SELECT DISTINCT ingredient_id, branch_id FROM stock_move WHERE branch_id IS NOT NULL) k "
+        "JOIN ingredient i ON i.id = k.ingredient_id "
+        "WHERE NOT EXISTS (SELECT 1 FROM ingredient_balance b WHERE b.ingredient_id = k.ingredient_id AND b.branch_id = k.branch_id)"
+    ).bindparams(now=datetime.now(timezone.utc)))
+    batched_backfill(
+        "ingredient_balance",
+        "qty = (SELECT COALESCE(SUM(m.qty_change), 0) FROM stock_move m WHERE m.ingredient_id = ingredient_balance.ingredient_id "
+        "AND (ingredient_balance.branch_id = '' OR m.branch_id = ingredient_balance.branch_id))",
+        key="ingredient_id",
+    )
+
+
+# ── daily sales ──────────────────────────────────────────────────────────────
+
+def _day(col: str) -> str:
+    """reports._order_key: the UTC date of closed_at."""
+    if op.get_bind().dialect.name == "postgresql":
+        return f"CAST({col} AT TIME ZONE 'UTC' AS DATE)"
+    return f"date({col})"
+
+
+def _uuid() -> str:
+    if op.get_bind().dialect.name == "postgresql":
+        return "CAST(gen_random_uuid() AS VARCHAR)"
+    return ("lower(hex(randomblob(4)) || '-' || hex(randomblob(2)) || '-' || hex(randomblob(2)) || '-' "
+            "|| hex(randomblob(2)) || '-' || hex(randomblob(6)))")
+
+
+def _backfill_daily_sales() -> None:
+    closed = "o.status = 'CLOSED' AND o.closed_at IS NOT NULL"
+    channel, provider = "CAST(o.channel AS VARCHAR(20))", "COALESCE(CAST(o.provider AS VARCHAR(20)), '')"
+
+    # rows written before provider was normalised to ""
+    batched_backfill("report_daily_sales", "provider = ''", where="provider IS NULL")
+
+    # buckets no refresh ever wrote: the running counters need a row to add to
+    op.execute(sa.text(
+        "INSERT INTO report_daily_sales (id, date, tenant_id, branch_id, channel, provider, "
+        "orders_count, gross, tax, cgst, sgst, igst, discounts, net, created_at, updated_at, version) "
+        f"SELECT {_uuid()}, {_day('o.closed_at')}, MAX(o.tenant_id), o.branch_id, {channel}, {provider}, "
+        "0, 0, 0, 0, 0, 0, 0, 0, :now, :now, 1 "
+        f'FROM "order" o WHERE {closed} '
+        f"GROUP BY {_day('o.closed_at')}, o.branch_id, {channel}, {provider} "
+        f"HAVING NOT EXISTS (SELECT 1 FROM report_daily_sales r WHERE r.date = {_day('o.closed_at')} "
+        f"AND r.branch_id = o.branch_id AND r.channel = {channel} AND r.provider = {provider})"
+    ).bindparams(now=datetime.now(timezone.utc)))
+
+    # reports.aggregate_daily_sales, per row
+    match = (
+        f"{closed} AND o.branch_id = report_daily_sales.branch_id AND {_day('o.closed_at')} = report_daily_sales.date "
+        f"AND {channel} = report_daily_sales.channel AND {provider} = report_daily_sales.provider"
+    )
+
+    def orders(expr: str) -> str:
+        return f'(SELECT COALESCE(SUM({expr}), 0) FROM "order" o WHERE {match})'
+
+    def lines(col: str) -> str:
+        return f'(SELECT COALESCE(SUM(oi.{col}), 0) FROM order_item oi JOIN "order" o ON o.id = oi.order_id WHERE {match} AND oi.deleted_at IS NULL)'
+
+    batched_backfill(
+        "report_daily_sales",
+        f'orders_count = (SELECT COUNT(*) FROM "order" o WHERE {match}), '
+        f"gross = {orders('ROUND(o.subtotal, 2)')}, net = {orders('ROUND(o.grand_total, 2)')}, "
+        f"cgst = {lines('cgst')}, sgst = {lines('sgst')}, igst = {lines('igst')}, "
+        f"tax = {lines('cgst')} + {lines('sgst')} + {lines('igst')}, discounts = 0",
+    )
+
+
+# ── invoice counters ─────────────────────────────────────────────────────────
+
+def _seed_invoice_sequence() -> None:
+    now = datetime.now(timezone.utc)
+    legacy = (
+        "SELECT substr(invoice_no, 5, 8) AS period, MAX(CAST(substr(invoice_no, 14) AS INTEGER)) AS last_no "
+        "FROM invoice WHERE invoice_no LIKE 'INV-________-%' AND substr(invoice_no, 5, 8) >= :since "
+        "GROUP BY substr(invoice_no, 5, 8)"
+    )
+    op.execute(sa.text(
+        "INSERT INTO invoice_sequence (branch_id, period, last_no, created_at, updated_at, version) "
+        f"SELECT b.id, s.period, s.last_no, :now, :now, 1 FROM branch b CROSS JOIN ({legacy}) s "
+        "WHERE NOT EXISTS (SELECT 1 FROM invoice_sequence q WHERE q.branch_id = b.id AND q.period = s.period)"
+    ).bindparams(now=now, since=(now - timedelta(days=1)).strftime("%Y%m%d")))
+
+
+# ── sync scope ───────────────────────────────────────────────────────────────
+
+def _backfill_sync_tenant() -> None:
+    batched_backfill(
+        "sync_event",
+        "tenant_id = (SELECT id FROM tenant)",
+        where="tenant_id IS NULL AND (SELECT COUNT(*) FROM tenant) = 1",
+        key="seq",
+    )
+
+
+def upgrade() -> None:
+    _backfill_order_totals()
+    _backfill_stock()
+    _backfill_daily_sales()
+    _seed_invoice_sequence()
+    _backfill_sync_tenant()
+
+
+def downgrade() -> None:
+    # the filled columns and tables go with 0002's downgrade
+    pass
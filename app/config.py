@@ -6,5 +6,56 @@ class Settings(BaseSettings):
     JWT_ISS: str = "waah"
     JWT_EXP_MIN: int = 12*60
     TZ: str = "UTC"
+    # per-process permission cache used by require_perm (0 disables)
+    PERM_CACHE_TTL_S: int = 60
+    PERM_CACHE_SIZE: int = 4096
+    # GET /menu/snapshot: how long a cached ETag is trusted before re-checking the DB,
+    # and how many branches' snapshots each process keeps
+    MENU_SNAPSHOT_TTL_S: int = 30
+    MENU_SNAPSHOT_CACHE_SIZE: int = 256
+    # invoice numbering (RestaurantSettings can override per branch)
+    # invoice_no is unique across branches, so a format needs {branch} (Branch.code, or the id's first 8 chars)
+    INVOICE_NO_FORMAT: str = "INV-{branch}-{date:%Y%m%d}-{seq:04d}"  # also {fy}, e.g. "INV/{branch}/{fy}/{seq:05d}"
+    INVOICE_SEQ_RESET: str = "DAY"  # DAY | FY
+    FISCAL_YEAR_START_MONTH: int = 4  # April (India)
+    # POST /sync/push: max ops accepted per request, rows per INSERT statement
+    SYNC_PUSH_MAX_OPS: int = 100_000
+    SYNC_PUSH_BATCH_SIZE: int = 1000
+    # GET /sync/pull?wait=: longest a long-poll is held open
+    SYNC_PULL_MAX_WAIT_S: int = 60
+    # sync compaction: only events older than this are folded into the snapshot
+    # (lets in-flight pushes with lower seqs commit first)
+    SYNC_COMPACT_LAG_S: int = 60
+    # checkpoints not advanced for this long no longer hold back pruning;
+    # those devices get 410 on pull and must bootstrap again
+    SYNC_DEVICE_STALE_DAYS: int = 30
+    # events younger than this are never pruned, acknowledged or not: a client
+    # that pulls without device_id has no checkpoint, and is safe from 410 as
+    # long as it pulls at least this often
+    SYNC_RETAIN_DAYS: int = 30
+    # Idempotency-Key: how long a stored response is replayed
+    IDEMPOTENCY_TTL_S: int = 24*3600
+    # KDS feed: events kept for Last-Event-ID resume, SSE keep-alive interval
+    KDS_EVENT_RETENTION_H: int = 48
+    KDS_HEARTBEAT_S: int = 15
+    # print queue: background dispatcher (off in processes that only serve reads/tests),
+    # agent timeout, jobs in flight per printer (across workers), retries before dead-letter
+    PRINT_DISPATCHER_ENABLED: bool = True
+    PRINT_AGENT_TIMEOUT_S: float = 5.0
+    PRINT_MAX_INFLIGHT_PER_PRINTER: int = 1
+    PRINT_MAX_ATTEMPTS: int = 8
+    PRINT_BACKOFF_BASE_S: float = 1.0
+    PRINT_BACKOFF_MAX_S: float = 300.0
+    # auto-KOT: lines for the same ticket within this window print as one KOT;
+    # station -> printer routing cache
+    KOT_DEBOUNCE_S: float = 2.0
+    KOT_ROUTE_CACHE_TTL_S: int = 60
+    # SQL profiling (opt-in): log statements at or over this many ms (0 = off);
+    # requests sending X-SQL-Profile: <SQL_PROFILE_TOKEN> get their query breakdown back
+    SQL_SLOW_QUERY_MS: int = 0
+    SQL_PROFILE_TOKEN: str = ""
+    # schema: workers only check the Alembic revision at boot; with AUTO_MIGRATE they
+    # migrate to head themselves (single-process installs: the SQLite device, dev, tests)
+    AUTO_MIGRATE: bool = False
     model_config = SettingsConfigDict(env_file=".env", extra="ignore")
 settings = Settings()
@@ -8,6 +8,17 @@ class Base(DeclarativeBase):
 engine = create_engine(settings.DB_URL, pool_pre_ping=True, echo=False)
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
 
+def dialect_insert(db):
+    """`insert` construct with ON CONFLICT support for the session's backend (Postgres/SQLite)."""
+    name = db.get_bind().dialect.name
+    if name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise NotImplementedError(f"upsert not supported on {name}")
+    return insert
+
 def get_db():
     db = SessionLocal()
     try:
@@ -15,4 +26,5 @@ def get_db():
     finally:
         db.close()
 
-# Dev auto-create now happens in app.main startup to avoid circular imports.
+# The schema is managed by Alembic (app.migrations); app.main only checks the
+# revision at startup.
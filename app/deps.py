@@ -1,10 +1,14 @@
-from fastapi import Depends, HTTPException, status
+from collections import OrderedDict
+import threading
+import time
+from fastapi import Depends, Header, HTTPException, Request, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 import jwt
 from sqlalchemy.orm import Session
 from app.config import settings
 from app.db import get_db
 from app.models.core import User, Role, RolePermission, Permission, UserRole
+from app.services.idempotency import Idempotency, begin as begin_idempotent, body_hash
 
 auth_scheme = HTTPBearer(auto_error=False)
 
@@ -20,40 +24,116 @@ def require_auth(creds: HTTPAuthorizationCredentials | None = Depends(auth_schem
     except Exception:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
 
+class _PermCache:
+    """
+    Per-process cache of each user's effective permissions: (is_admin, codes).
+    Entries expire after `ttl` seconds and the least recently used ones are
+    evicted beyond `maxsize`. RBAC writes call invalidate_permissions();
+    other workers catch up within the TTL.
+    """
+
+    def __init__(self, ttl: float, maxsize: int):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._rows: OrderedDict[str, tuple[float, bool, frozenset[str]]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._gen = 0  # bumped on invalidation so in-flight loads don't resurrect stale data
+
+    def get(self, user_id: str) -> tuple[bool, frozenset[str]] | None:
+        with self._lock:
+            row = self._rows.get(user_id)
+            if row is None:
+                return None
+            if row[0] < time.monotonic():
+                del self._rows[user_id]
+                return None
+            self._rows.move_to_end(user_id)
+            return row[1], row[2]
+
+    def generation(self) -> int:
+        return self._gen
+
+    def put(self, user_id: str, gen: int, is_admin: bool, codes: frozenset[str]) -> None:
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            if gen != self._gen:
+                return
+            self._rows[user_id] = (time.monotonic() + self.ttl, is_admin, codes)
+            self._rows.move_to_end(user_id)
+            while len(self._rows) > self.maxsize:
+                self._rows.popitem(last=False)
+
+    def invalidate(self, user_id: str | None = None) -> None:
+        with self._lock:
+            self._gen += 1
+            if user_id is None:
+                self._rows.clear()
+            else:
+                self._rows.pop(user_id, None)
+
+
+_perm_cache = _PermCache(ttl=settings.PERM_CACHE_TTL_S, maxsize=settings.PERM_CACHE_SIZE)
+
+
+def invalidate_permissions(user_id: str | None = None) -> None:
+    """Drop cached permissions for one user, or everyone (role-level changes)."""
+    _perm_cache.invalidate(user_id)
+
+
+def effective_permissions(db: Session, user_id: str) -> tuple[bool, frozenset[str]]:
+    """(has ADMIN role, permission codes) for the user, one join on a cache miss."""
+    hit = _perm_cache.get(user_id)
+    if hit is not None:
+        return hit
+    gen = _perm_cache.generation()
+    rows = (
+        db.query(Role.code, Permission.code)
+          .select_from(UserRole)
+          .join(Role, Role.id == UserRole.role_id)
+          .outerjoin(RolePermission, RolePermission.role_id == Role.id)
+          .outerjoin(Permission, Permission.id == RolePermission.permission_id)
+          .filter(UserRole.user_id == user_id)
+          .all()
+    )
+    is_admin = any(role_code == "ADMIN" for role_code, _ in rows)
+    codes = frozenset(perm_code for _, perm_code in rows if perm_code)
+    _perm_cache.put(user_id, gen, is_admin, codes)
+    return is_admin, codes
+
 def _user_permissions(db: Session, user_id: str) -> set[str]:
-    q = (db.query(Permission.code)
-         .join(RolePermission, RolePermission.permission_id == Permission.id)
-         .join(Role, Role.id == RolePermission.role_id)
-         .join(UserRole, UserRole.role_id == Role.id)
-         .filter(UserRole.user_id == user_id))
-    return {row[0] for row in q.all()}
+    return set(effective_permissions(db, user_id)[1])
 
 def has_perm(db: Session, user_id: str, code: str) -> bool:
-    return code in _user_permissions(db, user_id)
+    return code in effective_permissions(db, user_id)[1]
 
 def require_perm(code: str):
     def _dep(sub: str = Depends(require_auth), db: Session = Depends(get_db)):
+        is_admin, user_perms = effective_permissions(db, sub)
         # Admin shortcut: user has a role named ADMIN → allow
-        has_admin = (
-            db.query(Role)
-              .join(UserRole, UserRole.role_id == Role.id)
-              .filter(UserRole.user_id == sub, Role.code == "ADMIN")
-              .first()
-        )
-        if has_admin:
+        if is_admin:
             return sub
-
-        # Gather user’s permissions via (UserRole → Role → RolePermission → Permission)
-        q = (
-            db.query(Permission.code)
-              .join(RolePermission, RolePermission.permission_id == Permission.id)
-              .join(Role, Role.id == RolePermission.role_id)
-              .join(UserRole, UserRole.role_id == Role.id)
-              .filter(UserRole.user_id == sub)
-        )
-        user_perms = {row[0] for row in q.all()}
-
         if code not in user_perms:
             raise HTTPException(status_code=403, detail=f"Missing permission: {code}")
         return sub
     return _dep
+
+async def request_body_hash(request: Request) -> str:
+    """SHA-256 of the raw request body (Starlette caches it for the endpoint)."""
+    return body_hash(await request.body())
+
+def idempotent(
+    request: Request,
+    digest: str = Depends(request_body_hash),
+    db: Session = Depends(get_db),
+    sub: str = Depends(require_auth),
+    key: str | None = Header(default=None, alias="Idempotency-Key"),
+    device_id: str | None = Header(default=None, alias="X-Device-Id"),
+) -> Idempotency:
+    """
+    Idempotency-Key support for a mutation: replays the stored response on a
+    retry (raises IdempotentReplay), otherwise the endpoint calls .save(db, result)
+    before committing. Keys are scoped to X-Device-Id, or to the user without one;
+    reusing a key with a different body is a 422.
+    """
+    return begin_idempotent(db, device_id or f"user:{sub}", key, f"{request.method} {request.url.path}", digest)
@@ -4,11 +4,16 @@
 # app/schemas/__init__.py, app/util/__init__.py — can be empty files.
 
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 
-from app.middleware import RequestIdMiddleware
-from app.db import Base, engine
+from app.middleware import GZipMiddleware, RequestIdMiddleware
 from app.config import settings
+from app.migrations import check_schema
+from app.services.idempotency import IdempotentReplay, replay_handler
+from app.services.hub import hub
+from app.services.printq import dispatcher as print_dispatcher
+from app.services.metrics import registry as metrics_registry
 
 # Routers (keep existing)
 from app.routers import onboard, auth, dining, menu, orders, sync, kot, admin, users, customers
@@ -21,11 +26,31 @@ from app.routers import inventory, shift, printjob, online
 app = FastAPI(title="Waah API", version="0.3.0")
 
 @app.on_event("startup")
-def init_db():
-    Base.metadata.create_all(bind=engine)
+def schema_check():
+    check_schema()  # migrations run before the workers start (python -m app.migrations)
+
+@app.on_event("startup")
+def start_hub():
+    hub.start()  # LISTEN for other workers' notifications (Postgres only)
+
+@app.on_event("shutdown")
+def stop_hub():
+    hub.stop()
+
+@app.on_event("startup")
+async def start_print_dispatcher():
+    if settings.PRINT_DISPATCHER_ENABLED:
+        await print_dispatcher.start()
+
+@app.on_event("shutdown")
+async def stop_print_dispatcher():
+    await print_dispatcher.stop()
+
+app.add_exception_handler(IdempotentReplay, replay_handler)
 
 # Middlewares
 app.add_middleware(RequestIdMiddleware)
+app.add_middleware(GZipMiddleware, minimum_size=1024)  # /sync/pull, /menu/snapshot over 4G; not SSE
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -57,3 +82,8 @@ app.include_router(customers.router)
 @app.get("/healthz")
 def healthz():
     return {"ok": True}
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    # Prometheus text exposition; per worker process
+    return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4")
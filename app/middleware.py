@@ -1,10 +1,77 @@
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.requests import Request
+"""
+Request id and timing as a plain ASGI middleware (no BaseHTTPMiddleware:
+no extra task per request, and streaming responses pass straight through).
+
+Adds X-Request-ID (taken from the request when present) and Server-Timing
+(app and DB time so far) to every HTTP response, and hands the finished
+RequestTiming (route template, status, duration, SQL count/time) to the
+listeners in app.services.timing. Opt-in SQL profiling: app.services.sqlprof.
+
+GZipMiddleware is Starlette's, except that text/event-stream responses pass
+through untouched: gzip would buffer the KDS feed's frames inside the
+compressor, so screens would see them late, in bursts.
+"""
 import uuid
 
-class RequestIdMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        req_id = request.headers.get("X-Request-ID") or str(uuid.uuid4())
-        response = await call_next(request)
-        response.headers["X-Request-ID"] = req_id
-        return response
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.middleware.gzip import GZipMiddleware as _GZipMiddleware, GZipResponder
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.services import sqlprof, timing
+
+
+class RequestIdMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        req_headers = Headers(scope=scope)
+        req_id = req_headers.get("x-request-id") or str(uuid.uuid4())
+        scope.setdefault("state", {})["request_id"] = req_id
+        t = timing.RequestTiming(request_id=req_id, method=scope["method"], path=scope["path"], scope=scope)
+        if sqlprof.enabled_for(req_headers.get(sqlprof.HEADER)):
+            t.statements = []
+        token = timing.begin(t)
+
+        async def send_with_headers(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                t.status = message["status"]
+                headers = MutableHeaders(scope=message)
+                headers.append("X-Request-ID", req_id)
+                headers.append("Server-Timing", t.server_timing())
+                if t.statements is not None:
+                    headers.append(sqlprof.HEADER, sqlprof.header_value(t.statements))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_headers)
+        except Exception:
+            if t.status is None:
+                t.status = 500
+            raise
+        finally:
+            t.route = t.route_template()
+            timing.end(t, token)
+
+
+class _SSEPassthroughResponder(GZipResponder):
+    async def send_with_gzip(self, message: Message) -> None:
+        await super().send_with_gzip(message)
+        if message["type"] == "http.response.start":
+            content_type = Headers(raw=message["headers"]).get("content-type", "")
+            if content_type.startswith("text/event-stream"):
+                # same path as an already-encoded body: sent as is, chunk by chunk
+                self.content_encoding_set = True
+
+
+class GZipMiddleware(_GZipMiddleware):
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http" and "gzip" in Headers(scope=scope).get("Accept-Encoding", ""):
+            responder = _SSEPassthroughResponder(self.app, self.minimum_size, compresslevel=self.compresslevel)
+            await responder(scope, receive, send)
+            return
+        await self.app(scope, receive, send)
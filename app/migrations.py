@@ -0,0 +1,200 @@
+"""
+Schema migrations (Alembic; revisions in alembic/versions) and the boot check.
+
+Migrations run once per deploy, before the new code serves traffic:
+
+    python -m app.migrations        # what the container runs before uvicorn
+    alembic upgrade head            # same, by hand (no lock, no legacy stamping)
+
+Workers do not touch the schema. At startup each one reads the database's
+revision (one SELECT) and refuses to start if it is older than the code's
+head. A revision the code does not know is accepted with a warning: during a
+rolling restart the old workers run against the next release's schema, which
+is why migrations only ever add (columns, indexes, tables) and remove in a
+later release. With AUTO_MIGRATE (single-process installs: the SQLite device,
+dev, tests) the worker upgrades to head itself instead.
+
+Upgrades hold a Postgres advisory lock, so containers starting together run
+the migrations once; the others wait and find the schema current. A database
+built by the old create_all startup hook (tables, no alembic_version) is
+stamped at the baseline and upgraded from there.
+
+Revision scripts use the online helpers at the bottom for big tables:
+create_index_concurrently() and batched_backfill().
+"""
+import logging
+import time
+from pathlib import Path
+
+from alembic import command, op
+from alembic.config import Config
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from alembic.util.exc import CommandError
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection, Engine
+
+from app.config import settings
+
+log = logging.getLogger(__name__)
+
+ROOT = Path(__file__).resolve().parent.parent
+# the schema create_all used to build; legacy databases are stamped here
+BASELINE = "0001"
+# pg_advisory_lock key held while migrating ("waahmigr")
+_LOCK_KEY = 0x7761616D69677200
+
+
+def config(connection: Connection | None = None) -> Config:
+    cfg = Config(str(ROOT / "alembic.ini"))
+    cfg.set_main_option("script_location", str(ROOT / "alembic"))
+    if connection is not None:
+        cfg.attributes["connection"] = connection  # env.py migrates on it
+        cfg.attributes["configure_logger"] = False  # keep the app's logging setup
+    return cfg
+
+
+def head() -> str:
+    return ScriptDirectory.from_config(config()).get_current_head()
+
+
+def current(conn: Connection) -> str | None:
+    return MigrationContext.configure(conn).get_current_revision()
+
+
+def _known(rev: str) -> bool:
+    try:
+        return ScriptDirectory.from_config(config()).get_revision(rev) is not None
+    except CommandError:
+        return False
+
+
+def upgrade(bind: Engine | None = None) -> str:
+    """Migrate to head (stamping a create_all database first). Returns the new revision."""
+    bind = bind or _engine()
+    with bind.connect() as conn:
+        locked = conn.dialect.name == "postgresql"
+        if locked:
+            conn.execute(text("SELECT pg_advisory_lock(:k)"), {"k": _LOCK_KEY})
+            conn.commit()
+        try:
+            cfg = config(conn)
+            legacy = current(conn) is None and inspect(conn).has_table("order")
+            conn.commit()  # alembic runs its own transactions (and autocommit blocks) on it
+            if legacy:
+                log.warning("schema has no revision (built by create_all); stamping %s", BASELINE)
+                command.stamp(cfg, BASELINE)
+            command.upgrade(cfg, "head")
+            rev = current(conn)
+            conn.commit()
+        finally:
+            if locked:
+                conn.rollback()
+                conn.execute(text("SELECT pg_advisory_unlock(:k)"), {"k": _LOCK_KEY})
+                conn.commit()
+    return rev
+
+
+def check_schema(bind: Engine | None = None, auto_migrate: bool | None = None) -> None:
+    """Boot check: the database must be at (or past) the code's head revision."""
+    bind = bind or _engine()
+    auto_migrate = settings.AUTO_MIGRATE if auto_migrate is None else auto_migrate
+    with bind.connect() as conn:
+        rev = current(conn)
+    want = head()
+    if rev == want:
+        return
+    if auto_migrate:
+        log.info("schema at %s, migrating to %s (AUTO_MIGRATE)", rev, want)
+        upgrade(bind)
+        return
+    if rev is not None and not _known(rev):
+        log.warning("schema at %s, newer than this build (%s); continuing", rev, want)
+        return
+    raise RuntimeError(
+        f"database schema is at {rev or 'no revision'}, this build needs {want}: "
+        "run `python -m app.migrations` (or `alembic upgrade head`) first"
+    )
+
+
+def _engine() -> Engine:
+    from app.db import engine
+    return engine
+
+
+# ── online helpers for revision scripts ──────────────────────────────────────
+
+def _where(where: str | None) -> dict:
+    return {} if where is None else {"postgresql_where": text(where), "sqlite_where": text(where)}
+
+
+def create_index_concurrently(name: str, table: str, columns: list, where: str | None = None, unique: bool = False) -> None:
+    """
+    Build an index without blocking writes. On Postgres: CREATE INDEX
+    CONCURRENTLY, outside the migration's transaction; an invalid index left
+    by an interrupted build is dropped and rebuilt. Elsewhere a plain CREATE
+    INDEX. Existing indexes are left alone, so a re-run is safe.
+    """
+    if op.get_bind().dialect.name != "postgresql":
+        op.create_index(name, table, columns, unique=unique, if_not_exists=True, **_where(where))
+        return
+    with op.get_context().autocommit_block():
+        invalid = not op.get_context().as_sql and op.get_bind().execute(
+            text("SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid WHERE c.relname = :n AND NOT i.indisvalid"),
+            {"n": name},
+        ).first()
+        if invalid:
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
+        op.create_index(name, table, columns, unique=unique, postgresql_concurrently=True, if_not_exists=True, **_where(where))
+
+
+def drop_index_concurrently(name: str, table: str) -> None:
+    if op.get_bind().dialect.name != "postgresql":
+        op.drop_index(name, table_name=table, if_exists=True)
+        return
+    with op.get_context().autocommit_block():
+        op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
+
+
+def batched_backfill(
+    table: str, set_: str, where: str = "1 = 1", params: dict | None = None,
+    key: str = "id", batch_size: int = 5000, pause_s: float = 0.0,
+) -> int:
+    """
+    UPDATE table SET <set_> WHERE <where>, `batch_size` rows at a time in key
+    order, each batch committed on its own: row locks are held for one batch,
+    not the whole table, and an interrupted backfill resumes where `where`
+    still matches. `key` need not be unique (rows sharing the last key of a
+    batch go with it). `pause_s` between batches leaves room for live traffic.
+    Returns the rows updated.
+    """
+    bind = op.get_bind()
+    q = bind.dialect.identifier_preparer.quote
+    t, k = q(table), q(key)
+    if op.get_context().as_sql:
+        # `alembic upgrade --sql`: no rows to walk, emit the whole UPDATE
+        op.execute(text(f"UPDATE {t} SET {set_} WHERE {where}").bindparams(**(params or {})))
+        return 0
+
+    def after(lo) -> str:
+        return f"({where})" if lo is None else f"({where}) AND {k} > :lo"
+
+    total, lo = 0, None
+    with op.get_context().autocommit_block():
+        while True:
+            args = {**(params or {}), "lo": lo}
+            keys = bind.execute(text(f"SELECT {k} FROM {t} WHERE {after(lo)} ORDER BY {k} LIMIT {int(batch_size)}"), args).scalars().all()
+            if not keys:
+                break
+            hi = keys[-1]
+            total += bind.execute(text(f"UPDATE {t} SET {set_} WHERE {after(lo)} AND {k} <= :hi"), {**args, "hi": hi}).rowcount
+            lo = hi
+            log.info("backfill %s: %d rows", table, total)
+            if pause_s:
+                time.sleep(pause_s)
+    return total
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(name)s: %(message)s")
+    log.info("schema at %s", upgrade())
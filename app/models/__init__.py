@@ -2,13 +2,13 @@
 from .core import (  # noqa: F401
     # Enums
     OrderChannel, OrderStatus, PayMode, PrinterType, ChargeMode,
-    KOTStatus, StockMoveType, OnlineProvider, BackupProvider,
+    KOTStatus, PrintJobStatus, StockMoveType, OnlineProvider, BackupProvider,
 
     # Identity & RBAC
     Tenant, Branch, User, Role, Permission, RolePermission, UserRole,
 
     # Settings / printers / stations
-    RestaurantSettings, Printer, KitchenStation,
+    RestaurantSettings, Printer, KitchenStation, PrintJob,
 
     # Menu
     MenuCategory, MenuItem, ItemVariant, ModifierGroup, Modifier, ItemModifierGroup,
@@ -17,17 +17,17 @@ from .core import (  # noqa: F401
     DiningTable, Customer,
 
     # Orders / billing / KOT / tax
-    Order, OrderItem, OrderItemModifier, KitchenTicket, KitchenTicketItem,
-    Payment, Invoice, TaxRate,
+    Order, OrderItem, OrderItemModifier, KitchenTicket, KitchenTicketItem, KitchenTicketEvent,
+    Payment, Invoice, InvoiceSequence, KOTSequence, TaxRate,
 
     # Shifts & audit
     Shift, CashMovement, AuditLog,
 
     # Sync
-    SyncEvent, SyncCheckpoint,
+    SyncEvent, SyncCheckpoint, SyncSnapshot, SyncCompaction, IdempotencyKey,
 
     # Inventory
-    Ingredient, RecipeBOM, StockMove, Purchase, PurchaseLine,
+    Ingredient, RecipeBOM, StockMove, IngredientBalance, Purchase, PurchaseLine,
 
     # Online orders
     OnlineOrder,
@@ -43,13 +43,13 @@ from .core import (  # noqa: F401
 __all__ = [
     # Enums
     "OrderChannel", "OrderStatus", "PayMode", "PrinterType", "ChargeMode",
-    "KOTStatus", "StockMoveType", "OnlineProvider", "BackupProvider",
+    "KOTStatus", "PrintJobStatus", "StockMoveType", "OnlineProvider", "BackupProvider",
 
     # Identity & RBAC
     "Tenant", "Branch", "User", "Role", "Permission", "RolePermission", "UserRole",
 
     # Settings / printers / stations
-    "RestaurantSettings", "Printer", "KitchenStation",
+    "RestaurantSettings", "Printer", "KitchenStation", "PrintJob",
 
     # Menu
     "MenuCategory", "MenuItem", "ItemVariant", "ModifierGroup", "Modifier", "ItemModifierGroup",
@@ -58,17 +58,17 @@ __all__ = [
     "DiningTable", "Customer",
 
     # Orders / billing / KOT / tax
-    "Order", "OrderItem", "OrderItemModifier", "KitchenTicket", "KitchenTicketItem",
-    "Payment", "Invoice", "TaxRate",
+    "Order", "OrderItem", "OrderItemModifier", "KitchenTicket", "KitchenTicketItem", "KitchenTicketEvent",
+    "Payment", "Invoice", "InvoiceSequence", "KOTSequence", "TaxRate",
 
     # Shifts & audit
     "Shift", "CashMovement", "AuditLog",
 
     # Sync
-    "SyncEvent", "SyncCheckpoint",
+    "SyncEvent", "SyncCheckpoint", "SyncSnapshot", "SyncCompaction", "IdempotencyKey",
 
     # Inventory
-    "Ingredient", "RecipeBOM", "StockMove", "Purchase", "PurchaseLine",
+    "Ingredient", "RecipeBOM", "StockMove", "IngredientBalance", "Purchase", "PurchaseLine",
 
     # Online orders
     "OnlineOrder",
@@ -1,5 +1,5 @@
 from sqlalchemy import (
-    String, ForeignKey, Boolean, Numeric, Enum, Text, DateTime, Date, Integer, UniqueConstraint
+    String, ForeignKey, Boolean, Numeric, Enum, Text, DateTime, Date, Integer, UniqueConstraint, Index, text
 )
 from sqlalchemy.orm import Mapped, mapped_column
 from enum import Enum as PyEnum
@@ -7,6 +7,10 @@ from datetime import datetime
 from app.db import Base
 from app.models.common import IdMixin, TSMMixin
 
+def _partial(where: str) -> dict:
+    """Index kwargs for a partial index, same predicate on Postgres and SQLite."""
+    return {"postgresql_where": text(where), "sqlite_where": text(where)}
+
 # ── Enums ───────────────────────────────────────────────────────────────────
 class OrderChannel(PyEnum):
     DINE_IN = "DINE_IN"
@@ -45,6 +49,12 @@ class KOTStatus(PyEnum):
     DONE = "DONE"
     CANCELLED = "CANCELLED"
 
+class PrintJobStatus(PyEnum):
+    QUEUED = "QUEUED"    # waiting for its next attempt
+    SENDING = "SENDING"  # claimed by a dispatcher
+    DONE = "DONE"
+    DEAD = "DEAD"        # gave up; retry by hand
+
 class StockMoveType(PyEnum):
     PURCHASE = "PURCHASE"
     SALE = "SALE"
@@ -84,6 +94,10 @@ class Branch(Base, IdMixin, TSMMixin):
     address: Mapped[str | None] = mapped_column(Text)
     phone: Mapped[str | None] = mapped_column(String(20))
     state_code: Mapped[str | None] = mapped_column(String(2))  # e.g. "MH" for Maharashtra
+    code: Mapped[str | None] = mapped_column(String(12))  # short code for document numbers ({branch})
+    __table_args__ = (
+        UniqueConstraint("code", name="uq_branch_code"),
+    )
 
 class User(Base, IdMixin, TSMMixin):
     __tablename__ = "user"
@@ -94,6 +108,9 @@ class User(Base, IdMixin, TSMMixin):
     pass_hash: Mapped[str] = mapped_column(String(200))
     pin_hash: Mapped[str | None] = mapped_column(String(200))
     active: Mapped[bool] = mapped_column(Boolean, default=True)
+    __table_args__ = (
+        Index("ix_user_mobile", "mobile"),  # login
+    )
 
 class Role(Base, IdMixin, TSMMixin):
     __tablename__ = "role"
@@ -135,6 +152,26 @@ class KitchenStation(Base, IdMixin, TSMMixin):
     name: Mapped[str] = mapped_column(String(120))
     printer_id: Mapped[str | None] = mapped_column(String(36), ForeignKey("printer.id"))
 
+class PrintJob(Base, IdMixin, TSMMixin):
+    __tablename__ = "print_job"
+    # durable outbox for the print agent; sent by services.printq's dispatcher
+    tenant_id: Mapped[str | None] = mapped_column(String(36))
+    branch_id: Mapped[str | None] = mapped_column(String(36))
+    printer_id: Mapped[str] = mapped_column(String(36), ForeignKey("printer.id"))
+    kind: Mapped[str] = mapped_column(String(20))  # BILL / INVOICE / KOT / OPEN_DRAWER
+    ref_id: Mapped[str | None] = mapped_column(String(36))  # order / invoice / ticket
+    payload: Mapped[str] = mapped_column(Text)  # JSON body for the agent
+    status: Mapped[PrintJobStatus] = mapped_column(Enum(PrintJobStatus), default=PrintJobStatus.QUEUED)
+    attempts: Mapped[int] = mapped_column(Integer, default=0)
+    # QUEUED: not before; SENDING: lease expiry (a crashed dispatcher's job is picked up again)
+    next_attempt_at: Mapped[datetime] = mapped_column(DateTime(timezone=True))
+    last_error: Mapped[str | None] = mapped_column(Text)
+    printed_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
+    __table_args__ = (
+        Index("ix_print_job_due", "status", "next_attempt_at"),
+        Index("ix_print_job_ref", "ref_id"),
+    )
+
 # ── Settings ────────────────────────────────────────────────────────────────
 class RestaurantSettings(Base, IdMixin, TSMMixin):
     __tablename__ = "restaurant_settings"
@@ -154,6 +191,9 @@ class RestaurantSettings(Base, IdMixin, TSMMixin):
     packing_charge_value: Mapped[float] = mapped_column(Numeric(10, 2), default=0)
     billing_printer_id: Mapped[str | None] = mapped_column(String(36), ForeignKey("printer.id"))
     invoice_footer: Mapped[str | None] = mapped_column(String(200), default="Thank you!")  # footer text
+    # invoice numbering overrides (fall back to settings.INVOICE_NO_FORMAT / INVOICE_SEQ_RESET)
+    invoice_no_format: Mapped[str | None] = mapped_column(String(60))
+    invoice_seq_reset: Mapped[str | None] = mapped_column(String(10))  # DAY | FY
 
 # ── Menu ────────────────────────────────────────────────────────────────────
 class MenuCategory(Base, IdMixin, TSMMixin):
@@ -162,6 +202,9 @@ class MenuCategory(Base, IdMixin, TSMMixin):
     branch_id: Mapped[str] = mapped_column(String(36))
     name: Mapped[str] = mapped_column(String(120))
     position: Mapped[int] = mapped_column(default=0)
+    __table_args__ = (
+        Index("ix_menu_category_branch_live", "tenant_id", "branch_id", "position", **_partial("deleted_at IS NULL")),
+    )
 
 class MenuItem(Base, IdMixin, TSMMixin):
     __tablename__ = "menu_item"
@@ -176,6 +219,9 @@ class MenuItem(Base, IdMixin, TSMMixin):
     tax_inclusive: Mapped[bool] = mapped_column(Boolean, default=True)
     gst_rate: Mapped[float] = mapped_column(Numeric(5, 2), default=5.00)  # default GST%
     kitchen_station_id: Mapped[str | None] = mapped_column(String(36), ForeignKey("kitchen_station.id"))  # route KOT
+    __table_args__ = (
+        Index("ix_menu_item_category", "category_id"),  # also counts deleted items (snapshot ETag)
+    )
 
 class ItemVariant(Base, IdMixin, TSMMixin):
     __tablename__ = "item_variant"
@@ -184,6 +230,9 @@ class ItemVariant(Base, IdMixin, TSMMixin):
     mrp: Mapped[float | None] = mapped_column(Numeric(10, 2))
     base_price: Mapped[float] = mapped_column(Numeric(10, 2))
     is_default: Mapped[bool] = mapped_column(Boolean, default=False)
+    __table_args__ = (
+        Index("ix_item_variant_item_live", "item_id", **_partial("deleted_at IS NULL")),
+    )
 
 class ModifierGroup(Base, IdMixin, TSMMixin):
     __tablename__ = "modifier_group"
@@ -198,6 +247,9 @@ class Modifier(Base, IdMixin, TSMMixin):
     group_id: Mapped[str] = mapped_column(String(36), ForeignKey("modifier_group.id"))
     name: Mapped[str] = mapped_column(String(120))
     price_delta: Mapped[float] = mapped_column(Numeric(10, 2), default=0)
+    __table_args__ = (
+        Index("ix_modifier_group", "group_id"),
+    )
 
 class ItemModifierGroup(Base, TSMMixin):
     __tablename__ = "item_modifier_group"
@@ -245,6 +297,23 @@ class Order(Base, IdMixin, TSMMixin):
     note: Mapped[str | None] = mapped_column(Text)
     opened_at: Mapped[datetime | None]
     closed_at: Mapped[datetime | None]
+    # running bill totals, kept in step with the lines by app.services.billing
+    # (NULL = legacy order, seeded by a full recompute on first use)
+    subtotal: Mapped[float | None] = mapped_column(Numeric(14, 4))
+    tax_total: Mapped[float | None] = mapped_column(Numeric(14, 4))
+    service_charge: Mapped[float | None] = mapped_column(Numeric(12, 2))
+    packing_charge: Mapped[float | None] = mapped_column(Numeric(12, 2))
+    round_off: Mapped[float | None] = mapped_column(Numeric(12, 2))
+    grand_total: Mapped[float | None] = mapped_column(Numeric(12, 2))
+    paid_total: Mapped[float | None] = mapped_column(Numeric(12, 2))
+    __table_args__ = (
+        # keyset pagination for GET /orders: (opened_at, order_no, id) newest first
+        Index("ix_order_opened_keyset", "opened_at", "order_no", "id"),
+        Index("ix_order_branch_opened_keyset", "branch_id", "opened_at", "order_no", "id"),
+        Index("ix_order_branch_status_opened_keyset", "branch_id", "status", "opened_at", "order_no", "id"),
+        # daily sales: a branch's CLOSED orders by closed_at; open orders have no closed_at
+        Index("ix_order_branch_status_closed", "branch_id", "status", "closed_at", **_partial("closed_at IS NOT NULL")),
+    )
 
 class OrderItem(Base, IdMixin, TSMMixin):
     __tablename__ = "order_item"
@@ -260,6 +329,9 @@ class OrderItem(Base, IdMixin, TSMMixin):
     sgst: Mapped[float] = mapped_column(Numeric(10, 2), default=0)
     igst: Mapped[float] = mapped_column(Numeric(10, 2), default=0)
     taxable_value: Mapped[float] = mapped_column(Numeric(10, 2), default=0)
+    __table_args__ = (
+        Index("ix_order_item_order", "order_id"),
+    )
 
 class OrderItemModifier(Base, IdMixin, TSMMixin):
     __tablename__ = "order_item_modifier"
@@ -267,6 +339,9 @@ class OrderItemModifier(Base, IdMixin, TSMMixin):
     modifier_id: Mapped[str] = mapped_column(String(36), ForeignKey("modifier.id"))
     qty: Mapped[float] = mapped_column(default=1)
     price_delta: Mapped[float] = mapped_column(Numeric(10, 2), default=0)
+    __table_args__ = (
+        Index("ix_order_item_modifier_line", "order_item_id"),
+    )
 
 class KitchenTicket(Base, IdMixin, TSMMixin):
     __tablename__ = "kitchen_ticket"
@@ -277,6 +352,12 @@ class KitchenTicket(Base, IdMixin, TSMMixin):
     printed_at: Mapped[datetime | None]
     reprint_count: Mapped[int] = mapped_column(default=0)
     cancel_reason: Mapped[str | None] = mapped_column(Text)
+    __table_args__ = (
+        # the order's open ticket for a station (add item / batch)
+        Index("ix_kitchen_ticket_order_station", "order_id", "target_station"),
+        # KDS board: a station's tickets oldest first
+        Index("ix_kitchen_ticket_station_created", "target_station", "created_at"),
+    )
 
 class KitchenTicketItem(Base, IdMixin, TSMMixin):
     __tablename__ = "kitchen_ticket_item"
@@ -284,6 +365,21 @@ class KitchenTicketItem(Base, IdMixin, TSMMixin):
     order_item_id: Mapped[str] = mapped_column(String(36), ForeignKey("order_item.id"))
     qty: Mapped[float]
     note: Mapped[str | None] = mapped_column(Text)
+    __table_args__ = (
+        Index("ix_kitchen_ticket_item_ticket", "ticket_id"),
+    )
+
+class KitchenTicketEvent(Base, TSMMixin):
+    __tablename__ = "kitchen_ticket_event"
+    # per-station KDS feed; seq is the SSE event id clients resume from
+    seq: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    station_id: Mapped[str] = mapped_column(String(60))
+    ticket_id: Mapped[str] = mapped_column(String(36))
+    type: Mapped[str] = mapped_column(String(20))  # TICKET_CREATED / ITEM_ADDED / STATUS / CANCELLED
+    payload: Mapped[str] = mapped_column(Text)     # JSON
+    __table_args__ = (
+        Index("ix_kitchen_ticket_event_station_seq", "station_id", "seq"),
+    )
 
 class Payment(Base, IdMixin, TSMMixin):
     __tablename__ = "payment"
@@ -292,6 +388,9 @@ class Payment(Base, IdMixin, TSMMixin):
     amount: Mapped[float] = mapped_column(Numeric(10, 2))
     ref_no: Mapped[str | None] = mapped_column(String(120))
     paid_at: Mapped[datetime | None]
+    __table_args__ = (
+        Index("ix_payment_order", "order_id"),
+    )
 
 class Invoice(Base, IdMixin, TSMMixin):
     __tablename__ = "invoice"
@@ -302,6 +401,24 @@ class Invoice(Base, IdMixin, TSMMixin):
     round_off: Mapped[float] = mapped_column(Numeric(10, 2), default=0)
     reprint_count: Mapped[int] = mapped_column(default=0)
     cashier_user_id: Mapped[str | None] = mapped_column(String(36), ForeignKey("user.id"))  # for invoice print
+    __table_args__ = (
+        Index("ix_invoice_order", "order_id"),
+    )
+
+class InvoiceSequence(Base, TSMMixin):
+    __tablename__ = "invoice_sequence"
+    # one counter per branch and fiscal period ("20261017" for DAY, "FY2026" for FY)
+    branch_id: Mapped[str] = mapped_column(String(36), primary_key=True)
+    period: Mapped[str] = mapped_column(String(20), primary_key=True)
+    last_no: Mapped[int] = mapped_column(Integer, default=0)
+
+class KOTSequence(Base, TSMMixin):
+    __tablename__ = "kot_sequence"
+    # one counter per branch, station ("" for tickets without one) and business day
+    branch_id: Mapped[str] = mapped_column(String(36), primary_key=True)
+    station_id: Mapped[str] = mapped_column(String(60), primary_key=True)
+    day: Mapped[datetime] = mapped_column(Date, primary_key=True)
+    last_no: Mapped[int] = mapped_column(Integer, default=0)
 
 class TaxRate(Base, IdMixin, TSMMixin):
     __tablename__ = "tax_rate"
@@ -351,12 +468,53 @@ class SyncEvent(Base, TSMMixin):
     op: Mapped[str] = mapped_column(String(10))  # UPSERT/DELETE
     payload: Mapped[str | None] = mapped_column(Text)
     device_id: Mapped[str | None] = mapped_column(String(36))
+    # scope for /sync/pull: the pushing user's tenant (NULL only on events pushed
+    # before scoping, which are not served); branch NULL = every branch of the tenant
+    tenant_id: Mapped[str | None] = mapped_column(String(36))
+    branch_id: Mapped[str | None] = mapped_column(String(36))
+    __table_args__ = (
+        Index("ix_sync_event_tenant_seq", "tenant_id", "seq"),
+        Index("ix_sync_event_entity", "entity", "entity_id", "seq"),  # history of one record
+    )
 
 class SyncCheckpoint(Base, TSMMixin):
     __tablename__ = "sync_checkpoint"
     device_id: Mapped[str] = mapped_column(String(36), primary_key=True)
     last_seq: Mapped[int] = mapped_column(default=0)
 
+class SyncSnapshot(Base, TSMMixin):
+    __tablename__ = "sync_snapshot"
+    # latest event per entity up to SyncCompaction.watermark (deleted entities dropped)
+    entity: Mapped[str] = mapped_column(String(60), primary_key=True)
+    entity_id: Mapped[str] = mapped_column(String(36), primary_key=True)
+    seq: Mapped[int] = mapped_column(Integer)
+    op: Mapped[str] = mapped_column(String(10))
+    payload: Mapped[str | None] = mapped_column(Text)
+    device_id: Mapped[str | None] = mapped_column(String(36))
+    tenant_id: Mapped[str | None] = mapped_column(String(36))
+    branch_id: Mapped[str | None] = mapped_column(String(36))
+    __table_args__ = (
+        Index("ix_sync_snapshot_tenant_seq", "tenant_id", "seq"),
+    )
+
+class SyncCompaction(Base, TSMMixin):
+    __tablename__ = "sync_compaction"
+    # single row (id=1)
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    watermark: Mapped[int] = mapped_column(Integer, default=0)       # snapshot covers seq <= watermark
+    pruned_through: Mapped[int] = mapped_column(Integer, default=0)  # sync_event rows with seq <= this are gone
+
+class IdempotencyKey(Base, TSMMixin):
+    __tablename__ = "idempotency_key"
+    # stored response of a mutation, replayed when the device retries with the same key
+    device_id: Mapped[str] = mapped_column(String(80), primary_key=True)  # device id, or "user:<id>"
+    key: Mapped[str] = mapped_column(String(120), primary_key=True)
+    endpoint: Mapped[str] = mapped_column(String(200))  # "POST /orders/{id}/pay" as called
+    request_hash: Mapped[str | None] = mapped_column(String(64))  # sha256 of the request body
+    status_code: Mapped[int] = mapped_column(Integer, default=200)
+    response: Mapped[str] = mapped_column(Text)  # JSON
+    expires_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), index=True)
+
 # ── Inventory ───────────────────────────────────────────────────────────────
 class Ingredient(Base, IdMixin, TSMMixin):
     __tablename__ = "ingredient"
@@ -379,6 +537,19 @@ class StockMove(Base, IdMixin, TSMMixin):
     reason: Mapped[str | None] = mapped_column(Text)
     ref_order_id: Mapped[str | None] = mapped_column(String(36))
     ref_purchase_id: Mapped[str | None] = mapped_column(String(36))
+    branch_id: Mapped[str | None] = mapped_column(String(36))
+    __table_args__ = (
+        Index("ix_stock_move_ingredient_created", "ingredient_id", "created_at"),  # an ingredient's ledger
+        Index("ix_stock_move_created", "created_at"),  # date-range reports
+    )
+
+class IngredientBalance(Base, TSMMixin):
+    __tablename__ = "ingredient_balance"
+    # running SUM(stock_move.qty_change); branch_id "" is the tenant-wide total
+    ingredient_id: Mapped[str] = mapped_column(String(36), ForeignKey("ingredient.id"), primary_key=True)
+    branch_id: Mapped[str] = mapped_column(String(36), primary_key=True, default="")
+    tenant_id: Mapped[str] = mapped_column(String(36))
+    qty: Mapped[float] = mapped_column(Numeric(12, 3), default=0)
 
 class Purchase(Base, IdMixin, TSMMixin):
     __tablename__ = "purchase"
@@ -400,6 +571,10 @@ class OnlineOrder(Base, IdMixin, TSMMixin):
     provider_order_id: Mapped[str] = mapped_column(String(80))
     order_id: Mapped[str | None] = mapped_column(String(36), ForeignKey("order.id"))
     status: Mapped[str] = mapped_column(String(30), default="RECEIVED")
+    __table_args__ = (
+        Index("ix_online_order_provider_ref", "provider", "provider_order_id"),
+        Index("ix_online_order_order", "order_id"),
+    )
 
 # ── Backup config & runs (requirement #9) ───────────────────────────────────
 class BackupConfig(Base, IdMixin, TSMMixin):
@@ -1,20 +1,24 @@
 # app/routers/inventory.py
 from fastapi import APIRouter, Depends
+from sqlalchemy import and_, func, select
 from sqlalchemy.orm import Session
 from datetime import date
 from app.db import get_db
 from app.deps import require_auth, require_perm
 from app.models.core import (
-    Ingredient,
+    Branch, Ingredient, IngredientBalance,
     RecipeBOM, StockMove, StockMoveType, Purchase, PurchaseLine,  # keep existing imports used by other endpoints
     ReportStockSnapshot,  # NEW
 )
+from app.services.stock import ALL_BRANCHES, init_balance, rebuild_balances, record_moves
 
 router = APIRouter(prefix="/inventory", tags=["inventory"])
 
 @router.post("/ingredients")
 def add_ingredient(body: dict, db: Session = Depends(get_db), sub: str = Depends(require_perm("SETTINGS_EDIT"))):
-    i = Ingredient(**body); db.add(i); db.commit(); db.refresh(i)
+    i = Ingredient(**body); db.add(i); db.flush()
+    init_balance(db, i)
+    db.commit(); db.refresh(i)
     return {"id": i.id}
 
 @router.post("/recipe")
@@ -29,23 +33,44 @@ def set_recipe(body: dict, db: Session = Depends(get_db), sub: str = Depends(req
 def purchase(body: dict, db: Session = Depends(get_db), sub: str = Depends(require_perm("SETTINGS_EDIT"))):
     p = Purchase(tenant_id=body["tenant_id"], supplier=body.get("supplier"), note=body.get("note"))
     db.add(p); db.flush()
+    moves = []
     for l in body.get("lines", []):
         db.add(PurchaseLine(purchase_id=p.id, ingredient_id=l["ingredient_id"], qty=l["qty"], unit_cost=l["unit_cost"]))
-        db.add(StockMove(ingredient_id=l["ingredient_id"], type=StockMoveType.PURCHASE, qty_change=l["qty"], reason=f"Purchase {p.id}", ref_purchase_id=p.id))
+        moves.append(StockMove(ingredient_id=l["ingredient_id"], type=StockMoveType.PURCHASE, qty_change=l["qty"], reason=f"Purchase {p.id}", ref_purchase_id=p.id, branch_id=body.get("branch_id")))
+    db.add_all(moves)
+    record_moves(db, moves)
     db.commit(); db.refresh(p)
     return {"purchase_id": p.id}
 
 @router.get("/low_stock")
-def low_stock(db: Session = Depends(get_db), sub: str = Depends(require_auth)):
-    from sqlalchemy import func
-    sums = db.query(StockMove.ingredient_id, func.coalesce(func.sum(StockMove.qty_change),0)).group_by(StockMove.ingredient_id).all()
-    levels = {ing_id: float(qty) for ing_id, qty in sums}
-    res = []
-    for ing in db.query(Ingredient).all():
-        qty = levels.get(ing.id, 0.0)
-        if qty <= float(ing.min_level or 0):
-            res.append({"ingredient_id": ing.id, "name": ing.name, "qty": qty, "min_level": float(ing.min_level or 0)})
-    return res
+def low_stock(branch_id: str | None = None, db: Session = Depends(get_db), sub: str = Depends(require_auth)):
+    """
+    Ingredients at or below min_level, tenant-wide or for one branch (from the
+    running balances). For a branch, every ingredient of the branch's tenant is
+    checked; one the branch never moved has no row there and counts as 0.
+    """
+    qty = func.coalesce(IngredientBalance.qty, 0)
+    q = (
+        db.query(Ingredient.id, Ingredient.name, Ingredient.min_level, qty)
+        .outerjoin(IngredientBalance, and_(
+            IngredientBalance.ingredient_id == Ingredient.id,
+            IngredientBalance.branch_id == (branch_id or ALL_BRANCHES),
+        ))
+        .filter(qty - func.coalesce(Ingredient.min_level, 0) <= 0)
+    )
+    if branch_id:
+        q = q.filter(Ingredient.tenant_id == select(Branch.tenant_id).where(Branch.id == branch_id).scalar_subquery())
+    return [
+        {"ingredient_id": ing_id, "name": name, "qty": float(q_), "min_level": float(min_level or 0)}
+        for ing_id, name, min_level, q_ in q.all()
+    ]
+
+@router.post("/balances/rebuild")
+def rebuild_stock_balances(tenant_id: str | None = None, db: Session = Depends(get_db), sub: str = Depends(require_perm("MANAGER_APPROVE"))):
+    """Recompute the running balances from the stock ledger (repair / after upgrade)."""
+    n = rebuild_balances(db, tenant_id)
+    db.commit()
+    return {"rebuilt": True, "rows": n}
 
 # REPLACED: now reads precomputed snapshot instead of computing on-the-fly
 @router.get("/stock_report")
@@ -1,44 +1,55 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy import update
 from sqlalchemy.orm import Session
 from datetime import datetime, timezone
+import orjson
 
-from app.db import get_db
-from app.models.core import KitchenTicket, KitchenTicketItem, KOTStatus, AuditLog, KitchenStation, Printer
+from app.config import settings
+from app.db import SessionLocal, get_db
+from app.models.core import KitchenTicket, KitchenTicketItem, KOTStatus, AuditLog, MenuItem, Order, OrderItem
 from app.deps import require_auth, require_perm
-import httpx
+from app.schemas.kot import KOTStatusIn
+from app.services import kds, kot_print, printq
+from app.services.hub import hub
+from app.services.numbering import allocate_kot_no
 
 router = APIRouter(prefix="/kot", tags=["kot"]) 
 
 
 @router.post("/tickets")
-def create_ticket(order_id: str, ticket_no: int, target_station: str | None = None, db: Session = Depends(get_db), sub: str = Depends(require_auth)):
+def create_ticket(order_id: str, ticket_no: int | None = None, target_station: str | None = None, db: Session = Depends(get_db), sub: str = Depends(require_auth)):
+    """ticket_no defaults to the station's next number for today; pass one only to keep an external numbering."""
+    order = db.get(Order, order_id)
+    if not order:
+        raise HTTPException(404, detail="order not found")
+    if ticket_no is None:
+        ticket_no = allocate_kot_no(db, order.branch_id, target_station)
     t = KitchenTicket(order_id=order_id, ticket_no=ticket_no, target_station=target_station)
     db.add(t)
+    db.flush()
+    kds.record(db, [kds.event(t, kds.TICKET_CREATED, ticket_no=t.ticket_no, status=KOTStatus.NEW.value)])
     db.commit()
     db.refresh(t)
     return {"ticket_id": t.id}
 
 
 @router.post("/{ticket_id}/reprint")
-async def reprint(ticket_id: str, reason: str | None = None, db: Session = Depends(get_db), sub: str = Depends(require_perm("REPRINT"))):
+def reprint(ticket_id: str, reason: str | None = None, db: Session = Depends(get_db), sub: str = Depends(require_perm("REPRINT"))):
     t = db.get(KitchenTicket, ticket_id)
     if not t:
         raise HTTPException(404, detail="ticket not found")
-    # fire to station's printer if configured
-    if t.target_station:
-        st = db.get(KitchenStation, t.target_station)
-        pr = db.get(Printer, st.printer_id) if st and st.printer_id else None
-        if pr and pr.connection_url:
-            try:
-                async with httpx.AsyncClient(timeout=3) as client:
-                    await client.post(pr.connection_url, json={"type": "KOT", "ticket_id": t.id, "reprint": True})
-            except Exception:
-                pass
+    # queue for the station's printer if configured
+    job = None
+    r = kot_print.route(db, t.target_station) if t.target_station else None
+    if r is not None:
+        job = printq.enqueue(db, r.printer, "KOT", kot_print.reprint_payload(db, t, r), ref_id=t.id)
     if hasattr(t, "reprint_count"):
         t.reprint_count = (t.reprint_count or 0) + 1
     db.add(AuditLog(actor_user_id=sub, entity="KitchenTicket", entity_id=ticket_id, action="REPRINT", reason=reason))
     db.commit()
-    return {"ok": True, "reprint_count": getattr(t, "reprint_count", None)}
+    return {"ok": True, "reprint_count": getattr(t, "reprint_count", None), "job_id": job.id if job else None}
 
 
 @router.post("/{ticket_id}/cancel")
@@ -50,5 +61,158 @@ def cancel(ticket_id: str, reason: str | None = None, db: Session = Depends(get_
     if hasattr(t, "cancel_reason"):
         t.cancel_reason = reason
     db.add(AuditLog(actor_user_id=sub, entity="KitchenTicket", entity_id=ticket_id, action="CANCEL", reason=reason))
+    kds.record(db, [kds.event(t, kds.CANCELLED, reason=reason)])
     db.commit()
     return {"ok": True}
+
+
+@router.patch("/{ticket_id}/status")
+def set_status(ticket_id: str, body: KOTStatusIn, db: Session = Depends(get_db), sub: str = Depends(require_auth)):
+    """
+    Move a ticket one step along NEW -> IN_PROGRESS -> READY -> DONE.
+    Skipping a step, going back or touching a cancelled ticket is a 409.
+    Re-sending the current status is a no-op, so a screen can retry safely.
+    """
+    t = db.get(KitchenTicket, ticket_id)
+    if not t:
+        raise HTTPException(404, detail="ticket not found")
+    new = KOTStatus(body.status)
+    if t.status == new:
+        return {"ok": True, "status": new.value}
+    if kds.NEXT_STATUS.get(t.status) != new:
+        raise HTTPException(409, detail=f"cannot move ticket from {t.status.value} to {new.value}")
+    # compare-and-set: of two screens bumping the same ticket only one wins
+    prev = t.status
+    res = db.execute(
+        update(KitchenTicket)
+        .where(KitchenTicket.id == ticket_id, KitchenTicket.status == prev)
+        .values(status=new, updated_at=datetime.now(timezone.utc), version=KitchenTicket.version + 1)
+        .execution_options(synchronize_session=False)
+    )
+    if res.rowcount != 1:
+        db.rollback()
+        raise HTTPException(409, detail="ticket status changed concurrently")
+    kds.record(db, [kds.event(t, kds.STATUS, status=new.value, previous=prev.value)])
+    db.commit()
+    return {"ok": True, "status": new.value}
+
+
+# ── KDS feed ─────────────────────────────────────────────────────────────────
+
+@router.get("/stations/{station_id}/tickets")
+def station_board(station_id: str, db: Session = Depends(get_db), sub: str = Depends(require_auth)):
+    """
+    Open tickets (not DONE / CANCELLED) for a station with their items, and
+    the event id to start the feed from. Read the id first: events after it
+    are replayed, so nothing between this call and the feed is lost.
+    """
+    last_event_id = kds.last_seq(db, station_id)
+    tickets = (
+        db.query(KitchenTicket)
+        .filter(
+            KitchenTicket.target_station == station_id,
+            KitchenTicket.status.notin_([KOTStatus.DONE, KOTStatus.CANCELLED]),
+        )
+        .order_by(KitchenTicket.created_at.asc())
+        .all()
+    )
+    items: dict[str, list[dict]] = {t.id: [] for t in tickets}
+    if tickets:
+        for ki, oi, name in (
+            db.query(KitchenTicketItem, OrderItem.item_id, MenuItem.name)
+            .join(OrderItem, OrderItem.id == KitchenTicketItem.order_item_id)
+            .join(MenuItem, MenuItem.id == OrderItem.item_id)
+            .filter(KitchenTicketItem.ticket_id.in_(list(items)))
+            .order_by(KitchenTicketItem.created_at.asc())
+            .all()
+        ):
+            items[ki.ticket_id].append({"order_item_id": ki.order_item_id, "item_id": oi, "name": name, "qty": ki.qty})
+    return {
+        "last_event_id": last_event_id,
+        "tickets": [
+            {
+                "id": t.id, "order_id": t.order_id, "ticket_no": t.ticket_no, "status": t.status.value,
+                "created_at": t.created_at.isoformat(), "items": items[t.id],
+            }
+            for t in tickets
+        ],
+    }
+
+
+@router.get("/stations/{station_id}/feed")
+async def station_feed(
+    station_id: str,
+    last_event_id: int | None = None,
+    last_event_id_header: str | None = Header(None, alias="Last-Event-ID"),
+    sub: str = Depends(require_auth),
+):
+    """
+    Server-sent events for one station: TICKET_CREATED, ITEM_ADDED, STATUS,
+    CANCELLED. Each event's id is its seq; on reconnect (Last-Event-ID header,
+    or ?last_event_id=) the missed events are replayed first. Without either
+    the stream starts at the current head. A comment line is sent every
+    KDS_HEARTBEAT_S to keep proxies from closing an idle stream.
+    """
+    after = last_event_id
+    if last_event_id_header and last_event_id_header.isdigit():
+        after = int(last_event_id_header)
+    return StreamingResponse(
+        _sse(station_id, after),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _frame(e: dict) -> bytes:
+    return b"id: %d\nevent: %s\ndata: %s\n\n" % (e["seq"], e["type"].encode(), orjson.dumps(e))
+
+
+def _read(fn, *args):
+    # the request's session is closed before the body is sent
+    db = SessionLocal()
+    try:
+        return fn(db, *args)
+    finally:
+        db.close()
+
+
+async def _replay(station_id: str, after: int):
+    while True:
+        page = await run_in_threadpool(_read, kds.replay, station_id, after)
+        for e in page:
+            yield e
+        if len(page) < kds.REPLAY_PAGE:
+            return
+        after = page[-1]["seq"]
+
+
+async def _sse(station_id: str, after: int | None):
+    # subscribe before reading, so an event committed in between is not lost;
+    # the overlap is dropped by seq
+    with hub.subscribe(kds.topic(station_id)) as feed:
+        yield b"retry: 3000\n\n"
+        replayed: set[int] = set()
+        if after is None:
+            after = await run_in_threadpool(_read, kds.last_seq, station_id)
+        async for e in _replay(station_id, after):
+            replayed.add(e["seq"])
+            after = e["seq"]
+            yield _frame(e)
+        while True:
+            if feed.take_lag():
+                # a slow screen overflowed the queue: catch up from the last sent seq
+                async for e in _replay(station_id, after):
+                    if e["seq"] not in replayed:
+                        replayed.add(e["seq"])
+                        after = e["seq"]
+                        yield _frame(e)
+                continue
+            msg = await feed.get(timeout=settings.KDS_HEARTBEAT_S)
+            if msg is None:
+                replayed.clear()  # the replay/live overlap is long gone
+                yield b": ping\n\n"
+                continue
+            for e in msg["events"]:
+                if e["seq"] not in replayed:
+                    after = max(after, e["seq"])
+                    yield _frame(e)
@@ -1,8 +1,16 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Header, Response
+from sqlalchemy import func, select, union_all
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from datetime import datetime
 from decimal import Decimal
+from collections import OrderedDict
+import hashlib
+import threading
+import time
+import orjson
+
+from app.config import settings
 
 from app.db import get_db
 from app.schemas.menu import (
@@ -22,6 +30,7 @@ from app.models.core import (
     ItemModifierGroup,
 )
 from app.deps import require_auth, require_perm
+from app.services.loaders import load_by_id, load_grouped
 
 router = APIRouter(prefix="/menu", tags=["menu"])
 
@@ -40,6 +49,98 @@ def _ts(dt: datetime | None) -> str | None:
     return dt.isoformat()
 
 
+def _item_row(m: MenuItem) -> dict:
+    return {
+        "id": m.id,
+        "tenant_id": m.tenant_id,
+        # no branch_id field on model, so we don't emit it
+
+        "name": m.name,
+        "description": m.description,
+        "category_id": m.category_id,
+        "sku": m.sku,
+        "hsn": m.hsn,
+
+        "is_active": bool(m.is_active),
+        "stock_out": bool(m.stock_out),
+        "tax_inclusive": bool(m.tax_inclusive),
+        "gst_rate": _as_float(m.gst_rate) or 0.0,
+
+        "kitchen_station_id": m.kitchen_station_id,
+
+        "created_at": _ts(getattr(m, "created_at", None)),
+        "updated_at": _ts(getattr(m, "updated_at", None)),
+    }
+
+def _variant_row(v: ItemVariant) -> dict:
+    return {
+        "id": v.id,
+        "item_id": v.item_id,
+        "label": v.label,
+        "mrp": _as_float(v.mrp),
+        "base_price": _as_float(v.base_price) or 0.0,
+        "is_default": bool(v.is_default),
+    }
+
+def _modifier_group_row(g: ModifierGroup, mods: List[Modifier]) -> dict:
+    return {
+        "group_id": g.id,
+        "name": g.name,
+        "required": bool(getattr(g, "required", False)),
+        "min_sel": getattr(g, "min_sel", 0) or 0,
+        "max_sel": getattr(g, "max_sel", None),
+        "modifiers": [
+            {
+                "id": m.id,
+                "name": m.name,
+                "price_delta": _as_float(m.price_delta) or 0.0,
+            }
+            for m in mods
+        ],
+    }
+
+
+class _SnapshotCache:
+    """
+    Per-process cache of built menu snapshots keyed by (tenant_id, branch_id):
+    (etag, encoded body, verified_at). Within MENU_SNAPSHOT_TTL_S of the last
+    check an entry is served without touching the database; after that the
+    ETag is re-derived with one aggregate query. Menu writes in this process
+    drop everything. Beyond `maxsize` branches the least recently served
+    entry is evicted.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._rows: OrderedDict[tuple[str, str], tuple[str, bytes, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple[str, str]) -> tuple[str, bytes, float] | None:
+        with self._lock:
+            hit = self._rows.get(key)
+            if hit:
+                self._rows.move_to_end(key)
+            return hit
+
+    def put(self, key: tuple[str, str], etag: str, body: bytes) -> None:
+        with self._lock:
+            self._rows[key] = (etag, body, time.monotonic())
+            self._rows.move_to_end(key)
+            while len(self._rows) > self.maxsize:
+                self._rows.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._rows.clear()
+
+
+_snapshots = _SnapshotCache(maxsize=settings.MENU_SNAPSHOT_CACHE_SIZE)
+
+
+def _invalidate_snapshots() -> None:
+    _snapshots.clear()
+
+
 # ---------- ITEMS (for POS grid etc) ----------
 
 @router.get("/items")
@@ -73,31 +174,7 @@ def list_items(
 
     rows: List[MenuItem] = q.all()
 
-    out = []
-    for m in rows:
-        out.append({
-            "id": m.id,
-            "tenant_id": m.tenant_id,
-            # no branch_id field on model, so we don't emit it
-
-            "name": m.name,
-            "description": m.description,
-            "category_id": m.category_id,
-            "sku": m.sku,
-            "hsn": m.hsn,
-
-            "is_active": bool(m.is_active),
-            "stock_out": bool(m.stock_out),
-            "tax_inclusive": bool(m.tax_inclusive),
-            "gst_rate": _as_float(m.gst_rate) or 0.0,
-
-            "kitchen_station_id": m.kitchen_station_id,
-
-            "created_at": _ts(getattr(m, "created_at", None)),
-            "updated_at": _ts(getattr(m, "updated_at", None)),
-        })
-
-    return out
+    return [_item_row(m) for m in rows]
 
 
 @router.post("/items", response_model=MenuItemOut)
@@ -109,6 +186,7 @@ def create_item(
     it = MenuItem(**body.model_dump())
     db.add(it)
     db.commit()
+    _invalidate_snapshots()
     db.refresh(it)
     return MenuItemOut(id=it.id, **body.model_dump())
 
@@ -131,6 +209,7 @@ def delete_item(
 
     it.deleted_at = datetime.utcnow()
     db.commit()
+    _invalidate_snapshots()
     return {"ok": True, "id": item_id}
 
 
@@ -146,6 +225,7 @@ def set_stock_out(
         raise HTTPException(404, detail="item not found")
     it.stock_out = bool(value)
     db.commit()
+    _invalidate_snapshots()
     return {"id": it.id, "stock_out": it.stock_out}
 
 
@@ -161,6 +241,7 @@ def assign_station(
         raise HTTPException(404, detail="item not found")
     it.kitchen_station_id = station_id
     db.commit()
+    _invalidate_snapshots()
     return {"id": it.id, "kitchen_station_id": it.kitchen_station_id}
 
 
@@ -178,6 +259,7 @@ def update_tax(
     it.gst_rate = gst_rate
     it.tax_inclusive = tax_inclusive
     db.commit()
+    _invalidate_snapshots()
     return {
         "id": it.id,
         "gst_rate": float(it.gst_rate),
@@ -204,17 +286,7 @@ def list_variants(
         .all()
     )
 
-    out = []
-    for v in rows:
-        out.append({
-            "id": v.id,
-            "item_id": v.item_id,
-            "label": v.label,
-            "mrp": _as_float(v.mrp),
-            "base_price": _as_float(v.base_price) or 0.0,
-            "is_default": bool(v.is_default),
-        })
-    return out
+    return [_variant_row(v) for v in rows]
 
 
 @router.post("/variants", response_model=VariantOut)
@@ -226,6 +298,7 @@ def create_variant(
     v = ItemVariant(**body.model_dump())
     db.add(v)
     db.commit()
+    _invalidate_snapshots()
     db.refresh(v)
     return VariantOut(id=v.id, **body.model_dump())
 
@@ -241,6 +314,7 @@ def create_category(
     cat = MenuCategory(**body.model_dump())
     db.add(cat)
     db.commit()
+    _invalidate_snapshots()
     db.refresh(cat)
     return MenuCategoryOut(id=cat.id, **body.model_dump())
 
@@ -291,6 +365,7 @@ def delete_category(
 
     cat.deleted_at = datetime.utcnow()
     db.commit()
+    _invalidate_snapshots()
     return {"ok": True, "id": cat_id}
 
 
@@ -308,6 +383,7 @@ def create_modifier_group(
     mg = ModifierGroup(**body)
     db.add(mg)
     db.commit()
+    _invalidate_snapshots()
     db.refresh(mg)
     return {"id": mg.id}
 
@@ -326,6 +402,7 @@ def create_modifier(
     m = Modifier(**body)
     db.add(m)
     db.commit()
+    _invalidate_snapshots()
     db.refresh(m)
     return {"id": m.id}
 
@@ -367,33 +444,10 @@ def get_item_modifiers_full(
         .all()
     )
 
-    result = []
-    for g in groups:
-        # 2. load all modifiers in that group
-        mods: List[Modifier] = (
-            db.query(Modifier)
-            .filter(Modifier.group_id == g.id)
-            .all()
-        )
-
-        result.append(
-            {
-                "group_id": g.id,
-                "name": g.name,
-                "required": bool(getattr(g, "required", False)),
-                "min_sel": getattr(g, "min_sel", 0) or 0,
-                "max_sel": getattr(g, "max_sel", None),
-                "modifiers": [
-                    {
-                        "id": m.id,
-                        "name": m.name,
-                        "price_delta": _as_float(m.price_delta) or 0.0,
-                    }
-                    for m in mods
-                ],
-            }
-        )
+    # 2. load the modifiers of all those groups in one query
+    mods = load_grouped(db.query(Modifier), Modifier.group_id, [g.id for g in groups])
 
+    result = [_modifier_group_row(g, mods.get(g.id, [])) for g in groups]
     return result
 
 @router.post("/items/{item_id}/modifier_groups")
@@ -425,5 +479,122 @@ def link_item_group(
         link = ItemModifierGroup(item_id=item_id, group_id=group_id)
         db.add(link)
         db.commit()
+        _invalidate_snapshots()
         return {"ok": True, "linked": True}
     return {"ok": True, "linked": False}
+
+
+# ---------- SNAPSHOT (whole menu in one document) ----------
+
+def _menu_fingerprint(db: Session, tenant_id: str, branch_id: str) -> str:
+    """
+    ETag from max(updated_at), row count and sum(version) of the branch's rows
+    in every menu table, in one round trip. Other tenants' and branches' edits
+    leave it alone.
+    """
+    cat_ids = select(MenuCategory.id).where(MenuCategory.tenant_id == tenant_id, MenuCategory.branch_id == branch_id)
+    item_ids = select(MenuItem.id).where(MenuItem.category_id.in_(cat_ids))
+    group_ids = select(ModifierGroup.id).where(ModifierGroup.tenant_id == tenant_id)
+    parts = [
+        select(func.max(MenuCategory.updated_at), func.count(), func.sum(MenuCategory.version))
+        .where(MenuCategory.tenant_id == tenant_id, MenuCategory.branch_id == branch_id),
+        select(func.max(MenuItem.updated_at), func.count(), func.sum(MenuItem.version))
+        .where(MenuItem.category_id.in_(cat_ids)),
+        # live variants only (a delete drops the count), as the snapshot lists them
+        select(func.max(ItemVariant.updated_at), func.count(), func.sum(ItemVariant.version))
+        .where(ItemVariant.item_id.in_(item_ids), ItemVariant.deleted_at.is_(None)),
+        select(func.max(ItemModifierGroup.updated_at), func.count(), func.sum(ItemModifierGroup.version))
+        .where(ItemModifierGroup.item_id.in_(item_ids)),
+        select(func.max(ModifierGroup.updated_at), func.count(), func.sum(ModifierGroup.version))
+        .where(ModifierGroup.tenant_id == tenant_id),
+        select(func.max(Modifier.updated_at), func.count(), func.sum(Modifier.version))
+        .where(Modifier.group_id.in_(group_ids)),
+    ]
+    rows = db.execute(union_all(*parts)).all()
+    digest = hashlib.sha1(repr([tuple(str(v) for v in r) for r in rows]).encode()).hexdigest()
+    return f'"m-{digest[:20]}"'
+
+
+def _build_snapshot(db: Session, tenant_id: str, branch_id: str, etag: str) -> dict:
+    cats: List[MenuCategory] = (
+        db.query(MenuCategory)
+        .filter(
+            MenuCategory.tenant_id == tenant_id,
+            MenuCategory.branch_id == branch_id,
+            MenuCategory.deleted_at.is_(None),
+        )
+        .order_by(MenuCategory.position)
+        .all()
+    )
+    cat_ids = [c.id for c in cats]
+    items: List[MenuItem] = (
+        db.query(MenuItem)
+        .filter(MenuItem.category_id.in_(cat_ids), MenuItem.deleted_at.is_(None))
+        .all()
+        if cat_ids else []
+    )
+    item_ids = [m.id for m in items]
+
+    variants = load_grouped(
+        db.query(ItemVariant)
+        .filter(ItemVariant.deleted_at.is_(None))
+        .order_by(ItemVariant.is_default.desc(), ItemVariant.label.asc()),
+        ItemVariant.item_id,
+        item_ids,
+    )
+    links = load_grouped(db.query(ItemModifierGroup), ItemModifierGroup.item_id, item_ids)
+    groups = load_by_id(db, ModifierGroup, (l.group_id for ls in links.values() for l in ls))
+    mods = load_grouped(db.query(Modifier), Modifier.group_id, groups)
+
+    return {
+        "etag": etag,
+        "tenant_id": tenant_id,
+        "branch_id": branch_id,
+        "categories": [
+            MenuCategoryOut(
+                id=c.id, tenant_id=c.tenant_id, branch_id=c.branch_id, name=c.name, position=c.position,
+            ).model_dump()
+            for c in cats
+        ],
+        "items": [
+            {
+                **_item_row(m),
+                "variants": [_variant_row(v) for v in variants.get(m.id, [])],
+                "modifier_group_ids": [l.group_id for l in links.get(m.id, [])],
+            }
+            for m in items
+        ],
+        "modifier_groups": [_modifier_group_row(g, mods.get(g.id, [])) for g in groups.values()],
+    }
+
+
+@router.get("/snapshot")
+def menu_snapshot(
+    tenant_id: str,
+    branch_id: str,
+    if_none_match: str | None = Header(default=None),
+    db: Session = Depends(get_db),
+    sub: str = Depends(require_auth),
+):
+    """
+    Whole menu for a branch in one document: categories, items (each with its
+    variants and modifier_group_ids) and modifier groups with their modifiers.
+    Send the returned ETag back as If-None-Match; an unchanged menu answers
+    304 (without a database round trip while the cached ETag is fresh).
+    """
+    key = (tenant_id, branch_id)
+    hit = _snapshots.get(key)
+    if hit and time.monotonic() - hit[2] < settings.MENU_SNAPSHOT_TTL_S:
+        etag, body = hit[0], hit[1]
+    else:
+        etag = _menu_fingerprint(db, tenant_id, branch_id)
+        if hit and hit[0] == etag:
+            body = hit[1]
+        else:
+            body = orjson.dumps(_build_snapshot(db, tenant_id, branch_id, etag))
+        _snapshots.put(key, etag, body)
+
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if if_none_match and etag in [t.strip() for t in if_none_match.split(",")]:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
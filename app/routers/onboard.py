@@ -140,7 +140,7 @@ def create_branch(
 ):
     """
     Adds first Branch for a tenant.
-    Body: { tenant_id, name, phone?, gstin?, address?, state_code? }
+    Body: { tenant_id, name, phone?, gstin?, address?, state_code?, code? }
     """
     _require_setup_secret(request)
     tenant_id = body.get("tenant_id")
@@ -155,6 +155,7 @@ def create_branch(
         state_code=body.get("state_code"),
         gstin=body.get("gstin"),
         address=body.get("address"),
+        code=body.get("code"),
     )
     db.add(b); db.flush()
     db.commit()
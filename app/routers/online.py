@@ -11,6 +11,7 @@ from app.models.core import (
     Order, OrderStatus,
     ReportDailySales,  # pre-aggregated daily sales
 )
+from app.services.billing import init_totals
 
 router = APIRouter(prefix="/online", tags=["online"])
 
@@ -38,6 +39,7 @@ def webhook(provider: str, body: dict, db: Session = Depends(get_db)):
         status=OrderStatus.OPEN,
         opened_at=datetime.now(timezone.utc),
     )
+    init_totals(o)
     db.add(o)
     db.flush()
 
@@ -1,20 +1,28 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy import func
+from sqlalchemy import insert, tuple_
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
 from typing import List
 from datetime import datetime, timezone, date
 from decimal import Decimal, ROUND_HALF_UP
+import base64
+import json
+import uuid
 
 from app.db import get_db
-from app.deps import require_auth
-from app.schemas.orders import OrderIn, OrderOut, OrderItemIn, PaymentIn
+from app.deps import idempotent, require_auth
+from app.schemas.orders import OrderIn, OrderOut, OrderItemIn, OrderItemsBatchIn, PaymentIn
 from app.models.core import (
     AuditLog, Invoice, Order, OrderStatus, OrderItem, Payment, MenuItem, ItemVariant,
-    KitchenTicket, KitchenTicketItem, RecipeBOM, StockMove, StockMoveType,
+    KitchenTicket, KitchenTicketItem, KOTStatus, RecipeBOM, StockMove, StockMoveType,
     RestaurantSettings, Branch, Customer
 )
-from app.services.billing import compute_bill
+from app.services.billing import apply_line, apply_lines, init_totals, lock_order, order_totals, paid_total
+from app.services.numbering import allocate_invoice_no, allocate_kot_no
+from app.services.reports import record_order_closed, record_order_voided
+from app.services.stock import record_moves
+from app.services.idempotency import Idempotency
+from app.services import kds, kot_print
 
 router = APIRouter(prefix="/orders", tags=["orders"]) 
 
@@ -37,28 +45,121 @@ def _split_tax(
     half = _money(amount / 2)
     return {"cgst": half, "sgst": _money(amount - half), "igst": 0.0}
 
+def _order_states(db: Session, order: Order) -> tuple[str | None, str | None]:
+    """(branch_state, customer_state) for intra/inter-state GST."""
+    branch = db.get(Branch, order.branch_id) if order.branch_id else None
+    cust = db.get(Customer, order.customer_id) if order.customer_id else None
+    return (
+        branch.state_code if branch and hasattr(branch, "state_code") else None,
+        cust.state_code if cust and hasattr(cust, "state_code") else None,
+    )
+
+
+def _line_tax(
+    mitem: MenuItem,
+    *,
+    qty: float,
+    unit_price: float,
+    line_discount: float | None,
+    branch_state: str | None,
+    customer_state: str | None,
+) -> dict:
+    """taxable_value/cgst/sgst/igst for one line (inclusive/exclusive per item setting)."""
+    base = float(qty) * float(unit_price) - float(line_discount or 0)
+    if float(mitem.gst_rate or 0) > 0:
+        if bool(mitem.tax_inclusive):
+            taxable = base / (1 + float(mitem.gst_rate) / 100)
+            tax_total = base - taxable
+        else:
+            taxable = base
+            tax_total = taxable * float(mitem.gst_rate) / 100
+    else:
+        taxable = base
+        tax_total = 0.0
+
+    split = _split_tax(branch_state=branch_state, customer_state=customer_state, amount=tax_total)
+    return {
+        "taxable_value": _money(taxable),
+        "cgst": _money(split["cgst"]),
+        "sgst": _money(split["sgst"]),
+        "igst": _money(split["igst"]),
+    }
+
 def _q3(x) -> Decimal:
     # use string to avoid float binary artifacts
     return Decimal(str(x)).quantize(Decimal("0.001"))
 
+def _order_row(o: Order) -> dict:
+    return {
+        "id": o.id,
+        "tenant_id": getattr(o, "tenant_id", None),
+        "branch_id": getattr(o, "branch_id", None),
+        "order_no": getattr(o, "order_no", None),
+
+        # enums come back in our Flutter model as strings like "DINE_IN" / "OPEN"
+        "channel": getattr(o.channel, "value", o.channel),
+        "provider": getattr(o.provider, "value", o.provider) if getattr(o, "provider", None) else None,
+        "status": getattr(o.status, "value", o.status),
+
+        "table_id": getattr(o, "table_id", None),
+        "customer_id": getattr(o, "customer_id", None),
+        "opened_by_user_id": getattr(o, "opened_by_user_id", None),
+        "closed_by_user_id": getattr(o, "closed_by_user_id", None),
+
+        "pax": getattr(o, "pax", None),
+        "source_device_id": getattr(o, "source_device_id", None),
+        "note": getattr(o, "note", None),
+
+        # timestamps go out as ISO8601; FastAPI will handle datetime -> str for you
+        "opened_at": getattr(o, "opened_at", None),
+        "closed_at": getattr(o, "closed_at", None),
+    }
+
+
+def _encode_cursor(o: Order) -> str:
+    raw = json.dumps([o.opened_at.isoformat(), o.order_no, o.id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> tuple[datetime, str, str]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        opened_at, order_no, oid = json.loads(raw)
+        return datetime.fromisoformat(opened_at), str(order_no), str(oid)
+    except Exception:
+        raise HTTPException(status_code=400, detail="invalid cursor")
+
+
 @router.get("/")
 def list_orders(
     status: str | None = None,
     page: int = 1,
     size: int = 20,
+    branch_id: str | None = None,
+    date_from: date | None = None,
+    date_to: date | None = None,
+    cursor: str | None = None,
+    with_total: bool | None = None,
     db: Session = Depends(get_db),
     sub: str = Depends(require_auth),
 ):
     """
-    List orders (paged) for the logged-in user’s tenant/branch context.
+    List orders (newest first) for the logged-in user’s tenant/branch context.
 
     Query params:
-      - status: "OPEN", "CLOSED", etc. (optional)
-      - page:   1-based page index
-      - size:   page size
+      - status:     "OPEN", "CLOSED", etc. (optional)
+      - branch_id:  only this branch (optional)
+      - date_from / date_to: opened_at day range, inclusive (optional)
+      - page:       1-based page index (offset mode)
+      - size:       page size
+      - cursor:     keyset mode. Pass "" for the first page, then the
+                    `next_cursor` of the previous response. Skips OFFSET and,
+                    unless with_total=true, the COUNT(*).
+      - with_total: force/skip the total count (default: on in page mode,
+                    off in cursor mode)
 
     Response shape matches what the Flutter app expects in ApiClient.listPage():
-      { "items": [ { ...order fields... } ], "total": <int> }
+      { "items": [ { ...order fields... } ], "total": <int|null>, "next_cursor": <str|null> }
     """
 
     q = db.query(Order)
@@ -70,80 +171,74 @@ def list_orders(
         except ValueError:
             raise HTTPException(status_code=400, detail="invalid status")
         q = q.filter(Order.status == wanted)
+    if branch_id:
+        q = q.filter(Order.branch_id == branch_id)
+    if date_from:
+        q = q.filter(Order.opened_at >= datetime.combine(date_from, datetime.min.time()))
+    if date_to:
+        q = q.filter(Order.opened_at <= datetime.combine(date_to, datetime.max.time()))
 
     # simple pagination math
     if page < 1:
         page = 1
     if size < 1:
         size = 20
-    offset = (page - 1) * size
 
-    total = q.count()
-
-    rows = (
-        q.order_by(
-            Order.opened_at.desc(),
-            Order.order_no.desc(),
-            Order.id.desc(),
-        )
-        .offset(offset)
-        .limit(size)
-        .all()
+    keyset = cursor is not None
+    if keyset:
+        # keyset rows need a sort key; orders always get opened_at on creation
+        q = q.filter(Order.opened_at.isnot(None))
+    if with_total is None:
+        with_total = not keyset
+    total = q.count() if with_total else None
+
+    q = q.order_by(
+        Order.opened_at.desc(),
+        Order.order_no.desc(),
+        Order.id.desc(),
     )
+    if keyset:
+        if cursor:
+            q = q.filter(tuple_(Order.opened_at, Order.order_no, Order.id) < tuple_(*_decode_cursor(cursor)))
+    else:
+        q = q.offset((page - 1) * size)
 
-    items: list[dict] = []
-    for o in rows:
-        items.append({
-            "id": o.id,
-            "tenant_id": getattr(o, "tenant_id", None),
-            "branch_id": getattr(o, "branch_id", None),
-            "order_no": getattr(o, "order_no", None),
-
-            # enums come back in our Flutter model as strings like "DINE_IN" / "OPEN"
-            "channel": getattr(o.channel, "value", o.channel),
-            "provider": getattr(o.provider, "value", o.provider) if getattr(o, "provider", None) else None,
-            "status": getattr(o.status, "value", o.status),
-
-            "table_id": getattr(o, "table_id", None),
-            "customer_id": getattr(o, "customer_id", None),
-            "opened_by_user_id": getattr(o, "opened_by_user_id", None),
-            "closed_by_user_id": getattr(o, "closed_by_user_id", None),
-
-            "pax": getattr(o, "pax", None),
-            "source_device_id": getattr(o, "source_device_id", None),
-            "note": getattr(o, "note", None),
-
-            # timestamps go out as ISO8601; FastAPI will handle datetime -> str for you
-            "opened_at": getattr(o, "opened_at", None),
-            "closed_at": getattr(o, "closed_at", None),
-        })
+    # one extra row tells us whether there is a next page
+    rows = q.limit(size + 1).all()
+    more = len(rows) > size
+    rows = rows[:size]
+    last = rows[-1] if rows else None
 
     return {
-        "items": items,
+        "items": [_order_row(o) for o in rows],
         "total": total,
+        "next_cursor": _encode_cursor(last) if more and last.opened_at else None,
     }
 
 
 @router.post("/", response_model=OrderOut)
-def open_order(body: OrderIn, db: Session = Depends(get_db), sub: str = Depends(require_auth)):
+def open_order(body: OrderIn, db: Session = Depends(get_db), sub: str = Depends(require_auth), idem: Idempotency = Depends(idempotent)):
     o = Order(
         **body.model_dump(),
         status=OrderStatus.OPEN,
         opened_by_user_id=sub,
         opened_at=datetime.now(timezone.utc),
     )
+    init_totals(o)
     db.add(o)
+    db.flush()
+    out = OrderOut(id=o.id, status=o.status.value, **body.model_dump())
+    idem.save(db, out)
     db.commit()
-    db.refresh(o)
-    return OrderOut(id=o.id, status=o.status.value, **body.model_dump())
+    return out
 
 
 @router.post("/{order_id}/items")
-def add_item(order_id: str, body: OrderItemIn, db: Session = Depends(get_db), sub: str = Depends(require_auth)):
+def add_item(order_id: str, body: OrderItemIn, db: Session = Depends(get_db), sub: str = Depends(require_auth), idem: Idempotency = Depends(idempotent)):
     if order_id != body.order_id:
         raise HTTPException(400, detail="order_id mismatch")
 
-    order = db.get(Order, order_id)
+    order = lock_order(db, order_id)
     if not order:
         raise HTTPException(404, detail="order not found")
 
@@ -155,51 +250,42 @@ def add_item(order_id: str, body: OrderItemIn, db: Session = Depends(get_db), su
     line = OrderItem(**body.model_dump(), gst_rate=mitem.gst_rate)
 
     # derive tax split (inclusive/exclusive per item setting)
-    base = float(body.qty) * float(body.unit_price) - float(line.line_discount or 0)
-    if float(mitem.gst_rate or 0) > 0:
-        if bool(mitem.tax_inclusive):
-            taxable = base / (1 + float(mitem.gst_rate) / 100)
-            tax_total = base - taxable
-        else:
-            taxable = base
-            tax_total = taxable * float(mitem.gst_rate) / 100
-    else:
-        taxable = base
-        tax_total = 0.0
-
-    # intra/inter-state from Branch vs Customer
-    branch = db.get(Branch, order.branch_id) if order.branch_id else None
-    cust = db.get(Customer, order.customer_id) if order.customer_id else None
-    split = _split_tax(
-        branch_state=(branch.state_code if branch and hasattr(branch, "state_code") else None),
-        customer_state=(cust.state_code if cust and hasattr(cust, "state_code") else None),
-        amount=tax_total,
-    )
-    line.taxable_value = _money(taxable)
-    line.cgst = _money(split["cgst"])\
-        if hasattr(line, "cgst") else _money(split["cgst"])  # keep even if older schema
-    line.sgst = _money(split["sgst"]) if hasattr(line, "sgst") else _money(split["sgst"]) 
-    line.igst = _money(split["igst"]) if hasattr(line, "igst") else _money(split["igst"]) 
+    branch_state, customer_state = _order_states(db, order)
+    for k, v in _line_tax(
+        mitem,
+        qty=body.qty,
+        unit_price=body.unit_price,
+        line_discount=line.line_discount,
+        branch_state=branch_state,
+        customer_state=customer_state,
+    ).items():
+        setattr(line, k, v)
 
     db.add(line)
     db.flush()
+    apply_line(db, order, line)
 
     # inventory deduction (BOM)
     recipes = db.query(RecipeBOM).filter(RecipeBOM.item_id == mitem.id).all()
+    moves = []
     for r in recipes:
         qty_delta = (_q3(r.qty) * _q3(body.qty)).quantize(Decimal("0.001"), rounding=ROUND_HALF_UP)
-        db.add(
+        moves.append(
             StockMove(
                 ingredient_id=r.ingredient_id,
                 type=StockMoveType.SALE,
                 qty_change=-qty_delta,  # Decimal with 3dp
                 reason=f"Order {order_id}",
                 ref_order_id=order_id,
+                branch_id=order.branch_id,
             )
         )
+    db.add_all(moves)
+    record_moves(db, moves)
 
     # auto-KOT per station
     if mitem.kitchen_station_id:
+        events = []
         station_ticket = (
             db.query(KitchenTicket)
             .filter(
@@ -211,48 +297,192 @@ def add_item(order_id: str, body: OrderItemIn, db: Session = Depends(get_db), su
         if not station_ticket:
             station_ticket = KitchenTicket(
                 order_id=order_id,
-                ticket_no=int(datetime.now().timestamp()),
+                ticket_no=allocate_kot_no(db, order.branch_id, mitem.kitchen_station_id),
                 target_station=mitem.kitchen_station_id,
             )
             db.add(station_ticket)
             db.flush()
+            events.append(kds.event(station_ticket, kds.TICKET_CREATED, ticket_no=station_ticket.ticket_no, status=KOTStatus.NEW.value))
         db.add(
             KitchenTicketItem(
                 ticket_id=station_ticket.id, order_item_id=line.id, qty=body.qty
             )
         )
+        events.append(kds.event(station_ticket, kds.ITEM_ADDED, order_item_id=line.id, item_id=mitem.id, name=mitem.name, qty=body.qty))
+        kds.record(db, events)
+        kot_print.queue_lines(db, order, [{
+            "ticket_id": station_ticket.id, "ticket_no": station_ticket.ticket_no, "station_id": mitem.kitchen_station_id,
+            "order_item_id": line.id, "item_id": mitem.id, "name": mitem.name, "qty": body.qty,
+        }])
+
+    out = {"id": line.id}
+    idem.save(db, out)
+    db.commit()
+    return out
+
+
+@router.post("/{order_id}/items:batch")
+def add_items_batch(order_id: str, body: OrderItemsBatchIn, db: Session = Depends(get_db), sub: str = Depends(require_auth)):
+    """
+    Add N cart lines in one transaction. Same tax split, BOM deduction and
+    per-station KOT as add_item, but menu items, recipes and open station
+    tickets are loaded with one IN (...) query each and all rows are written
+    with bulk inserts.
+
+    Response: {"ids": [...], "lines": [{"id", "item_id", "ticket_id"}]} in request order.
+    """
+    if body.order_id and order_id != body.order_id:
+        raise HTTPException(400, detail="order_id mismatch")
+
+    order = lock_order(db, order_id)
+    if not order:
+        raise HTTPException(404, detail="order not found")
+    if not body.lines:
+        return {"ids": [], "lines": []}
+
+    item_ids = {l.item_id for l in body.lines}
+    mitems = {m.id: m for m in db.query(MenuItem).filter(MenuItem.id.in_(item_ids)).all()}
+    missing = item_ids - set(mitems)
+    if missing:
+        raise HTTPException(404, detail=f"menu item not found: {sorted(missing)[0]}")
+
+    recipes: dict[str, list[RecipeBOM]] = {}
+    for r in db.query(RecipeBOM).filter(RecipeBOM.item_id.in_(item_ids)).all():
+        recipes.setdefault(r.item_id, []).append(r)
+
+    station_ids = {m.kitchen_station_id for m in mitems.values() if m.kitchen_station_id}
+    tickets: dict[str, str] = {}
+    ticket_nos: dict[str, int] = {}
+    if station_ids:
+        for t in (
+            db.query(KitchenTicket)
+            .filter(KitchenTicket.order_id == order_id, KitchenTicket.target_station.in_(station_ids))
+            .order_by(KitchenTicket.created_at.asc())
+            .all()
+        ):
+            tickets.setdefault(t.target_station, t.id)
+            ticket_nos.setdefault(t.id, t.ticket_no)
+
+    branch_state, customer_state = _order_states(db, order)
+    now = datetime.now(timezone.utc)
+    # KOT numbers for stations getting a new ticket, in a fixed (lock) order
+    new_ticket_nos = {
+        station_id: allocate_kot_no(db, order.branch_id, station_id, now)
+        for station_id in sorted(station_ids - set(tickets))
+    }
+
+    line_rows: list[dict] = []
+    move_rows: list[dict] = []
+    ticket_rows: list[dict] = []
+    kot_rows: list[dict] = []
+    kds_events: list[dict] = []
+    kot_lines: list[dict] = []
+    out: list[dict] = []
+    for l in body.lines:
+        mitem = mitems[l.item_id]
+        row = {
+            "id": str(uuid.uuid4()),
+            "order_id": order_id,
+            **l.model_dump(),
+            "gst_rate": mitem.gst_rate,
+            **_line_tax(
+                mitem,
+                qty=l.qty,
+                unit_price=l.unit_price,
+                line_discount=l.line_discount,
+                branch_state=branch_state,
+                customer_state=customer_state,
+            ),
+        }
+        line_rows.append(row)
+
+        for r in recipes.get(mitem.id, []):
+            qty_delta = (_q3(r.qty) * _q3(l.qty)).quantize(Decimal("0.001"), rounding=ROUND_HALF_UP)
+            move_rows.append({
+                "ingredient_id": r.ingredient_id,
+                "type": StockMoveType.SALE,
+                "qty_change": -qty_delta,
+                "reason": f"Order {order_id}",
+                "ref_order_id": order_id,
+                "branch_id": order.branch_id,
+            })
+
+        ticket_id = None
+        if mitem.kitchen_station_id:
+            ticket_id = tickets.get(mitem.kitchen_station_id)
+            if not ticket_id:
+                ticket_id = tickets[mitem.kitchen_station_id] = str(uuid.uuid4())
+                ticket_rows.append({
+                    "id": ticket_id,
+                    "order_id": order_id,
+                    "ticket_no": new_ticket_nos[mitem.kitchen_station_id],
+                    "target_station": mitem.kitchen_station_id,
+                })
+                ticket_nos[ticket_id] = ticket_rows[-1]["ticket_no"]
+                kds_events.append(kds.event(ticket_rows[-1], kds.TICKET_CREATED, ticket_no=ticket_rows[-1]["ticket_no"], status=KOTStatus.NEW.value))
+            kot_rows.append({"ticket_id": ticket_id, "order_item_id": row["id"], "qty": l.qty})
+            kds_events.append(kds.event(
+                {"id": ticket_id, "order_id": order_id, "target_station": mitem.kitchen_station_id},
+                kds.ITEM_ADDED, order_item_id=row["id"], item_id=mitem.id, name=mitem.name, qty=l.qty,
+            ))
+            kot_lines.append({
+                "ticket_id": ticket_id, "ticket_no": ticket_nos[ticket_id], "station_id": mitem.kitchen_station_id,
+                "order_item_id": row["id"], "item_id": mitem.id, "name": mitem.name, "qty": l.qty,
+            })
+
+        out.append({"id": row["id"], "item_id": l.item_id, "ticket_id": ticket_id})
+
+    db.execute(insert(OrderItem), line_rows)
+    if move_rows:
+        db.execute(insert(StockMove), move_rows)
+        record_moves(db, [StockMove(**m) for m in move_rows])
+    if ticket_rows:
+        db.execute(insert(KitchenTicket), ticket_rows)
+    if kot_rows:
+        db.execute(insert(KitchenTicketItem), kot_rows)
+    kds.record(db, kds_events)
+    kot_print.queue_lines(db, order, kot_lines)
+
+    # running totals: one delta for the whole batch
+    apply_lines(db, order, [OrderItem(**row) for row in line_rows])
 
     db.commit()
-    return {"id": line.id}
+    return {"ids": [o["id"] for o in out], "lines": out}
 
 
 @router.post("/{order_id}/pay")
-def pay(order_id: str, body: PaymentIn, db: Session = Depends(get_db), sub: str = Depends(require_auth)):
+def pay(order_id: str, body: PaymentIn, db: Session = Depends(get_db), sub: str = Depends(require_auth), idem: Idempotency = Depends(idempotent)):
     if order_id != body.order_id:
         raise HTTPException(400, detail="order_id mismatch")
 
-    o = db.get(Order, order_id)
+    o = lock_order(db, order_id)
     if not o:
         raise HTTPException(404, detail="order not found")
 
+    paid_before = paid_total(db, o)
     p = Payment(**body.model_dump(), paid_at=datetime.now(timezone.utc))
     db.add(p)
     db.flush()
+    o.paid_total = paid_before + float(body.amount)
 
     # compute totals and close if fully paid (Phase-1: assume single payment closes order)
-    totals = compute_bill(db, order_id)
-    o.status = OrderStatus.CLOSED
-    o.closed_at = datetime.now(timezone.utc)
-    # mark who closed (cashier)
-    if hasattr(o, "closed_by_user_id"):
-        o.closed_by_user_id = sub
+    totals = order_totals(db, o)
+    if o.status != OrderStatus.CLOSED:
+        o.status = OrderStatus.CLOSED
+        o.closed_at = datetime.now(timezone.utc)
+        # mark who closed (cashier)
+        if hasattr(o, "closed_by_user_id"):
+            o.closed_by_user_id = sub
+        record_order_closed(db, o)
 
-    db.commit()
-    return {
+    out = {
         "payment_id": p.id,
         "order_status": o.status.value,
         "totals": totals,
     }
+    idem.save(db, out)
+    db.commit()
+    return out
 
 
 @router.post("/{order_id}/invoice")
@@ -273,41 +503,30 @@ def create_invoice(
             "invoice_no": existing.invoice_no,
         }
 
-    # Generate invoice_no like INV-YYYYMMDD-0001
-    today = datetime.now(timezone.utc).date()
-    prefix = f"INV-{today.strftime('%Y%m%d')}"
-
-    base_q = db.query(func.count(Invoice.id)).filter(
-        Invoice.invoice_no.like(f"{prefix}-%")
+    # Next number from the per-branch counter, e.g. INV-<branch>-YYYYMMDD-0001
+    inv = Invoice(
+        order_id=order_id,
+        invoice_no=allocate_invoice_no(db, o.branch_id),
+        invoice_dt=datetime.now(timezone.utc),
+        reprint_count=0,  # first print = not a "reprint" yet
     )
-    start_n = int(base_q.scalar() or 0)
+    if hasattr(inv, "cashier_user_id"):
+        inv.cashier_user_id = sub
+
+    db.add(inv)
+    try:
+        db.commit()
+    except IntegrityError:
+        # the number is only taken if the invoice commits; a clash here means a
+        # format without a branch discriminator shared across branches
+        db.rollback()
+        raise HTTPException(409, detail="Could not allocate a unique invoice number")
+    db.refresh(inv)
 
-    attempts = 0
-    while attempts < 3:
-        inv_no = f"{prefix}-{start_n + 1 + attempts:04d}"
-        try:
-            inv = Invoice(
-                order_id=order_id,
-                invoice_no=inv_no,
-                invoice_dt=datetime.now(timezone.utc),
-                reprint_count=0,  # first print = not a "reprint" yet
-            )
-            if hasattr(inv, "cashier_user_id"):
-                inv.cashier_user_id = sub
-
-            db.add(inv)
-            db.commit()
-            db.refresh(inv)
-
-            return {
-                "invoice_id": inv.id,
-                "invoice_no": inv.invoice_no,
-            }
-        except IntegrityError:
-            db.rollback()
-            attempts += 1
-
-    raise HTTPException(409, detail="Could not allocate a unique invoice number")
+    return {
+        "invoice_id": inv.id,
+        "invoice_no": inv.invoice_no,
+    }
 
 @router.delete("/{order_id}/items/{order_item_id}")
 def remove_item(
@@ -321,6 +540,12 @@ def remove_item(
     if not line or line.order_id != order_id:
         raise HTTPException(404, detail="order item not found")
 
+    o = lock_order(db, order_id)
+    db.refresh(line)  # a concurrent removal may have committed before we got the lock
+    # take the line out of the running bill (once)
+    if line.deleted_at is None and o:
+        apply_line(db, o, line, sign=-1)
+
     # soft-delete if schema supports it
     if hasattr(line, "deleted_at"):
         line.deleted_at = datetime.now(timezone.utc)
@@ -329,18 +554,22 @@ def remove_item(
 
     # reverse stock (BOM) – safe Decimal arithmetic
     recipes = db.query(RecipeBOM).filter(RecipeBOM.item_id == line.item_id).all()
+    moves = []
     for r in recipes:
         rq = r.qty if isinstance(r.qty, Decimal) else Decimal(str(r.qty))
         lq = line.qty if isinstance(line.qty, Decimal) else Decimal(str(line.qty))
-        db.add(
+        moves.append(
             StockMove(
                 ingredient_id=r.ingredient_id,
                 type=StockMoveType.ADJUST,   # add back
                 qty_change=(rq * lq),
                 reason=f"Cancel order item {order_item_id}",
                 ref_order_id=order_id,
+                branch_id=o.branch_id if o else None,
             )
         )
+    db.add_all(moves)
+    record_moves(db, moves)
 
     # audit (optional)
     if "AuditLog" in globals():
@@ -364,6 +593,13 @@ def apply_discount(
     if not line or line.order_id != order_id:
         raise HTTPException(404, detail="order item not found")
 
+    o = lock_order(db, order_id)
+    db.refresh(line)  # as of the lock
+    if line.deleted_at is not None:
+        o = None
+    if o:
+        apply_line(db, o, line, sign=-1)
+
     disc = body.get("discount", 0.0)
     # store as Decimal when possible
     if hasattr(line, "line_discount") and isinstance(getattr(type(line), "line_discount").type.asdecimal, bool):
@@ -374,6 +610,9 @@ def apply_discount(
     if hasattr(line, "discount_reason"):
         line.discount_reason = body.get("reason")
 
+    if o:
+        apply_line(db, o, line)
+
     db.commit()
     return {"ok": True, "line_discount": float(line.line_discount or 0)}
 
@@ -384,10 +623,14 @@ def void_order(
     db: Session = Depends(get_db),
     sub: str = Depends(require_auth),
 ):
-    o = db.get(Order, order_id)
+    o = lock_order(db, order_id)
     if not o:
         raise HTTPException(404, detail="order not found")
 
+    # take it back out of the daily sales it was counted in
+    if o.status == OrderStatus.CLOSED and o.closed_at is not None:
+        record_order_voided(db, o)
+
     # choose a suitable terminal status
     if hasattr(OrderStatus, "VOID"):
         o.status = OrderStatus.VOID
@@ -411,8 +654,9 @@ def get_order(order_id: str, db: Session = Depends(get_db), sub: str = Depends(r
     if not o:
         raise HTTPException(404, detail="order not found")
 
-    totals = compute_bill(db, order_id)
-    paid = float(sum((p.amount or 0) for p in db.query(Payment).filter(Payment.order_id == order_id).all()))
+    # stored running totals: a single primary-key fetch for the whole bill
+    totals = order_totals(db, o)
+    paid = paid_total(db, o)
     total = float(totals.get("total", 0.0))
     due = _money(total - paid)
 
@@ -2,11 +2,10 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from sqlalchemy import func
 from datetime import datetime, timezone
-import httpx
 from decimal import Decimal, ROUND_HALF_UP
 
 from app.db import get_db
-from app.deps import require_auth  # phase-1: allow any logged-in cashier to print
+from app.deps import require_auth, require_perm  # phase-1: allow any logged-in cashier to print
 from app.models.core import (
     AuditLog,
     Order,
@@ -15,12 +14,15 @@ from app.models.core import (
     Modifier,
     MenuItem,
     ItemVariant,
-    Payment,
     Invoice,
     RestaurantSettings,
     Printer,
+    PrintJob,
+    PrintJobStatus,
 )
-from app.services.billing import compute_bill
+from app.services import printq
+from app.services.billing import order_totals, paid_total
+from app.services.loaders import load_grouped
 
 router = APIRouter(prefix="/print", tags=["print"])
 
@@ -34,19 +36,6 @@ def _money(x) -> float:
     return float(Decimal(str(x)).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP))
 
 
-async def _post_agent(url: str, payload: dict):
-    """
-    Fire-and-forget POST to local/edge print agent.
-    We swallow errors in Phase-1.
-    """
-    try:
-        async with httpx.AsyncClient(timeout=3) as client:
-            await client.post(url, json=payload)
-    except Exception:
-        # printer agent might be offline, we don't crash POS flow
-        pass
-
-
 def _get_billing_printer(db: Session, branch_id: str | None):
     """
     Pull the RestaurantSettings for this branch, then resolve the billing printer.
@@ -84,10 +73,22 @@ def _gather_line_items(db: Session, order_id: str) -> list[dict]:
         )
         .join(MenuItem, MenuItem.id == OrderItem.item_id)
         .outerjoin(ItemVariant, ItemVariant.id == OrderItem.variant_id)
-        .filter(OrderItem.order_id == order_id)
+        .filter(OrderItem.order_id == order_id, OrderItem.deleted_at.is_(None))
         .all()
     )
 
+    # modifiers for every line in one query
+    mods_by_line = load_grouped(
+        db.query(
+            OrderItemModifier,
+            Modifier.name.label("mod_name"),
+        )
+        .join(Modifier, Modifier.id == OrderItemModifier.modifier_id),
+        OrderItemModifier.order_item_id,
+        [line.id for line, _, _ in rows],
+        key_of=lambda r: r[0].order_item_id,
+    )
+
     line_payloads: list[dict] = []
     for line, item_name, variant_label in rows:
         # build display name
@@ -95,18 +96,9 @@ def _gather_line_items(db: Session, order_id: str) -> list[dict]:
         if variant_label:
             disp = f"{disp} ({variant_label})"
 
-        # gather modifiers on this line
-        mods_rows = (
-            db.query(
-                OrderItemModifier,
-                Modifier.name.label("mod_name"),
-            )
-            .join(Modifier, Modifier.id == OrderItemModifier.modifier_id)
-            .filter(OrderItemModifier.order_item_id == line.id)
-            .all()
-        )
+        # modifiers on this line
         mods_list: list[str] = []
-        for om, mod_name in mods_rows:
+        for om, mod_name in mods_by_line.get(line.id, []):
             # e.g. "Extra Cheese +20.00"
             delta_txt = ""
             if getattr(om, "price_delta", 0):
@@ -148,9 +140,8 @@ def _build_print_payload(
     lines = _gather_line_items(db, order.id)
 
     # totals
-    totals = compute_bill(db, order.id)  # subtotal/tax/total etc.
-    paid_rows = db.query(Payment).filter(Payment.order_id == order.id).all()
-    paid_sum = sum(float(p.amount or 0) for p in paid_rows)
+    totals = order_totals(db, order)  # stored subtotal/tax/total etc.
+    paid_sum = paid_total(db, order)
     total_amt = float(totals.get("total", 0.0))
     due_amt = _money(total_amt - paid_sum)
 
@@ -205,7 +196,7 @@ def _build_print_payload(
 # --- routes ----------------------------------------------------------------
 
 @router.post("/bill/{order_id}")
-async def print_bill(
+def print_bill(
     order_id: str,
     reason: str | None = None,
     db: Session = Depends(get_db),
@@ -227,14 +218,8 @@ async def print_bill(
     # Build payload for the print agent
     payload = _build_print_payload(db, order, rs)
 
-    # Tell agent to print BILL
-    await _post_agent(
-        printer.connection_url,
-        {
-            "type": "BILL",
-            **payload,
-        },
-    )
+    # Queue for the agent; the dispatcher sends it after commit
+    job = printq.enqueue(db, printer, "BILL", payload, ref_id=order_id)
 
     # Audit (who printed a bill)
     db.add(
@@ -248,11 +233,11 @@ async def print_bill(
     )
     db.commit()
 
-    return {"printed": True}
+    return {"queued": True, "job_id": job.id}
 
 
 @router.post("/invoice/{invoice_id}")
-async def print_invoice(
+def print_invoice(
     invoice_id: str,
     reason: str | None = None,
     db: Session = Depends(get_db),
@@ -278,14 +263,8 @@ async def print_invoice(
     # Build payload including invoice block
     payload = _build_print_payload(db, order, rs, invoice=inv)
 
-    # Send to agent
-    await _post_agent(
-        printer.connection_url,
-        {
-            "type": "INVOICE",
-            **payload,
-        },
-    )
+    # Queue for the agent
+    job = printq.enqueue(db, printer, "INVOICE", payload, ref_id=invoice_id)
 
     # bump reprint_count and audit log
     if hasattr(inv, "reprint_count"):
@@ -304,13 +283,14 @@ async def print_invoice(
     db.commit()
 
     return {
-        "printed": True,
+        "queued": True,
+        "job_id": job.id,
         "reprint_count": getattr(inv, "reprint_count", None),
     }
 
 
 @router.post("/open_drawer")
-async def open_drawer(
+def open_drawer(
     db: Session = Depends(get_db),
     sub: str = Depends(require_auth),
 ):
@@ -330,12 +310,54 @@ async def open_drawer(
     if not p.connection_url:
         raise HTTPException(400, detail="Printer connection not set")
 
-    await _post_agent(
-        p.connection_url,
-        {
-            "type": "OPEN_DRAWER",
-            "code": getattr(p, "cash_drawer_code", None),
-        },
-    )
+    job = printq.enqueue(db, p, "OPEN_DRAWER", {"code": getattr(p, "cash_drawer_code", None)})
+    db.commit()
+
+    return {"queued": True, "job_id": job.id}
+
+
+# --- jobs ------------------------------------------------------------------
 
-    return {"opened": True}
+@router.get("/jobs/{job_id}")
+def get_job(job_id: str, db: Session = Depends(get_db), sub: str = Depends(require_auth)):
+    """State of a queued print: QUEUED / SENDING / DONE / DEAD, attempts and last error."""
+    job = db.get(PrintJob, job_id)
+    if not job:
+        raise HTTPException(404, detail="print job not found")
+    return printq.job_out(job)
+
+
+@router.get("/jobs")
+def list_jobs(
+    status: str | None = None,
+    printer_id: str | None = None,
+    branch_id: str | None = None,
+    limit: int = 100,
+    db: Session = Depends(get_db),
+    sub: str = Depends(require_auth),
+):
+    """Newest first; e.g. ?status=DEAD for prints that need attention."""
+    q = db.query(PrintJob)
+    if status:
+        try:
+            q = q.filter(PrintJob.status == PrintJobStatus(status))
+        except ValueError:
+            raise HTTPException(400, detail=f"unknown status {status}")
+    if printer_id:
+        q = q.filter(PrintJob.printer_id == printer_id)
+    if branch_id:
+        q = q.filter(PrintJob.branch_id == branch_id)
+    return [printq.job_out(j) for j in q.order_by(PrintJob.created_at.desc()).limit(min(limit, 1000)).all()]
+
+
+@router.post("/jobs/{job_id}/retry")
+def retry_job(job_id: str, db: Session = Depends(get_db), sub: str = Depends(require_perm("REPRINT"))):
+    """Re-queue a DEAD job (e.g. after fixing the printer's connection_url)."""
+    job = db.get(PrintJob, job_id)
+    if not job:
+        raise HTTPException(404, detail="print job not found")
+    if job.status != PrintJobStatus.DEAD:
+        raise HTTPException(409, detail=f"job is {job.status.value}, only DEAD jobs can be retried")
+    printq.retry_dead(db, job)
+    db.commit()
+    return printq.job_out(job)
@@ -4,11 +4,15 @@ from sqlalchemy.orm import Session
 from app.db import get_db
 from app.deps import require_auth, require_perm
 from app.models.core import RestaurantSettings, Printer, PrinterType, KitchenStation
+from app.services.kot_print import invalidate_routes
+from app.services.numbering import check_invoice_no_format
 
 router = APIRouter(prefix="/settings", tags=["settings"])
 
 @router.post("/restaurant")
 def upsert_restaurant(body: dict, db: Session = Depends(get_db), sub: str = Depends(require_perm("SETTINGS_EDIT"))):
+    if body.get("invoice_no_format"):
+        check_invoice_no_format(body["invoice_no_format"])
     rs = (db.query(RestaurantSettings)
             .filter(RestaurantSettings.tenant_id==body["tenant_id"],
                     RestaurantSettings.branch_id==body["branch_id"]).first())
@@ -36,6 +40,8 @@ def get_restaurant(tenant_id: str, branch_id: str, db: Session = Depends(get_db)
         "service_charge_mode": rs.service_charge_mode.name, "service_charge_value": float(rs.service_charge_value or 0),
         "packing_charge_mode": rs.packing_charge_mode.name, "packing_charge_value": float(rs.packing_charge_value or 0),
         "billing_printer_id": rs.billing_printer_id,
+        "invoice_no_format": rs.invoice_no_format,
+        "invoice_seq_reset": rs.invoice_seq_reset,
     }
 
 # UPDATED: explicitly accept cash drawer fields, coerce PrinterType, and allow setting is_default
@@ -67,9 +73,11 @@ def update_printer(printer_id: str, body: dict, db: Session = Depends(get_db), s
             else:
                 setattr(p, k, v)
     db.commit(); db.refresh(p)
+    invalidate_routes()
     return {"id": p.id}
 
 @router.post("/stations")
 def add_station(body: dict, db: Session = Depends(get_db), sub: str = Depends(require_perm("SETTINGS_EDIT"))):
     s = KitchenStation(**body); db.add(s); db.commit(); db.refresh(s)
+    invalidate_routes()
     return {"id": s.id}
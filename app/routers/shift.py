@@ -32,18 +32,6 @@ def payout(shift_id: str, amount: float, reason: str | None = None, db: Session
     db.commit()
     return {"movement_id": m.id}
 
-def has_perm(db: Session, user_id: str, code: str) -> bool:
-    from app.models.core import Permission, RolePermission, Role, UserRole
-    perms = (
-        db.query(Permission.code)
-          .join(RolePermission, RolePermission.permission_id == Permission.id)
-          .join(Role, Role.id == RolePermission.role_id)
-          .join(UserRole, UserRole.role_id == Role.id)
-          .filter(UserRole.user_id == user_id)
-          .all()
-    )
-    return code in {p[0] for p in perms}
-
 @router.post("/{shift_id}/close")
 def close_shift(shift_id: str, expected_cash: float, actual_cash: float, note: str | None = None,
                 db: Session = Depends(get_db), sub: str = Depends(require_perm("SHIFT_CLOSE"))):
@@ -1,29 +1,272 @@
-from fastapi import APIRouter, Depends, Header
+from fastapi import APIRouter, Depends, Header, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy import case, func, insert, or_, select
 from sqlalchemy.orm import Session
-from app.db import get_db
-from app.deps import require_auth
-from app.models.core import SyncEvent, SyncCheckpoint
+from app.config import settings
+from app.db import SessionLocal, dialect_insert, get_db
+from app.deps import request_body_hash, require_auth, require_perm
+from app.models.core import Branch, SyncEvent, SyncCheckpoint, SyncCompaction, SyncSnapshot, User
+from app.services.idempotency import begin as begin_idempotent
+from app.services import sync as sync_svc
+from app.services.sync import compaction_state
+from app.services.hub import hub
 from datetime import datetime, timezone
-import json
+import orjson
 
 router = APIRouter(prefix="/sync", tags=["sync"])
 
+# rows fetched from the cursor (and written to the socket) at a time
+PULL_STREAM_CHUNK = 500
+
+async def _orjson_body(request: Request) -> dict:
+    """Request body parsed with orjson (pushes can carry 100k ops)."""
+    try:
+        body = orjson.loads(await request.body())
+    except orjson.JSONDecodeError as e:
+        raise HTTPException(422, detail=f"invalid JSON: {e}")
+    if not isinstance(body, dict):
+        raise HTTPException(422, detail="expected a JSON object")
+    return body
+
+def _tenant_scope(db: Session, sub: str, tenant_id: str | None, branch_id: str | None) -> tuple[str, str | None]:
+    """
+    (tenant, branch) a sync call is scoped to. The tenant is always the
+    signed-in user's; tenant_id/branch_id from the client can only narrow it,
+    so another tenant's id, or a branch outside the user's tenant, is a 403.
+    No branch_id means the whole tenant.
+    """
+    user = db.get(User, sub)
+    if user is None:
+        raise HTTPException(401, detail="Invalid token")
+    if tenant_id and tenant_id != user.tenant_id:
+        raise HTTPException(403, detail="tenant_id is not the signed-in user's tenant")
+    if branch_id:
+        branch = db.get(Branch, branch_id)
+        if branch is None or branch.tenant_id != user.tenant_id:
+            raise HTTPException(403, detail="branch_id is not in the signed-in user's tenant")
+    return user.tenant_id, branch_id
+
+def _event_rows(ops: list) -> list[dict]:
+    try:
+        return [
+            {
+                "entity": op["entity"],
+                "entity_id": op["entity_id"],
+                "op": op["op"],
+                "payload": orjson.dumps(op.get("payload")).decode(),
+            }
+            for op in ops
+        ]
+    except (KeyError, TypeError) as e:
+        raise HTTPException(422, detail=f"invalid op: {e}")
+    except orjson.JSONEncodeError as e:
+        raise HTTPException(422, detail=f"invalid payload: {e}")
+
 @router.post("/push")
-def push(body: dict, db: Session = Depends(get_db), sub: str = Depends(require_auth), idemp_key: str | None = Header(default=None, alias="Idempotency-Key")):
-    # very simple: just store events, device updates its own checkpoint after pull
+def push(body: dict = Depends(_orjson_body), digest: str = Depends(request_body_hash), db: Session = Depends(get_db), sub: str = Depends(require_auth), idemp_key: str | None = Header(default=None, alias="Idempotency-Key")):
+    # store events; device updates its own checkpoint after pull
     ops = body.get("ops", [])
     device_id = body.get("device_id")
-    now = datetime.now(timezone.utc)
-    for op in ops:
-        ev = SyncEvent(entity=op["entity"], entity_id=op["entity_id"], op=op["op"], payload=json.dumps(op.get("payload")), device_id=device_id, created_at=now, updated_at=now)
-        db.add(ev)
+    if not isinstance(ops, list):
+        raise HTTPException(422, detail="ops must be a list")
+    if len(ops) > settings.SYNC_PUSH_MAX_OPS:
+        raise HTTPException(413, detail=f"too many ops ({len(ops)}); push at most {settings.SYNC_PUSH_MAX_OPS} per request")
+    rows = _event_rows(ops)
+    tenant_id, branch_id = _tenant_scope(db, sub, body.get("tenant_id"), body.get("branch_id"))
+    # a retried push replays the first response instead of duplicating the events
+    idem = begin_idempotent(db, device_id or f"user:{sub}", idemp_key, "POST /sync/push", digest)
+
+    # Core executemany (multi-row VALUES per batch); columns shared by every row
+    # are rendered into the statement instead of bound per row. RETURNING gives
+    # the assigned seqs.
+    table = SyncEvent.__table__
+    stmt = (
+        insert(table)
+        .values(
+            device_id=device_id, tenant_id=tenant_id, branch_id=branch_id,
+            created_at=func.now(), updated_at=func.now(), version=1,
+        )
+        .returning(table.c.seq)
+    )
+    conn = db.connection()
+    first_seq = last_seq = None
+    for i in range(0, len(rows), settings.SYNC_PUSH_BATCH_SIZE):
+        seqs = conn.execute(stmt, rows[i:i + settings.SYNC_PUSH_BATCH_SIZE]).scalars().all()
+        lo, hi = min(seqs), max(seqs)
+        first_seq = lo if first_seq is None else min(first_seq, lo)
+        last_seq = hi if last_seq is None else max(last_seq, hi)
+    # seqs are increasing but not necessarily contiguous when devices push concurrently
+    out = {"stored": len(rows), "first_seq": first_seq, "last_seq": last_seq}
+    idem.save(db, out)
+    if rows:
+        hub.publish_after_commit(db, "sync", {
+            "seq": last_seq, "tenant_id": tenant_id, "branch_id": branch_id, "device_id": device_id,
+        })
     db.commit()
-    return {"stored": len(ops)}
+    return out
 
-@router.get("/pull")
-def pull(since: int = 0, limit: int = 1000, db: Session = Depends(get_db), sub: str = Depends(require_auth)):
-    q = db.query(SyncEvent).filter(SyncEvent.seq > since).order_by(SyncEvent.seq.asc()).limit(limit)
-    events = [{"seq": e.seq, "entity": e.entity, "entity_id": e.entity_id, "op": e.op, "payload": e.payload, "device_id": e.device_id, "updated_at": e.updated_at.isoformat()} for e in q]
+def _scoped(q, t, tenant_id: str, branch_id: str | None, device_id: str | None):
+    q = q.where(t.c.tenant_id == tenant_id)
+    if branch_id:
+        # tenant-wide events (no branch) go to every branch
+        q = q.where(or_(t.c.branch_id == branch_id, t.c.branch_id.is_(None)))
+    if device_id:
+        # the device already has what it pushed
+        q = q.where(or_(t.c.device_id != device_id, t.c.device_id.is_(None)))
+    return q
+
+def _pull_query(since: int, tenant_id: str, branch_id: str | None, device_id: str | None, until: int | None = None):
+    t = SyncEvent.__table__
+    q = select(
+        t.c.seq, t.c.entity, t.c.entity_id, t.c.op, t.c.payload, t.c.device_id, t.c.updated_at,
+    ).where(t.c.seq > since).order_by(t.c.seq.asc())
+    if until is not None:
+        q = q.where(t.c.seq <= until)
+    return _scoped(q, t, tenant_id, branch_id, device_id)
+
+def _event(row) -> dict:
+    return {"seq": row.seq, "entity": row.entity, "entity_id": row.entity_id, "op": row.op, "payload": row.payload, "device_id": row.device_id, "updated_at": row.updated_at.isoformat()}
+
+def _ack(db: Session, device_id: str, seq: int) -> None:
+    """Record that the device has applied everything up to `seq` (never moves back). Caller commits."""
+    now = datetime.now(timezone.utc)
+    table = SyncCheckpoint.__table__
+    stmt = dialect_insert(db)(table).values(device_id=device_id, last_seq=seq, created_at=now, updated_at=now, version=1)
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=["device_id"],
+        set_={
+            "last_seq": case((table.c.last_seq < stmt.excluded.last_seq, stmt.excluded.last_seq), else_=table.c.last_seq),
+            "updated_at": now,  # last seen, for SYNC_DEVICE_STALE_DAYS
+        },
+    ))
+
+def _stream_ndjson(queries: list, since: int, **trailer):
+    """
+    One event per line from server-side cursors (in order), then
+    {"next_since": N, **trailer}. Uses its own session: the request's is
+    closed before the body is sent.
+    """
+    db = SessionLocal()
+    try:
+        last = since
+        for q in queries:
+            result = db.execute(q.execution_options(stream_results=True, yield_per=PULL_STREAM_CHUNK))
+            for rows in result.partitions():
+                last = max(last, rows[-1].seq)
+                yield b"".join(orjson.dumps(_event(r)) + b"\n" for r in rows)
+        yield orjson.dumps({"next_since": last, **trailer}) + b"\n"
+    finally:
+        db.close()
+
+def _begin_pull(db: Session, since: int, device_id: str | None) -> None:
+    state = db.get(SyncCompaction, 1)
+    if state is not None and since < state.pruned_through:
+        raise HTTPException(410, detail=f"events up to {state.pruned_through} were pruned; call /sync/bootstrap")
+    if device_id and since:
+        _ack(db, device_id, since)
+        db.commit()
+
+def _page(db: Session, q, since: int, limit: int | None) -> dict:
+    events = [_event(r) for r in db.execute(q.limit(limit or 1000))]
     next_since = events[-1]["seq"] if events else since
+    db.rollback()  # end the read transaction before waiting
     return {"events": events, "next_since": next_since}
 
+def _wakes(tenant_id: str, branch_id: str | None, device_id: str | None):
+    """Push notifications that can change this pull's result."""
+    def match(msg: dict) -> bool:
+        return (
+            msg.get("tenant_id") == tenant_id
+            and (not branch_id or msg.get("branch_id") in (None, branch_id))
+            and (not device_id or msg.get("device_id") != device_id)
+        )
+    return match
+
+@router.get("/pull")
+async def pull(
+    since: int = 0,
+    limit: int | None = None,
+    tenant_id: str | None = None,
+    branch_id: str | None = None,
+    device_id: str | None = None,
+    format: str = "json",
+    wait: float = 0,
+    db: Session = Depends(get_db),
+    sub: str = Depends(require_auth),
+):
+    """
+    Events after `since`, scoped to the user's tenant (and branch_id, when
+    given) and without the pulling device's own pushes. format=ndjson streams the whole tail (or `limit`
+    events) with bounded memory; gzip applies when the client accepts it.
+    Passing device_id acknowledges `since` in its SyncCheckpoint.
+
+    A `since` below the pruned point is a 410: the client drops its local
+    copy and starts over from /sync/bootstrap. Without device_id nothing holds
+    back pruning but SYNC_RETAIN_DAYS, so such clients must pull at least that
+    often to avoid it.
+
+    wait=N (json): when nothing is new, hold the request up to N seconds
+    (max SYNC_PULL_MAX_WAIT_S) and answer as soon as a matching push commits.
+    """
+    if format not in ("json", "ndjson"):
+        raise HTTPException(400, detail="format must be json or ndjson")
+    tenant_id, branch_id = await run_in_threadpool(_tenant_scope, db, sub, tenant_id, branch_id)
+    await run_in_threadpool(_begin_pull, db, since, device_id)
+    q = _pull_query(since, tenant_id, branch_id, device_id)
+
+    if format == "ndjson":
+        if limit:
+            q = q.limit(limit)
+        return StreamingResponse(_stream_ndjson([q], since), media_type="application/x-ndjson")
+
+    if wait <= 0:
+        return await run_in_threadpool(_page, db, q, since, limit)
+    # subscribe before reading, so a push landing in between still wakes us
+    with hub.subscribe("sync", match=_wakes(tenant_id, branch_id, device_id)) as feed:
+        page = await run_in_threadpool(_page, db, q, since, limit)
+        if page["events"]:
+            return page
+        if await feed.get(timeout=min(wait, settings.SYNC_PULL_MAX_WAIT_S)) is None:
+            return page
+    return await run_in_threadpool(_page, db, q, since, limit)
+
+@router.get("/bootstrap")
+def bootstrap(
+    tenant_id: str | None = None,
+    branch_id: str | None = None,
+    device_id: str | None = None,
+    db: Session = Depends(get_db),
+    sub: str = Depends(require_auth),
+):
+    """
+    Full state for a new device as NDJSON: the compacted snapshot (latest
+    UPSERT per entity up to the watermark), then every event after it. The
+    trailer's next_since is where regular /sync/pull continues.
+    """
+    tenant_id, branch_id = _tenant_scope(db, sub, tenant_id, branch_id)
+    # the snapshot and the tail must meet exactly at the watermark
+    watermark = compaction_state(db).watermark
+    db.commit()
+
+    t = SyncSnapshot.__table__
+    snapshot = _scoped(
+        select(t.c.seq, t.c.entity, t.c.entity_id, t.c.op, t.c.payload, t.c.device_id, t.c.updated_at).order_by(t.c.seq.asc()),
+        t, tenant_id, branch_id, None,
+    )
+    tail = _pull_query(watermark, tenant_id, branch_id, None)
+    return StreamingResponse(_stream_ndjson([snapshot, tail], watermark, watermark=watermark), media_type="application/x-ndjson")
+
+@router.post("/compact")
+def compact(db: Session = Depends(get_db), sub: str = Depends(require_perm("SETTINGS_EDIT"))):
+    """Fold new events into the bootstrap snapshot. Run periodically (cron)."""
+    out = sync_svc.compact(db)
+    db.commit()
+    return out
+
+@router.post("/prune")
+def prune(db: Session = Depends(get_db), sub: str = Depends(require_perm("SETTINGS_EDIT"))):
+    """Delete events below the watermark that every active device has acknowledged."""
+    out = sync_svc.prune(db)
+    db.commit()
+    return out
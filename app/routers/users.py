@@ -1,10 +1,10 @@
 # app/routers/users.py
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
-from typing import List
 
 from app.db import get_db
-from app.deps import require_perm
+from app.deps import require_perm, invalidate_permissions
+from app.services.loaders import load_grouped
 from app.util.security import hash_pw
 from app.models.core import Tenant, User, Role, UserRole, Permission, RolePermission
 
@@ -78,14 +78,13 @@ def list_users(
         q = q.filter(User.tenant_id == tenant_id)
     users = q.order_by(User.created_at.desc()).limit(500).all()
 
-    def _roles_for(uid: str) -> List[str]:
-        rows = (
-            db.query(Role.code)
-            .join(UserRole, UserRole.role_id == Role.id)
-            .filter(UserRole.user_id == uid)
-            .all()
-        )
-        return [r[0] for r in rows]
+    # roles for every listed user in one query
+    roles = load_grouped(
+        db.query(UserRole.user_id, Role.code).join(Role, Role.id == UserRole.role_id),
+        UserRole.user_id,
+        [u.id for u in users],
+        key_of=lambda r: r[0],
+    )
 
     return [
         {
@@ -95,7 +94,7 @@ def list_users(
             "mobile": u.mobile,
             "email": u.email,
             "active": bool(u.active),
-            "roles": _roles_for(u.id),
+            "roles": [code for _, code in roles.get(u.id, [])],
         }
         for u in users
     ]
@@ -121,6 +120,7 @@ def assign_roles(
         if not db.query(UserRole).filter(UserRole.user_id == u.id, UserRole.role_id == r.id).first():
             db.add(UserRole(user_id=u.id, role_id=r.id))
     db.commit()
+    invalidate_permissions(u.id)
     return {"id": u.id}
 
 
@@ -139,6 +139,7 @@ def remove_role(
         raise HTTPException(404, detail="role not found")
     db.query(UserRole).filter(UserRole.user_id == u.id, UserRole.role_id == r.id).delete()
     db.commit()
+    invalidate_permissions(u.id)
     return {"ok": True}
 
 
@@ -211,6 +212,7 @@ def grant_permissions(
             db.add(RolePermission(role_id=r.id, permission_id=p.id))
             count += 1
     db.commit()
+    invalidate_permissions()  # every holder of the role
     return {"id": r.id, "granted": count}
 
 
@@ -229,4 +231,5 @@ def revoke_permission(
         raise HTTPException(404, detail="permission not found")
     db.query(RolePermission).filter(RolePermission.role_id == r.id, RolePermission.permission_id == p.id).delete()
     db.commit()
+    invalidate_permissions()  # every holder of the role
     return {"ok": True}
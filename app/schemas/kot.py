@@ -0,0 +1,7 @@
+from pydantic import BaseModel
+from typing import Literal
+
+KOTStatusLiteral = Literal["NEW", "IN_PROGRESS", "READY", "DONE"]
+
+class KOTStatusIn(BaseModel):
+    status: KOTStatusLiteral
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional, Literal
+from typing import List, Optional, Literal
 
 OrderChannelLiteral = Literal["DINE_IN", "TAKEAWAY", "DELIVERY", "ONLINE"]
 PayModeLiteral = Literal["CASH","CARD","UPI","WALLET","COUPON"]
@@ -32,6 +32,18 @@ class OrderItemIn(BaseModel):
 class OrderItemOut(OrderItemIn):
     id: str
 
+class OrderItemLineIn(BaseModel):
+    item_id: str
+    variant_id: Optional[str] = None
+    parent_line_id: Optional[str] = None
+    qty: float
+    unit_price: float
+    line_discount: float = 0.0
+
+class OrderItemsBatchIn(BaseModel):
+    order_id: Optional[str] = None  # optional echo of the path param
+    lines: List[OrderItemLineIn]
+
 class PaymentIn(BaseModel):
     order_id: str
     mode: PayModeLiteral
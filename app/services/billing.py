@@ -1,31 +1,34 @@
 from decimal import Decimal, ROUND_HALF_UP
 from sqlalchemy.orm import Session
-from app.models.core import OrderItem, RestaurantSettings
+from app.models.core import Order, OrderItem, Payment, RestaurantSettings
+
+# line contributions are kept at 4dp so running sums on Order stay exact
+_Q4 = Decimal('0.0001')
 
 def _money(x) -> float:
     return float(Decimal(x).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP))
 
-def compute_bill(db: Session, order_id: str) -> dict:
-    rs = db.query(RestaurantSettings).first()
-    gst_inclusive_default = bool(rs.gst_inclusive_default) if rs else True
+def _dec(x) -> Decimal:
+    return Decimal(str(x or 0))
 
-    lines = db.query(OrderItem).filter(OrderItem.order_id == order_id).all()
-    subtotal = 0.0
-    tax_total = 0.0
+def _settings(db: Session) -> RestaurantSettings | None:
+    return db.query(RestaurantSettings).first()
 
-    for l in lines:
-        base = float(l.qty) * float(l.unit_price) - float(l.line_discount or 0)
-        inclusive = gst_inclusive_default  # could be per-item later
-        if inclusive:
-            taxable = base / (1 + float(l.gst_rate)/100)
-            tax = base - taxable
-            subtotal += taxable
-        else:
-            taxable = base
-            tax = base * float(l.gst_rate)/100
-            subtotal += base
-        tax_total += tax
+def _line_amounts(l: OrderItem, inclusive: bool) -> tuple[Decimal, Decimal]:
+    """(subtotal, tax) contribution of one order line."""
+    base = _dec(l.qty) * _dec(l.unit_price) - _dec(l.line_discount)
+    rate = _dec(l.gst_rate)
+    if inclusive:
+        taxable = (base / (1 + rate / 100)).quantize(_Q4, rounding=ROUND_HALF_UP)
+        tax = base - taxable
+    else:
+        taxable = base
+        tax = base * rate / 100
+    return taxable.quantize(_Q4, rounding=ROUND_HALF_UP), tax.quantize(_Q4, rounding=ROUND_HALF_UP)
 
+def _charges(subtotal: Decimal, tax_total: Decimal, rs: RestaurantSettings | None) -> dict:
+    subtotal = float(subtotal)
+    tax_total = float(tax_total)
     service = packing = 0.0
     if rs:
         if rs.service_charge_mode.name == 'PERCENT':
@@ -54,3 +57,118 @@ def compute_bill(db: Session, order_id: str) -> dict:
         "round_off": _money(round_off),
         "total": _money(rounded_total),
     }
+
+def _recompute(db: Session, order_id: str, exclude: tuple[str, ...] = ()) -> tuple[Decimal, Decimal, dict]:
+    rs = _settings(db)
+    gst_inclusive_default = bool(rs.gst_inclusive_default) if rs else True
+
+    q = db.query(OrderItem).filter(OrderItem.order_id == order_id, OrderItem.deleted_at.is_(None))
+    if exclude:
+        q = q.filter(OrderItem.id.notin_(exclude))
+    lines = q.all()
+    subtotal = Decimal(0)
+    tax_total = Decimal(0)
+    for l in lines:
+        inclusive = gst_inclusive_default  # could be per-item later
+        taxable, tax = _line_amounts(l, inclusive)
+        subtotal += taxable
+        tax_total += tax
+
+    return subtotal, tax_total, _charges(subtotal, tax_total, rs)
+
+def compute_bill(db: Session, order_id: str) -> dict:
+    """Full recompute from the order lines (source of truth for reconciliation)."""
+    return _recompute(db, order_id)[2]
+
+# ── Persisted running totals on Order ───────────────────────────────────────
+
+def _store(o: Order, subtotal: Decimal, tax_total: Decimal, bill: dict) -> None:
+    o.subtotal = subtotal
+    o.tax_total = tax_total
+    o.service_charge = bill["service"]
+    o.packing_charge = bill["packing"]
+    o.round_off = bill["round_off"]
+    o.grand_total = bill["total"]
+
+def lock_order(db: Session, order_id: str) -> Order | None:
+    """
+    The order, row-locked (SELECT .. FOR UPDATE) until the caller commits.
+    The running totals are read-modify-write: every path that applies lines
+    or payments to them takes this lock first, so two terminals working on
+    the same order queue up instead of losing one update.
+    """
+    return db.get(Order, order_id, with_for_update=True)
+
+def init_totals(o: Order) -> None:
+    """Zero the running totals on a freshly opened order."""
+    _store(o, Decimal(0), Decimal(0), _charges(Decimal(0), Decimal(0), None))
+    o.paid_total = 0
+
+def refresh_totals(db: Session, o: Order) -> dict:
+    """Recompute from lines and store on the order. Caller commits."""
+    db.flush()
+    subtotal, tax_total, bill = _recompute(db, o.id)
+    _store(o, subtotal, tax_total, bill)
+    return bill
+
+def apply_lines(db: Session, o: Order, lines: list[OrderItem], sign: int = 1) -> None:
+    """
+    Add (sign=1) or remove (sign=-1) line contributions to the order's running
+    totals, then re-derive charges and round-off. Caller commits.
+    """
+    if o.subtotal is None or o.tax_total is None:
+        # legacy order without stored totals: seed them from the other lines,
+        # which is the result for a removal and the starting point for an add
+        db.flush()
+        subtotal, tax_total, bill = _recompute(db, o.id, exclude=tuple(l.id for l in lines if l.id))
+        _store(o, subtotal, tax_total, bill)
+        if sign < 0:
+            return
+    rs = _settings(db)
+    inclusive = bool(rs.gst_inclusive_default) if rs else True
+    subtotal = _dec(o.subtotal)
+    tax_total = _dec(o.tax_total)
+    for l in lines:
+        taxable, tax = _line_amounts(l, inclusive)
+        subtotal += sign * taxable
+        tax_total += sign * tax
+    _store(o, subtotal, tax_total, _charges(subtotal, tax_total, rs))
+
+def apply_line(db: Session, o: Order, line: OrderItem, sign: int = 1) -> None:
+    apply_lines(db, o, [line], sign)
+
+def order_totals(db: Session, o: Order) -> dict:
+    """Bill dict (same shape as compute_bill) read from the stored totals."""
+    if o.grand_total is None or o.subtotal is None:
+        return refresh_totals(db, o)
+    tax_total = float(o.tax_total or 0)
+    return {
+        "subtotal": _money(o.subtotal or 0),
+        "tax": _money(tax_total),
+        "cgst": _money(tax_total / 2.0),
+        "sgst": _money(tax_total / 2.0),
+        "service": _money(o.service_charge or 0),
+        "packing": _money(o.packing_charge or 0),
+        "round_off": _money(o.round_off or 0),
+        "total": _money(o.grand_total),
+    }
+
+def paid_total(db: Session, o: Order) -> float:
+    if o.paid_total is None:
+        o.paid_total = float(sum((p.amount or 0) for p in db.query(Payment).filter(Payment.order_id == o.id).all()))
+    return float(o.paid_total)
+
+def reconcile_totals(db: Session, orders: list[Order], fix: bool = True) -> list[dict]:
+    """
+    Compare stored totals with a full recompute; return the orders that drifted
+    and (when fix=True) overwrite them with the recomputed values.
+    """
+    drift = []
+    for o in orders:
+        stored = order_totals(db, o) if o.grand_total is not None else None
+        subtotal, tax_total, bill = _recompute(db, o.id)
+        if stored != bill:
+            drift.append({"order_id": o.id, "stored": stored, "computed": bill})
+            if fix:
+                _store(o, subtotal, tax_total, bill)
+    return drift
@@ -0,0 +1,177 @@
+"""
+Change notification hub: wakes long-polling / streaming clients when something
+they watch has been committed.
+
+    hub.publish_after_commit(db, "sync", {"seq": 42, ...})   # in a request, before commit
+
+    with hub.subscribe("sync", match=lambda m: ...) as sub:  # in an async endpoint
+        msg = await sub.get(timeout=30)
+
+Messages are delivered to subscribers on their own event loop (publishing is
+thread-safe). A subscriber that falls QUEUE_SIZE messages behind loses the
+overflow; take_lag() tells it so, and it re-reads the DB to catch up. Across worker processes they travel over Postgres LISTEN/NOTIFY;
+on SQLite delivery is in-process only (a device runs a single worker).
+"""
+import asyncio
+import logging
+import threading
+from typing import Any, Callable
+
+import orjson
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import Session
+
+from app.db import engine
+
+log = logging.getLogger(__name__)
+
+CHANNEL = "waah_hub"
+# undelivered messages held per subscriber
+QUEUE_SIZE = 1000
+
+
+class Subscription:
+    def __init__(self, hub: "Hub", topic: str, match: Callable[[dict], bool] | None):
+        self.hub = hub
+        self.topic = topic
+        self.match = match
+        self.loop = asyncio.get_running_loop()
+        self.queue: asyncio.Queue[dict] = asyncio.Queue(maxsize=QUEUE_SIZE)
+        self.lagged = False
+
+    def _offer(self, msg: dict) -> None:
+        # runs on self.loop
+        if self.match is None or self.match(msg):
+            try:
+                self.queue.put_nowait(msg)
+            except asyncio.QueueFull:
+                self.lagged = True  # dropped: see take_lag()
+
+    def take_lag(self) -> bool:
+        """
+        True (once) if messages were dropped since the last call. The queue is
+        emptied too: the caller re-reads everything from the DB instead.
+        """
+        if not self.lagged:
+            return False
+        self.lagged = False
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        return True
+
+    def poke(self, msg: dict | None = None) -> None:
+        """Wake get() from the subscriber's own loop, without publishing."""
+        self._offer(msg or {})
+
+    async def get(self, timeout: float | None = None) -> dict | None:
+        """Next matching message, or None on timeout."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def __enter__(self):
+        self.hub._add(self)
+        return self
+
+    def __exit__(self, *exc):
+        self.hub._remove(self)
+
+
+class Hub:
+    def __init__(self):
+        self._subs: dict[str, set[Subscription]] = {}
+        self._lock = threading.Lock()
+        self._listener: threading.Thread | None = None
+        self._stop = threading.Event()
+
+    # ── subscribers ──
+    def subscribe(self, topic: str, match: Callable[[dict], bool] | None = None) -> Subscription:
+        return Subscription(self, topic, match)
+
+    def _add(self, sub: Subscription) -> None:
+        with self._lock:
+            self._subs.setdefault(sub.topic, set()).add(sub)
+
+    def _remove(self, sub: Subscription) -> None:
+        with self._lock:
+            subs = self._subs.get(sub.topic)
+            if subs:
+                subs.discard(sub)
+                if not subs:
+                    del self._subs[sub.topic]
+
+    def _deliver(self, topic: str, msg: dict) -> None:
+        with self._lock:
+            subs = list(self._subs.get(topic, ()))
+        for sub in subs:
+            try:
+                sub.loop.call_soon_threadsafe(sub._offer, msg)
+            except RuntimeError:
+                self._remove(sub)  # its loop is gone
+
+    # ── publishers ──
+    @property
+    def distributed(self) -> bool:
+        return engine.dialect.name == "postgresql"
+
+    def publish(self, topic: str, msg: dict) -> None:
+        """Deliver to subscribers in every worker. Call after the data is committed."""
+        if not self.distributed:
+            self._deliver(topic, msg)
+            return
+        payload = orjson.dumps({"topic": topic, "msg": msg}).decode()
+        try:
+            with engine.connect() as conn:
+                conn.execute(select(func.pg_notify(CHANNEL, payload)))
+                conn.commit()
+        except Exception:
+            log.exception("hub: NOTIFY failed; delivering locally only")
+            self._deliver(topic, msg)
+
+    def publish_after_commit(self, db: Session, topic: str, msg: dict) -> None:
+        """Queue a message on the session; it goes out if and when the session commits."""
+        db.info.setdefault("hub_pending", []).append((topic, msg))
+
+    # ── cross-worker (Postgres) ──
+    def start(self) -> None:
+        if not self.distributed or self._listener is not None:
+            return
+        self._stop.clear()
+        self._listener = threading.Thread(target=self._listen, name="hub-listen", daemon=True)
+        self._listener.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._listener = None
+
+    def _listen(self) -> None:
+        import psycopg
+
+        conninfo = engine.url.set(drivername="postgresql").render_as_string(hide_password=False)
+        while not self._stop.is_set():
+            try:
+                with psycopg.connect(conninfo, autocommit=True) as conn:
+                    conn.execute(f"LISTEN {CHANNEL}")
+                    while not self._stop.is_set():
+                        for n in conn.notifies(timeout=1.0):
+                            data: Any = orjson.loads(n.payload)
+                            self._deliver(data["topic"], data["msg"])
+            except Exception:
+                log.exception("hub: LISTEN connection lost; retrying")
+                self._stop.wait(2.0)
+
+
+hub = Hub()
+
+
+@event.listens_for(Session, "after_commit")
+def _flush_pending(session: Session) -> None:
+    pending = session.info.pop("hub_pending", None)
+    for topic, msg in pending or ():
+        hub.publish(topic, msg)
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_pending(session: Session) -> None:
+    session.info.pop("hub_pending", None)
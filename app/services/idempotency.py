@@ -0,0 +1,125 @@
+"""
+Idempotency-Key store: the response of a mutation is saved in the same
+transaction, keyed by (device_id, key). A retry with the same key replays the
+saved response instead of running the mutation again. A SHA-256 of the
+request body is stored with it: the same key with a different body is a
+client bug, rejected with 422 rather than answered with another request's
+response.
+
+Usage in an endpoint (see deps.idempotent):
+
+    idem: Idempotency = Depends(idempotent)   # raises IdempotentReplay on a hit
+    ...
+    idem.save(db, result)                     # before db.commit()
+"""
+import hashlib
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+import orjson
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import Response
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.db import dialect_insert
+from app.models.core import IdempotencyKey
+
+# expired keys are deleted at most this often, from whichever request gets there first
+PURGE_INTERVAL_S = 300
+_last_purge = 0.0
+_purge_lock = threading.Lock()
+
+
+class IdempotentReplay(Exception):
+    """Raised with the stored response; turned into a Response by the app's exception handler."""
+
+    def __init__(self, status_code: int, body: str):
+        self.status_code = status_code
+        self.body = body
+
+
+async def replay_handler(request, exc: IdempotentReplay) -> Response:
+    return Response(
+        content=exc.body,
+        status_code=exc.status_code,
+        media_type="application/json",
+        headers={"Idempotent-Replayed": "true"},
+    )
+
+
+class Idempotency:
+    def __init__(self, device_id: str, key: str | None, endpoint: str, body_hash: str | None = None):
+        self.device_id = device_id
+        self.key = key
+        self.endpoint = endpoint
+        self.body_hash = body_hash
+
+    def save(self, db: Session, result, status_code: int = 200) -> None:
+        """
+        Store `result` under the key. Caller commits. If a concurrent request
+        with the same key got there first, roll back and replay its response.
+        """
+        if not self.key:
+            return
+        now = datetime.now(timezone.utc)
+        body = orjson.dumps(jsonable_encoder(result)).decode()
+        table = IdempotencyKey.__table__
+        stmt = dialect_insert(db)(table).values(
+            device_id=self.device_id, key=self.key, endpoint=self.endpoint, request_hash=self.body_hash,
+            status_code=status_code, response=body,
+            expires_at=now + timedelta(seconds=settings.IDEMPOTENCY_TTL_S),
+            created_at=now, updated_at=now, version=1,
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["device_id", "key"],
+            set_={c: stmt.excluded[c] for c in ("endpoint", "request_hash", "status_code", "response", "expires_at", "updated_at")},
+            where=table.c.expires_at < now,  # only take over an expired key
+        ).returning(table.c.key)
+        if db.execute(stmt).first() is None:
+            db.rollback()
+            begin(db, self.device_id, self.key, self.endpoint, self.body_hash)
+            raise HTTPException(409, detail="request with this Idempotency-Key is still in progress")
+        _maybe_purge(db)
+
+
+def begin(db: Session, device_id: str, key: str | None, endpoint: str, body_hash: str | None = None) -> Idempotency:
+    """Look the key up; raise IdempotentReplay if a live response is stored for the same request."""
+    if key:
+        row = db.get(IdempotencyKey, (device_id, key))
+        if row is not None and _aware(row.expires_at) > datetime.now(timezone.utc):
+            if row.endpoint != endpoint:
+                raise HTTPException(422, detail=f"Idempotency-Key already used for {row.endpoint}")
+            if row.request_hash and body_hash and row.request_hash != body_hash:
+                raise HTTPException(422, detail="Idempotency-Key already used with a different request body")
+            raise IdempotentReplay(row.status_code, row.response)
+    return Idempotency(device_id, key, endpoint, body_hash)
+
+
+def body_hash(raw: bytes) -> str:
+    return hashlib.sha256(raw).hexdigest()
+
+
+def purge_expired(db: Session) -> int:
+    """Delete expired keys. Caller commits."""
+    return (
+        db.query(IdempotencyKey)
+        .filter(IdempotencyKey.expires_at < datetime.now(timezone.utc))
+        .delete(synchronize_session=False)
+    )
+
+
+def _maybe_purge(db: Session) -> None:
+    global _last_purge
+    with _purge_lock:
+        if time.monotonic() - _last_purge < PURGE_INTERVAL_S:
+            return
+        _last_purge = time.monotonic()
+    purge_expired(db)
+
+
+def _aware(dt: datetime) -> datetime:
+    # SQLite hands back naive datetimes (stored as UTC)
+    return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
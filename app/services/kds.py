@@ -0,0 +1,135 @@
+"""
+Kitchen display (KDS) feed: every change to a station's tickets is appended to
+KitchenTicketEvent and pushed to that station's screens over the hub.
+
+    kds.record(db, [kds.event(t, kds.TICKET_CREATED, ...), ...])   # before commit
+
+Event seq doubles as the SSE event id: a screen that reconnects with
+Last-Event-ID gets the station's events after it from the table, then the
+live ones. Events are published only when the transaction commits.
+"""
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+import orjson
+from sqlalchemy import func, insert, select
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models.core import KitchenTicket, KitchenTicketEvent, KOTStatus
+from app.services.hub import hub
+
+TICKET_CREATED = "TICKET_CREATED"
+ITEM_ADDED = "ITEM_ADDED"
+STATUS = "STATUS"
+CANCELLED = "CANCELLED"
+
+# the kitchen workflow; anything else is a 409
+NEXT_STATUS = {
+    KOTStatus.NEW: KOTStatus.IN_PROGRESS,
+    KOTStatus.IN_PROGRESS: KOTStatus.READY,
+    KOTStatus.READY: KOTStatus.DONE,
+}
+
+# events per replay query when a screen catches up
+REPLAY_PAGE = 1000
+
+# Postgres NOTIFY payloads are capped at 8000 bytes; bigger commits go out in pieces
+_NOTIFY_BUDGET = 6000
+
+# old events are deleted at most this often, from whichever write gets there first
+PURGE_INTERVAL_S = 300
+_last_purge = 0.0
+_purge_lock = threading.Lock()
+
+
+def topic(station_id: str) -> str:
+    return f"kds:{station_id}"
+
+
+def event(t: KitchenTicket | dict, type: str, **data) -> dict:
+    """An unsaved event for ticket `t` (ORM object or bulk-insert row)."""
+    get = t.get if isinstance(t, dict) else lambda k: getattr(t, k)
+    return {"station_id": get("target_station"), "ticket_id": get("id"), "order_id": get("order_id"), "type": type, **data}
+
+
+def record(db: Session, events: list[dict]) -> None:
+    """
+    Append events (one executemany) and queue them for the station feeds.
+    Events for tickets without a station are dropped. Caller commits.
+    """
+    events = [e for e in events if e.get("station_id")]
+    if not events:
+        return
+    now = datetime.now(timezone.utc)
+    table = KitchenTicketEvent.__table__
+    rows = [
+        {
+            "station_id": e["station_id"], "ticket_id": e["ticket_id"], "type": e["type"],
+            "payload": orjson.dumps(e).decode(), "created_at": now, "updated_at": now, "version": 1,
+        }
+        for e in events
+    ]
+    seqs = db.connection().execute(
+        insert(table).returning(table.c.seq, sort_by_parameter_order=True), rows
+    ).scalars().all()
+
+    at = now.isoformat()
+    by_station: dict[str, list[dict]] = {}
+    for seq, e in zip(seqs, events):
+        by_station.setdefault(e["station_id"], []).append({"seq": seq, "at": at, **e})
+    for station_id, evs in by_station.items():
+        for chunk in _chunks(evs):
+            hub.publish_after_commit(db, topic(station_id), {"events": chunk})
+    _maybe_purge(db)
+
+
+def _chunks(events: list[dict]):
+    chunk, size = [], 0
+    for e in events:
+        n = len(orjson.dumps(e))
+        if chunk and size + n > _NOTIFY_BUDGET:
+            yield chunk
+            chunk, size = [], 0
+        chunk.append(e)
+        size += n
+    if chunk:
+        yield chunk
+
+
+def replay(db: Session, station_id: str, after: int, limit: int = REPLAY_PAGE) -> list[dict]:
+    """The station's events with seq > `after`, oldest first."""
+    t = KitchenTicketEvent.__table__
+    rows = db.execute(
+        select(t.c.seq, t.c.payload, t.c.created_at)
+        .where(t.c.station_id == station_id, t.c.seq > after)
+        .order_by(t.c.seq.asc())
+        .limit(limit)
+    ).all()
+    return [{"seq": r.seq, "at": r.created_at.isoformat(), **orjson.loads(r.payload)} for r in rows]
+
+
+def last_seq(db: Session, station_id: str) -> int:
+    return db.execute(
+        select(func.max(KitchenTicketEvent.seq)).where(KitchenTicketEvent.station_id == station_id)
+    ).scalar() or 0
+
+
+def purge_events(db: Session) -> int:
+    """Delete events older than KDS_EVENT_RETENTION_H. Caller commits."""
+    cutoff = datetime.now(timezone.utc) - timedelta(hours=settings.KDS_EVENT_RETENTION_H)
+    return (
+        db.query(KitchenTicketEvent)
+        .filter(KitchenTicketEvent.created_at < cutoff)
+        .delete(synchronize_session=False)
+    )
+
+
+def _maybe_purge(db: Session) -> None:
+    global _last_purge
+    with _purge_lock:
+        if time.monotonic() - _last_purge < PURGE_INTERVAL_S:
+            return
+        _last_purge = time.monotonic()
+    purge_events(db)
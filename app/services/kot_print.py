@@ -0,0 +1,138 @@
+"""
+Automatic KOT printing. Lines added to a station's ticket are queued as one
+KOT print job per (ticket, debounce window): the first line creates a job due
+KOT_DEBOUNCE_S later, lines arriving before it is sent are appended to the
+same job. The job lives in print_job (same transaction as the lines), so a
+KOT is never lost between the order write and the printer.
+
+Station -> printer routing is cached per process for KOT_ROUTE_CACHE_TTL_S;
+settings writes call invalidate_routes().
+"""
+import threading
+import time
+from datetime import datetime, timezone
+from typing import NamedTuple
+
+import orjson
+from sqlalchemy import and_, update
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models.core import KitchenStation, KitchenTicket, KitchenTicketItem, MenuItem, Order, OrderItem, Printer, PrintJob, PrintJobStatus
+from app.services import printq
+
+
+class Route(NamedTuple):
+    station_name: str
+    printer: printq.PrinterRef
+
+
+_routes: dict[str, tuple[float, Route | None]] = {}
+_routes_lock = threading.Lock()
+
+
+def route(db: Session, station_id: str) -> Route | None:
+    """The station's printer, or None when it has none (or one without a connection_url)."""
+    now = time.monotonic()
+    hit = _routes.get(station_id)
+    if hit is not None and hit[0] > now:
+        return hit[1]
+    row = (
+        db.query(KitchenStation.name, Printer.id, Printer.tenant_id, Printer.branch_id)
+        .outerjoin(Printer, and_(Printer.id == KitchenStation.printer_id, Printer.connection_url.isnot(None)))
+        .filter(KitchenStation.id == station_id)
+        .first()
+    )
+    r = Route(row[0], printq.PrinterRef(*row[1:])) if row is not None and row[1] else None
+    if settings.KOT_ROUTE_CACHE_TTL_S > 0:
+        with _routes_lock:
+            _routes[station_id] = (now + settings.KOT_ROUTE_CACHE_TTL_S, r)
+    return r
+
+
+def invalidate_routes() -> None:
+    with _routes_lock:
+        _routes.clear()
+
+
+def _header(order: Order, ticket_id: str, ticket_no: int, station_id: str, r: Route) -> dict:
+    return {
+        "ticket_id": ticket_id,
+        "ticket_no": ticket_no,
+        "order_id": order.id,
+        "order_no": order.order_no,
+        "channel": getattr(order.channel, "value", order.channel),
+        "table_id": order.table_id,
+        "station_id": station_id,
+        "station": r.station_name,
+    }
+
+
+def queue_lines(db: Session, order: Order, lines: list[dict]) -> None:
+    """
+    Queue newly added ticket lines for printing. Each line is a dict with
+    ticket_id, ticket_no, station_id, order_item_id, item_id, name, qty.
+    Lines for stations without a printer are skipped. Caller commits.
+    """
+    by_ticket: dict[str, list[dict]] = {}
+    for line in lines:
+        by_ticket.setdefault(line["ticket_id"], []).append(line)
+    if not by_ticket:
+        return
+
+    now = datetime.now(timezone.utc)
+    # jobs still inside their debounce window: never tried, due later
+    pending = {
+        j.ref_id: j
+        for j in db.query(PrintJob).filter(
+            PrintJob.kind == "KOT",
+            PrintJob.ref_id.in_(list(by_ticket)),
+            PrintJob.status == PrintJobStatus.QUEUED,
+            PrintJob.attempts == 0,
+            PrintJob.next_attempt_at > now,
+        )
+    }
+    for ticket_id, ticket_lines in by_ticket.items():
+        first = ticket_lines[0]
+        r = route(db, first["station_id"])
+        if r is None:
+            continue
+        items = [
+            {k: line[k] for k in ("order_item_id", "item_id", "name", "qty")}
+            for line in ticket_lines
+        ]
+        job = pending.get(ticket_id)
+        if job is not None and _append(db, job, items):
+            continue
+        header = _header(order, ticket_id, first["ticket_no"], first["station_id"], r)
+        printq.enqueue(db, r.printer, "KOT", {**header, "items": items, "reprint": False},
+                       ref_id=ticket_id, delay_s=settings.KOT_DEBOUNCE_S)
+
+
+def _append(db: Session, job: PrintJob, items: list[dict]) -> bool:
+    """Add items to a debounced job unless a dispatcher claimed it meanwhile."""
+    payload = orjson.loads(job.payload)
+    payload["items"].extend(items)
+    won = db.execute(
+        update(PrintJob)
+        .where(PrintJob.id == job.id, PrintJob.version == job.version, PrintJob.status == PrintJobStatus.QUEUED)
+        .values(payload=orjson.dumps(payload).decode(), updated_at=datetime.now(timezone.utc), version=PrintJob.version + 1)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    return bool(won)
+
+
+def reprint_payload(db: Session, t: KitchenTicket, r: Route) -> dict:
+    """Full ticket (every line so far) for a reprint."""
+    order = db.get(Order, t.order_id)
+    items = [
+        {"order_item_id": ki.order_item_id, "item_id": item_id, "name": name, "qty": ki.qty}
+        for ki, item_id, name in (
+            db.query(KitchenTicketItem, OrderItem.item_id, MenuItem.name)
+            .join(OrderItem, OrderItem.id == KitchenTicketItem.order_item_id)
+            .join(MenuItem, MenuItem.id == OrderItem.item_id)
+            .filter(KitchenTicketItem.ticket_id == t.id)
+            .order_by(KitchenTicketItem.created_at.asc())
+        )
+    ]
+    return {**_header(order, t.id, t.ticket_no, t.target_station, r), "items": items, "reprint": True}
@@ -0,0 +1,48 @@
+"""
+Bulk loading helpers: one `IN (...)` query per relationship, grouped in Python,
+instead of a query per parent row (N+1).
+"""
+from collections import defaultdict
+from typing import Any, Callable, Iterable
+
+from sqlalchemy.orm import Query, Session
+
+# keep well under SQLite's bound-parameter limit
+_CHUNK = 500
+
+
+def _unique(keys: Iterable[Any]) -> list:
+    return list(dict.fromkeys(k for k in keys if k is not None))
+
+
+def load_by_id(db: Session, model, ids: Iterable[str]) -> dict[str, Any]:
+    """{id: row} for all ids, one query per 500 ids."""
+    ids = _unique(ids)
+    out: dict[str, Any] = {}
+    for i in range(0, len(ids), _CHUNK):
+        for row in db.query(model).filter(model.id.in_(ids[i:i + _CHUNK])).all():
+            out[row.id] = row
+    return out
+
+
+def load_grouped(
+    query: Query,
+    column,
+    keys: Iterable[Any],
+    key_of: Callable[[Any], Any] | None = None,
+) -> dict[Any, list]:
+    """
+    Run `query` once per 500 keys with `column IN (...)` and group the rows by
+    key, preserving the query's ordering within each group.
+
+    `key_of` extracts the key from a result row; by default the attribute named
+    like `column` (works for entity queries such as db.query(Modifier)).
+    """
+    keys = _unique(keys)
+    if key_of is None:
+        key_of = lambda row: getattr(row, column.key)  # noqa: E731
+    out: dict[Any, list] = defaultdict(list)
+    for i in range(0, len(keys), _CHUNK):
+        for row in query.filter(column.in_(keys[i:i + _CHUNK])).all():
+            out[key_of(row)].append(row)
+    return out
@@ -0,0 +1,213 @@
+"""
+In-process metrics in the Prometheus text format, served on /metrics.
+
+    REQUESTS = registry.histogram("waah_http_request_duration_seconds", "...", ("method", "route", "status"))
+    REQUESTS.observe(0.012, "GET", "/orders/{order_id}", "200")
+
+Counters and histograms are plain lists of numbers per label set. Each
+family has one lock, taken for a few additions per observation; request
+metrics are recorded on the event loop thread, so it is never contended
+there. Gauges are callbacks read at scrape time and cost nothing between
+scrapes. Counts are per worker process; Prometheus sums them across targets.
+"""
+import bisect
+import threading
+import time
+from typing import Callable, Iterable
+
+from sqlalchemy import event
+
+from app.db import engine
+from app.services import timing
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+
+def _escape(v: str) -> str:
+    return v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _quote(v: str) -> str:
+    return '"' + _escape(v) + '"'
+
+
+def _labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    parts = [f"{n}={_quote(v)}" for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _num(x: float) -> str:
+    return repr(float(x)) if x != int(x) else str(int(x))
+
+
+class _Family:
+    type = ""
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._lock = threading.Lock()
+
+    def _header(self) -> list[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+
+
+class Counter(_Family):
+    type = "counter"
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def render(self) -> list[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return self._header() + [f"{self.name}{_labels(self.labels, k)} {_num(v)}" for k, v in items]
+
+
+class Histogram(_Family):
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = (), buckets: Iterable[float] = LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+        # per label set: [count per bucket (non-cumulative) ..., +Inf count, sum]
+        self._values: dict[tuple[str, ...], list[float]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            row = self._values.get(labels)
+            if row is None:
+                row = self._values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            row[i] += 1
+            row[-1] += value
+
+    def render(self) -> list[str]:
+        with self._lock:
+            items = [(k, list(v)) for k, v in self._values.items()]
+        out = self._header()
+        for k, row in items:
+            cum = 0
+            for le, n in zip(self.buckets, row):
+                cum += n
+                out.append(f"{self.name}_bucket{_labels(self.labels, k, 'le=' + _quote(_num(le)))} {cum}")
+            cum += row[len(self.buckets)]
+            out.append(f"{self.name}_bucket{_labels(self.labels, k, 'le=' + _quote('+Inf'))} {cum}")
+            out.append(f"{self.name}_sum{_labels(self.labels, k)} {_num(row[-1])}")
+            out.append(f"{self.name}_count{_labels(self.labels, k)} {cum}")
+        return out
+
+
+class Gauge(_Family):
+    """Read at scrape time from `fn`, which returns {label values: value}."""
+    type = "gauge"
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...], fn: Callable[[], dict[tuple[str, ...], float]]):
+        super().__init__(name, help, labels)
+        self.fn = fn
+
+    def render(self) -> list[str]:
+        return self._header() + [f"{self.name}{_labels(self.labels, k)} {_num(v)}" for k, v in self.fn().items()]
+
+
+class Registry:
+    def __init__(self):
+        self._families: dict[str, _Family] = {}
+
+    def _add(self, family: _Family):
+        return self._families.setdefault(family.name, family)
+
+    def counter(self, name: str, help: str, labels: tuple[str, ...] = ()) -> Counter:
+        return self._add(Counter(name, help, labels))
+
+    def histogram(self, name: str, help: str, labels: tuple[str, ...] = (), buckets: Iterable[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._add(Histogram(name, help, labels, buckets))
+
+    def gauge(self, name: str, help: str, labels: tuple[str, ...], fn: Callable[[], dict[tuple[str, ...], float]]) -> Gauge:
+        return self._add(Gauge(name, help, labels, fn))
+
+    def render(self) -> str:
+        lines: list[str] = []
+        for family in self._families.values():
+            lines.extend(family.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+# ── HTTP ─────────────────────────────────────────────────────────────────────
+
+HTTP_LABELS = ("method", "route", "status")
+HTTP_DURATION = registry.histogram(
+    "waah_http_request_duration_seconds", "Request latency by route template and status.", HTTP_LABELS)
+HTTP_DB_QUERIES = registry.histogram(
+    "waah_http_request_db_queries", "SQL statements per request.", HTTP_LABELS, QUERY_COUNT_BUCKETS)
+HTTP_DB_SECONDS = registry.counter(
+    "waah_http_request_db_seconds_total", "Time spent in SQL statements, by route.", HTTP_LABELS)
+
+
+@timing.on_request_end
+def _record_request(t: timing.RequestTiming) -> None:
+    labels = (t.method, t.route or timing.UNMATCHED, str(t.status or 0))
+    HTTP_DURATION.observe(t.duration or 0.0, *labels)
+    HTTP_DB_QUERIES.observe(t.db_queries, *labels)
+    if t.db_time:
+        HTTP_DB_SECONDS.inc(*labels, amount=t.db_time)
+
+
+# ── DB pool ──────────────────────────────────────────────────────────────────
+
+POOL_WAIT = registry.histogram(
+    "waah_db_pool_checkout_seconds", "Time to get a connection from the pool.",
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0))
+
+
+def _pool_stats() -> dict[tuple[str, ...], float]:
+    pool = engine.pool
+    out = {}
+    for state, attr in (("in_use", "checkedout"), ("idle", "checkedin"), ("overflow", "overflow"), ("size", "size")):
+        fn = getattr(pool, attr, None)
+        if fn is not None:
+            out[(state,)] = fn()
+    return out
+
+
+registry.gauge("waah_db_pool_connections", "Connection pool state (in_use, idle, overflow, size).", ("state",), _pool_stats)
+
+
+def _time_checkouts(pool) -> None:
+    # Engine.raw_connection() calls pool.connect(); there is no pool event
+    # before a checkout starts waiting, so time the call itself
+    connect = pool.connect
+
+    def timed_connect():
+        t0 = time.perf_counter()
+        try:
+            return connect()
+        finally:
+            POOL_WAIT.observe(time.perf_counter() - t0)
+
+    pool.connect = timed_connect
+
+
+_time_checkouts(engine.pool)
+
+
+@event.listens_for(engine, "engine_disposed")
+def _on_dispose(eng) -> None:
+    _time_checkouts(eng.pool)  # dispose() swaps in a fresh pool
+
+
+# ── print agent ──────────────────────────────────────────────────────────────
+
+PRINT_AGENT = registry.histogram(
+    "waah_print_agent_request_seconds", "Print agent call latency by job kind and outcome.", ("kind", "outcome"))
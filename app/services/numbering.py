@@ -0,0 +1,86 @@
+from datetime import datetime, timezone, date
+from zoneinfo import ZoneInfo
+from fastapi import HTTPException
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.db import dialect_insert
+from app.models.core import Branch, InvoiceSequence, KOTSequence, RestaurantSettings
+
+
+def next_number(db: Session, model, **key) -> int:
+    """
+    Atomically bump `last_no` on the counter row identified by **key and return
+    the new value. One INSERT .. ON CONFLICT DO UPDATE .. RETURNING: the row is
+    locked until the caller's transaction ends (Postgres), or the database write
+    lock is held (SQLite), so numbers are never handed out twice and a rollback
+    gives the number back (no gaps).
+    """
+    table = model.__table__
+    now = datetime.now(timezone.utc)
+    stmt = dialect_insert(db)(table).values(**key, last_no=1, created_at=now, updated_at=now)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=list(key),
+        set_={"last_no": table.c.last_no + 1, "updated_at": now},
+    ).returning(table.c.last_no)
+    return int(db.execute(stmt).scalar_one())
+
+
+def business_day(now: datetime | None = None) -> date:
+    """Today in the restaurant's timezone (settings.TZ)."""
+    now = now or datetime.now(timezone.utc)
+    return now.astimezone(ZoneInfo(settings.TZ)).date()
+
+
+def _fiscal_year(day: date) -> int:
+    """Start year of the fiscal year containing `day`."""
+    return day.year if day.month >= settings.FISCAL_YEAR_START_MONTH else day.year - 1
+
+
+def allocate_invoice_no(db: Session, branch_id: str, now: datetime | None = None) -> str:
+    """
+    Next invoice number for the branch, e.g. INV-MUM1-20261017-0001.
+    Format and reset period come from the branch's RestaurantSettings, falling
+    back to settings.INVOICE_NO_FORMAT / INVOICE_SEQ_RESET. The counter is per
+    branch, so {branch} keeps numbers unique across branches. Caller commits.
+    """
+    rs = db.query(RestaurantSettings).filter(RestaurantSettings.branch_id == branch_id).first()
+    fmt = (rs.invoice_no_format if rs else None) or settings.INVOICE_NO_FORMAT
+    reset = ((rs.invoice_seq_reset if rs else None) or settings.INVOICE_SEQ_RESET).upper()
+
+    day = business_day(now)
+    fy = _fiscal_year(day)
+    period = f"FY{fy}" if reset == "FY" else day.strftime("%Y%m%d")
+
+    branch = _branch_code(db, branch_id)
+    check_invoice_no_format(fmt)  # before the counter moves
+    seq = next_number(db, InvoiceSequence, branch_id=branch_id or "", period=period)
+    return _render(fmt, day, seq, branch)
+
+
+def _render(fmt: str, day: date, seq: int, branch: str) -> str:
+    fy = _fiscal_year(day)
+    try:
+        return fmt.format(date=day, fy=f"{fy}-{(fy + 1) % 100:02d}", seq=seq, branch=branch)
+    except (KeyError, IndexError, ValueError, AttributeError, TypeError) as e:
+        raise HTTPException(422, detail=f"invalid invoice_no_format {fmt!r}: {type(e).__name__}: {e}")
+
+
+def check_invoice_no_format(fmt: str) -> None:
+    """422 unless `fmt` renders with the supported fields ({date}, {fy}, {seq}, {branch})."""
+    _render(fmt, date(2026, 4, 1), 1, "MAIN")
+
+
+def _branch_code(db: Session, branch_id: str) -> str:
+    b = db.get(Branch, branch_id) if branch_id else None
+    return ((b.code if b else None) or (branch_id or "")[:8]).upper()
+
+
+def allocate_kot_no(db: Session, branch_id: str, station_id: str | None, now: datetime | None = None) -> int:
+    """
+    Next KOT ticket number for the station today: 1, 2, 3 ... per
+    (branch, station, business day). Tickets without a station share the
+    branch's "" counter. The counter row stays locked until the caller
+    commits, so allocate as late in the transaction as practical.
+    """
+    return next_number(db, KOTSequence, branch_id=branch_id or "", station_id=station_id or "", day=business_day(now))
@@ -0,0 +1,302 @@
+"""
+Print queue: print requests are written to PrintJob in the request's
+transaction and sent to the printer's agent by a background dispatcher.
+
+    job = printq.enqueue(db, printer, "BILL", payload, ref_id=order.id)   # before commit
+
+The dispatcher runs on the app's event loop (one per worker) with a single
+pooled httpx client. It claims due jobs with a compare-and-set on version,
+keeps at most PRINT_MAX_INFLIGHT_PER_PRINTER of them in flight per printer
+(counted in the database, so across all workers), retries failures with
+exponential backoff and jitter, and marks a job DEAD after
+PRINT_MAX_ATTEMPTS (or at once when the agent rejects it with a 4xx).
+A claimed job carries a lease in next_attempt_at, so a job left SENDING by a
+crashed worker is picked up again once the lease runs out. The result is
+recorded with a compare-and-set on the version the claim wrote: a worker
+whose lease ran out and was taken over cannot overwrite the new claim.
+
+New jobs wake the dispatchers through the hub; otherwise they sleep until
+the next retry is due.
+"""
+import asyncio
+import logging
+import random
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import NamedTuple
+
+import httpx
+import orjson
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import func, or_, select, update
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.db import SessionLocal
+from app.models.core import KitchenTicket, Printer, PrintJob, PrintJobStatus
+from app.services import metrics
+from app.services.hub import hub
+from app.services.loaders import load_by_id
+
+log = logging.getLogger(__name__)
+
+TOPIC = "print"
+
+# jobs looked at per dispatcher pass
+_CLAIM_BATCH = 100
+# a sent job's claim is good for this long (agent timeout plus slack)
+_LEASE_S = 60
+# longest sleep between passes, in case a wake-up got lost
+_IDLE_S = 30
+
+
+class PrinterRef(NamedTuple):
+    """What enqueue needs of a printer, for callers that cache routing."""
+    id: str
+    tenant_id: str
+    branch_id: str
+
+
+def enqueue(
+    db: Session, printer: Printer | PrinterRef, kind: str, payload: dict,
+    ref_id: str | None = None, delay_s: float = 0,
+) -> PrintJob:
+    """Queue a job for `printer`, due `delay_s` from now; it is sent after the caller commits."""
+    job = PrintJob(
+        tenant_id=printer.tenant_id,
+        branch_id=printer.branch_id,
+        printer_id=printer.id,
+        kind=kind,
+        ref_id=ref_id,
+        payload=orjson.dumps(jsonable_encoder({"type": kind, **payload})).decode(),
+        next_attempt_at=datetime.now(timezone.utc) + timedelta(seconds=delay_s),
+    )
+    db.add(job)
+    db.flush()
+    hub.publish_after_commit(db, TOPIC, {"job_id": job.id})
+    return job
+
+
+def job_out(job: PrintJob) -> dict:
+    return {
+        "id": job.id,
+        "kind": job.kind,
+        "ref_id": job.ref_id,
+        "printer_id": job.printer_id,
+        "status": job.status.value,
+        "attempts": job.attempts,
+        "last_error": job.last_error,
+        "next_attempt_at": job.next_attempt_at if job.status == PrintJobStatus.QUEUED else None,
+        "printed_at": job.printed_at,
+        "created_at": job.created_at,
+    }
+
+
+def retry_dead(db: Session, job: PrintJob) -> None:
+    """Put a dead job back in the queue with a fresh attempt budget. Caller commits."""
+    job.status = PrintJobStatus.QUEUED
+    job.attempts = 0
+    job.next_attempt_at = datetime.now(timezone.utc)
+    hub.publish_after_commit(db, TOPIC, {"job_id": job.id})
+
+
+def backoff(attempts: int) -> float:
+    """Seconds before attempt `attempts` + 1: exponential, capped, with jitter."""
+    delay = min(settings.PRINT_BACKOFF_BASE_S * 2 ** (attempts - 1), settings.PRINT_BACKOFF_MAX_S)
+    return delay * random.uniform(0.5, 1.0)
+
+
+# ── dispatcher ───────────────────────────────────────────────────────────────
+
+@dataclass
+class _Claimed:
+    id: str
+    kind: str
+    printer_id: str
+    ref_id: str | None
+    url: str | None
+    payload: str
+    attempts: int
+    version: int  # as written by the claim
+
+
+def _in_session(fn, *args):
+    db = SessionLocal()
+    try:
+        out = fn(db, *args)
+        db.commit()
+        return out
+    finally:
+        db.close()
+
+
+def _claim(db: Session) -> tuple[list[_Claimed], datetime | None]:
+    """
+    Claim due jobs, oldest first, for printers with free slots. A SENDING job
+    whose lease has not run out holds a slot of its printer, whichever worker
+    sent it. Each printer contributes at most its limit to the batch, and
+    printers already at the limit are left out in SQL, so one printer's
+    backlog never crowds the others out of a pass. Returns the claimed jobs
+    and when the next not-yet-due job becomes due.
+    """
+    now = datetime.now(timezone.utc)
+    limit = settings.PRINT_MAX_INFLIGHT_PER_PRINTER
+    inflight = dict(
+        db.query(PrintJob.printer_id, func.count())
+        .filter(PrintJob.status == PrintJobStatus.SENDING, PrintJob.next_attempt_at > now)
+        .group_by(PrintJob.printer_id)
+        .all()
+    )
+    free = {pid: limit - n for pid, n in inflight.items()}
+    due = or_(PrintJob.status == PrintJobStatus.QUEUED, PrintJob.status == PrintJobStatus.SENDING)
+    ranked = (
+        select(PrintJob.id, func.row_number().over(partition_by=PrintJob.printer_id, order_by=PrintJob.created_at.asc()).label("rank"))
+        .where(due, PrintJob.next_attempt_at <= now, PrintJob.printer_id.not_in([pid for pid, n in free.items() if n <= 0]))
+        .subquery()
+    )
+    jobs = (
+        db.query(PrintJob)
+        .join(ranked, ranked.c.id == PrintJob.id)
+        .filter(ranked.c.rank <= limit)
+        .order_by(PrintJob.created_at.asc())
+        .limit(_CLAIM_BATCH)
+        .all()
+    )
+    printers = load_by_id(db, Printer, {j.printer_id for j in jobs})
+    claimed: list[_Claimed] = []
+    for j in jobs:
+        slots = free.get(j.printer_id, limit)
+        if slots <= 0:
+            continue
+        # compare-and-set: another worker may be claiming the same row
+        won = db.execute(
+            update(PrintJob)
+            .where(PrintJob.id == j.id, PrintJob.version == j.version)
+            .values(
+                status=PrintJobStatus.SENDING,
+                attempts=PrintJob.attempts + 1,
+                next_attempt_at=now + timedelta(seconds=_LEASE_S),
+                updated_at=now,
+                version=PrintJob.version + 1,
+            )
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if won:
+            free[j.printer_id] = slots - 1
+            p = printers.get(j.printer_id)
+            claimed.append(_Claimed(
+                j.id, j.kind, j.printer_id, j.ref_id, p.connection_url if p else None, j.payload, j.attempts + 1, j.version + 1,
+            ))
+    next_due = db.query(func.min(PrintJob.next_attempt_at)).filter(due, PrintJob.next_attempt_at > now).scalar()
+    return claimed, next_due
+
+
+def _finish(db: Session, job: _Claimed, error: str | None, retry: bool) -> None:
+    now = datetime.now(timezone.utc)
+    values = {"last_error": error, "updated_at": now, "version": PrintJob.version + 1}
+    if error is None:
+        values.update(status=PrintJobStatus.DONE, printed_at=now)
+    elif not retry or job.attempts >= settings.PRINT_MAX_ATTEMPTS:
+        values.update(status=PrintJobStatus.DEAD)
+    else:
+        values.update(status=PrintJobStatus.QUEUED, next_attempt_at=now + timedelta(seconds=backoff(job.attempts)))
+    # only while our claim stands: after the lease ran out another worker may own the job
+    won = db.execute(
+        update(PrintJob)
+        .where(PrintJob.id == job.id, PrintJob.version == job.version, PrintJob.status == PrintJobStatus.SENDING)
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if not won:
+        log.info("print job %s: claim lost (lease ran out), result not recorded", job.id)
+        return
+    if error is None and job.kind == "KOT" and job.ref_id:
+        t = db.get(KitchenTicket, job.ref_id)
+        if t is not None:
+            t.printed_at = now
+    elif values["status"] == PrintJobStatus.DEAD:
+        log.warning("print job %s (%s) dead after %d attempts: %s", job.id, job.kind, job.attempts, error)
+
+
+class Dispatcher:
+    def __init__(self):
+        self._client: httpx.AsyncClient | None = None
+        self._task: asyncio.Task | None = None
+        self._wake = None
+        self._sending: set[asyncio.Task] = set()
+
+    async def start(self) -> None:
+        if self._task is not None:
+            return
+        self._client = httpx.AsyncClient(
+            timeout=settings.PRINT_AGENT_TIMEOUT_S,
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+        )
+        self._task = asyncio.create_task(self._run(), name="print-dispatcher")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        # let sends already on the wire finish; unfinished ones are re-sent after their lease
+        if self._sending:
+            await asyncio.wait(self._sending, timeout=settings.PRINT_AGENT_TIMEOUT_S)
+        for t in self._sending:
+            t.cancel()
+        await asyncio.gather(self._task, *self._sending, return_exceptions=True)
+        await self._client.aclose()
+        self._task = self._client = None
+
+    async def _run(self) -> None:
+        with hub.subscribe(TOPIC) as wake:
+            self._wake = wake
+            while True:
+                try:
+                    delay = await self.dispatch()
+                except asyncio.CancelledError:
+                    raise
+                except Exception:
+                    log.exception("print dispatcher pass failed")
+                    delay = 5.0
+                await wake.get(timeout=delay)
+                while not wake.queue.empty():  # one pass covers every pending wake-up
+                    wake.queue.get_nowait()
+
+    async def dispatch(self) -> float:
+        """Claim and start sending due jobs. Returns seconds until the next pass is needed."""
+        claimed, next_due = await run_in_threadpool(_in_session, _claim)
+        for job in claimed:
+            task = asyncio.create_task(self._send(job))
+            self._sending.add(task)
+            task.add_done_callback(self._sending.discard)
+        if next_due is None:
+            return _IDLE_S
+        if next_due.tzinfo is None:  # SQLite
+            next_due = next_due.replace(tzinfo=timezone.utc)
+        return min(max((next_due - datetime.now(timezone.utc)).total_seconds(), 0.05), _IDLE_S)
+
+    async def _send(self, job: _Claimed) -> None:
+        try:
+            if not job.url:
+                error, retry = "printer has no connection_url", False
+            else:
+                t0 = time.perf_counter()
+                try:
+                    r = await self._client.post(job.url, content=job.payload, headers={"Content-Type": "application/json"})
+                    error = None if r.is_success else f"HTTP {r.status_code}: {r.text[:200]}"
+                    retry = r.status_code >= 500 or r.status_code in (408, 429)
+                    outcome = "ok" if error is None else f"http_{r.status_code // 100}xx"
+                except httpx.HTTPError as e:
+                    error, retry, outcome = f"{type(e).__name__}: {e}", True, "network_error"
+                metrics.PRINT_AGENT.observe(time.perf_counter() - t0, job.kind, outcome)
+            await run_in_threadpool(_in_session, _finish, job, error, retry)
+        except Exception:
+            log.exception("print job %s: recording the result failed", job.id)
+        finally:
+            if self._wake is not None:
+                self._wake.poke()  # the printer has a free slot again
+
+
+dispatcher = Dispatcher()
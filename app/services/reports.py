@@ -0,0 +1,311 @@
+"""
+Report materialisation: daily sales (ReportDailySales) and the per-day stock
+snapshot (ReportStockSnapshot).
+
+Daily sales are kept current incrementally: closing an order adds its delta to its bucket,
+voiding a closed order takes it back out. refresh_daily_sales rebuilds a day
+from the orders and is only needed for repair.
+
+Rows are keyed by (date, branch_id, channel, provider). Orders without a
+provider are stored under provider "" rather than NULL: the unique constraint
+treats NULLs as distinct, which would defeat ON CONFLICT.
+"""
+import uuid
+from collections import defaultdict
+from datetime import datetime, date, timezone, timedelta
+from decimal import Decimal
+
+from sqlalchemy import String, case, cast, func, literal, update
+from sqlalchemy.orm import Session
+
+from app.db import dialect_insert
+from app.models.core import (
+    Order, OrderItem, OrderStatus, ReportDailySales, ReportStockSnapshot, StockMove, StockMoveType,
+)
+from app.services.billing import _money, refresh_totals
+
+# ── Daily sales ──────────────────────────────────────────────────────────────
+
+_KEY = ("date", "branch_id", "channel", "provider")
+_SUMS = ("orders_count", "gross", "tax", "cgst", "sgst", "igst", "discounts", "net")
+
+
+def day_bounds(day: date) -> tuple[datetime, datetime]:
+    start = datetime.combine(day, datetime.min.time()).replace(tzinfo=timezone.utc)
+    end = datetime.combine(day, datetime.max.time()).replace(tzinfo=timezone.utc)
+    return start, end
+
+
+def _enum_str(v) -> str:
+    if v is None:
+        return ""
+    return v.value if hasattr(v, "value") else str(v)
+
+
+def aggregate_daily_sales(db: Session, day: date, branch_id: str) -> list[dict]:
+    """
+    One grouped query over order + per-order line tax sums for the branch's
+    orders closed on `day`. Returns ReportDailySales rows (not yet written).
+    """
+    start, end = day_bounds(day)
+    closed = (
+        Order.branch_id == branch_id,
+        Order.closed_at.isnot(None), Order.closed_at >= start, Order.closed_at <= end,
+        Order.status == OrderStatus.CLOSED,
+    )
+
+    # legacy orders closed before totals were stored: seed them first
+    for o in db.query(Order).filter(*closed, (Order.grand_total.is_(None)) | (Order.subtotal.is_(None))).all():
+        refresh_totals(db, o)
+    db.flush()
+
+    line_tax = (
+        db.query(
+            OrderItem.order_id.label("order_id"),
+            func.coalesce(func.sum(OrderItem.cgst), 0).label("cgst"),
+            func.coalesce(func.sum(OrderItem.sgst), 0).label("sgst"),
+            func.coalesce(func.sum(OrderItem.igst), 0).label("igst"),
+        )
+        # only the day's orders, not every line in the table; removed lines
+        # are not on the bill (Order.subtotal / grand_total leave them out too)
+        .join(Order, Order.id == OrderItem.order_id)
+        .filter(*closed, OrderItem.deleted_at.is_(None))
+        .group_by(OrderItem.order_id)
+        .subquery()
+    )
+    rows = (
+        db.query(
+            Order.channel,
+            Order.provider,
+            func.max(Order.tenant_id),
+            func.count(Order.id),
+            # per-order rounding first, as the bill shows it
+            func.coalesce(func.sum(func.round(Order.subtotal, 2)), 0),
+            func.coalesce(func.sum(func.round(Order.grand_total, 2)), 0),
+            func.coalesce(func.sum(line_tax.c.cgst), 0),
+            func.coalesce(func.sum(line_tax.c.sgst), 0),
+            func.coalesce(func.sum(line_tax.c.igst), 0),
+        )
+        .outerjoin(line_tax, line_tax.c.order_id == Order.id)
+        .filter(*closed)
+        .group_by(Order.channel, Order.provider)
+        .all()
+    )
+
+    out = []
+    for channel, provider, tenant_id, n, gross, net, cgst, sgst, igst in rows:
+        out.append(dict(
+            date=day,
+            tenant_id=tenant_id or "",
+            branch_id=branch_id,
+            channel=_enum_str(channel),
+            provider=_enum_str(provider),
+            orders_count=int(n),
+            gross=_money(gross),
+            tax=_money(float(cgst) + float(sgst) + float(igst)),
+            cgst=_money(cgst),
+            sgst=_money(sgst),
+            igst=_money(igst),
+            discounts=0.0,
+            net=_money(net),
+        ))
+    return out
+
+
+def upsert_daily_sales(db: Session, rows: list[dict]) -> None:
+    """Write all rows with one INSERT .. ON CONFLICT (uq_report_daily_sales_key) DO UPDATE. Caller commits."""
+    if not rows:
+        return
+    now = datetime.now(timezone.utc)
+    table = ReportDailySales.__table__
+    stmt = dialect_insert(db)(table).values([
+        {**r, "id": str(uuid.uuid4()), "created_at": now, "updated_at": now, "version": 1} for r in rows
+    ])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=list(_KEY),
+        set_={
+            **{c: stmt.excluded[c] for c in ("tenant_id", *_SUMS)},
+            "updated_at": now,
+            "version": table.c.version + 1,
+        },
+    )
+    db.execute(stmt)
+
+
+def refresh_daily_sales(db: Session, day: date, branch_id: str) -> int:
+    """Rebuild the branch's rows for `day` from the orders. Returns the bucket count. Caller commits."""
+    rows = aggregate_daily_sales(db, day, branch_id)
+    existing = db.query(ReportDailySales).filter(ReportDailySales.date == day, ReportDailySales.branch_id == branch_id)
+    # rows written before provider was normalised to ""
+    existing.filter(ReportDailySales.provider.is_(None)).delete(synchronize_session=False)
+    # zero every bucket first: one whose orders were all voided (or moved to
+    # another channel) is not in `rows`, and must not keep its drifted sums
+    existing.update({c: 0 for c in _SUMS}, synchronize_session=False)
+    upsert_daily_sales(db, rows)
+    return len(rows)
+
+
+def _order_delta(db: Session, o: Order, sign: int) -> dict:
+    """The order's contribution to its bucket, times `sign`."""
+    cgst, sgst, igst = db.query(
+        func.coalesce(func.sum(OrderItem.cgst), 0),
+        func.coalesce(func.sum(OrderItem.sgst), 0),
+        func.coalesce(func.sum(OrderItem.igst), 0),
+    ).filter(OrderItem.order_id == o.id, OrderItem.deleted_at.is_(None)).one()
+    return dict(
+        orders_count=sign,
+        gross=sign * _money(o.subtotal or 0),
+        tax=sign * _money(float(cgst) + float(sgst) + float(igst)),
+        cgst=sign * _money(cgst),
+        sgst=sign * _money(sgst),
+        igst=sign * _money(igst),
+        discounts=0.0,
+        net=sign * _money(o.grand_total or 0),
+    )
+
+
+def _order_key(o: Order) -> dict:
+    return dict(
+        date=o.closed_at.astimezone(timezone.utc).date() if o.closed_at.tzinfo else o.closed_at.date(),
+        branch_id=o.branch_id,
+        channel=_enum_str(o.channel),
+        provider=_enum_str(o.provider),
+    )
+
+
+def record_order_closed(db: Session, o: Order) -> None:
+    """
+    Add a just-closed order to its (date, branch, channel, provider) row with
+    one atomic INSERT .. ON CONFLICT DO UPDATE SET col = col + delta.
+    Call after the order's totals and closed_at are final. Caller commits.
+    """
+    db.flush()
+    delta = _order_delta(db, o, 1)
+    now = datetime.now(timezone.utc)
+    table = ReportDailySales.__table__
+    stmt = dialect_insert(db)(table).values(
+        id=str(uuid.uuid4()), tenant_id=o.tenant_id, created_at=now, updated_at=now, version=1,
+        **_order_key(o), **delta,
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=list(_KEY),
+        set_={
+            **{c: table.c[c] + stmt.excluded[c] for c in _SUMS},
+            "updated_at": now,
+            "version": table.c.version + 1,
+        },
+    )
+    db.execute(stmt)
+
+
+def record_order_voided(db: Session, o: Order) -> None:
+    """
+    Take a previously closed order back out of its row. `o.closed_at` must still
+    be the original close time. No row means the order was never counted, so
+    there is nothing to reverse. Caller commits.
+    """
+    delta = _order_delta(db, o, -1)
+    key = _order_key(o)
+    table = ReportDailySales.__table__
+    db.execute(
+        update(table)
+        .where(*(table.c[k] == v for k, v in key.items()))
+        .values(
+            **{c: table.c[c] + v for c, v in delta.items()},
+            updated_at=datetime.now(timezone.utc),
+            version=table.c.version + 1,
+        )
+    )
+
+
+# ── Stock snapshot ───────────────────────────────────────────────────────────
+
+# rows per INSERT statement (SQLite bound-parameter limit)
+_UPSERT_CHUNK = 500
+
+
+def _utc_date(db: Session, col):
+    """DATE of a timestamp in UTC. Postgres' date(timestamptz) uses the session TimeZone."""
+    if db.get_bind().dialect.name == "postgresql":
+        return func.date(func.timezone("UTC", col))
+    return func.date(col)  # SQLite stores UTC
+
+
+def stock_snapshot_rows(db: Session, day_from: date, day_to: date) -> list[dict]:
+    """
+    Opening / purchased / used / closing per ingredient for every day in
+    [day_from, day_to], from one scan of the ledger grouped by (ingredient, day).
+
+    Same definitions as the single-day report: opening is every move before the
+    day, purchased/used are the day's PURCHASE/SALE moves, closing is
+    opening + purchased + used. The next day opens with all of the day's moves.
+    Days are UTC dates.
+    """
+    start, _ = day_bounds(day_from)
+    _, end = day_bounds(day_to)
+    bucket = case(
+        (StockMove.created_at < start, literal("open")),
+        (StockMove.created_at > end, literal("after")),
+        else_=cast(_utc_date(db, StockMove.created_at), String),
+    )
+    qty = StockMove.qty_change
+    rows = (
+        db.query(
+            StockMove.ingredient_id,
+            bucket,
+            func.coalesce(func.sum(qty), 0),
+            func.coalesce(func.sum(case((StockMove.type == StockMoveType.PURCHASE, qty), else_=0)), 0),
+            func.coalesce(func.sum(case((StockMove.type == StockMoveType.SALE, qty), else_=0)), 0),
+        )
+        .group_by(StockMove.ingredient_id, bucket)
+        .all()
+    )
+
+    opening: dict[str, Decimal] = {}
+    per_day: dict[tuple[str, str], tuple[Decimal, Decimal, Decimal]] = {}
+    for ing_id, b, total, purchased, used in rows:
+        opening.setdefault(ing_id, Decimal(0))
+        if b == "open":
+            opening[ing_id] += _qty(total)
+        elif b != "after":
+            per_day[(ing_id, str(b))] = (_qty(total), _qty(purchased), _qty(used))
+
+    out = []
+    day = day_from
+    while day <= day_to:
+        key = day.isoformat()
+        for ing_id in opening:
+            total, purchased, used = per_day.get((ing_id, key), (Decimal(0),) * 3)
+            out.append(dict(
+                at_date=day, ingredient_id=ing_id,
+                opening_qty=float(opening[ing_id]), purchased_qty=float(purchased), used_qty=float(used),
+                closing_qty=float(opening[ing_id] + purchased + used),
+            ))
+            opening[ing_id] += total
+        day += timedelta(days=1)
+    return out
+
+
+def _qty(x) -> Decimal:
+    return Decimal(str(x or 0)).quantize(Decimal("0.001"))
+
+
+def upsert_stock_snapshot(db: Session, rows: list[dict]) -> None:
+    """INSERT .. ON CONFLICT (uq_report_stock_snapshot_key) DO UPDATE, 500 rows per statement. Caller commits."""
+    now = datetime.now(timezone.utc)
+    table = ReportStockSnapshot.__table__
+    insert = dialect_insert(db)
+    for i in range(0, len(rows), _UPSERT_CHUNK):
+        stmt = insert(table).values([
+            {**r, "id": str(uuid.uuid4()), "created_at": now, "updated_at": now, "version": 1}
+            for r in rows[i:i + _UPSERT_CHUNK]
+        ])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["at_date", "ingredient_id"],
+            set_={
+                **{c: stmt.excluded[c] for c in ("opening_qty", "purchased_qty", "used_qty", "closing_qty")},
+                "updated_at": now,
+                "version": table.c.version + 1,
+            },
+        )
+        db.execute(stmt)
@@ -0,0 +1,91 @@
+"""
+Opt-in SQL profiling on top of the timing hooks (app.services.timing).
+
+- Slow-query log: with SQL_SLOW_QUERY_MS > 0, every statement at or over the
+  threshold is logged (logger "app.services.sqlprof") with its duration, row
+  count, the route and request id that issued it, and its fingerprint.
+- Per-request breakdown: with SQL_PROFILE_TOKEN set, a request carrying
+  `X-SQL-Profile: <token>` records each statement, and the response carries
+  the statements grouped by fingerprint (count, total ms, rows), slowest
+  first, as JSON in the X-SQL-Profile header. Many executions of one
+  fingerprint in a request is the N+1 signature.
+
+Fingerprints replace literals and bind parameters with ? and collapse
+IN lists and multi-row VALUES, so the same query shape groups together
+whatever its arguments.
+"""
+import json
+import logging
+import re
+
+from app.config import settings
+
+log = logging.getLogger(__name__)
+
+HEADER = "X-SQL-Profile"
+# fingerprints in the response header; the rest are summed into one "<other>" entry
+MAX_HEADER_ENTRIES = 20
+_MAX_SQL_CHARS = 300
+
+_RE_STRING = re.compile(r"'(?:[^']|'')*'")
+_RE_PARAM = re.compile(r"%\(\w+\)s|\$\d+|:\w+|\?")
+_RE_NUMBER = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+_RE_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_RE_ROWS = re.compile(r"\(\?\+\)(?:\s*,\s*\(\?\+\))+")
+_RE_SPACE = re.compile(r"\s+")
+
+
+def fingerprint(statement: str) -> str:
+    s = _RE_STRING.sub("?", statement)
+    s = _RE_PARAM.sub("?", s)
+    s = _RE_NUMBER.sub("?", s)
+    s = _RE_LIST.sub("(?+)", s)
+    s = _RE_ROWS.sub("(?+), ...", s)
+    return _RE_SPACE.sub(" ", s).strip()
+
+
+def enabled_for(header_value: str | None) -> bool:
+    """Whether a request with this X-SQL-Profile header value gets a breakdown."""
+    return bool(settings.SQL_PROFILE_TOKEN) and header_value == settings.SQL_PROFILE_TOKEN
+
+
+def slow_threshold_s() -> float:
+    return settings.SQL_SLOW_QUERY_MS / 1000
+
+
+def log_slow(t, statement: str, duration: float, rows: int | None) -> None:
+    """`t` is the current RequestTiming, or None outside a request (background tasks)."""
+    log.warning(
+        "slow query %.1f ms rows=%s route=%s request_id=%s: %s",
+        duration * 1000, rows,
+        t.route_template() if t else "-", t.request_id if t else "-",
+        fingerprint(statement)[:_MAX_SQL_CHARS],
+    )
+
+
+def breakdown(statements: list[tuple[str, float, int | None]]) -> list[dict]:
+    """Group (statement, seconds, rows) by fingerprint, slowest total first."""
+    groups: dict[str, dict] = {}
+    for statement, duration, rows in statements:
+        fp = fingerprint(statement)
+        g = groups.get(fp)
+        if g is None:
+            g = groups[fp] = {"sql": fp[:_MAX_SQL_CHARS], "n": 0, "ms": 0.0, "rows": 0}
+        g["n"] += 1
+        g["ms"] += duration * 1000
+        g["rows"] += rows if rows and rows > 0 else 0
+    out = sorted(groups.values(), key=lambda g: g["ms"], reverse=True)
+    for g in out:
+        g["ms"] = round(g["ms"], 2)
+    return out
+
+
+def header_value(statements: list[tuple[str, float, int | None]]) -> str:
+    entries = breakdown(statements)
+    if len(entries) > MAX_HEADER_ENTRIES:
+        rest = entries[MAX_HEADER_ENTRIES:]
+        entries = entries[:MAX_HEADER_ENTRIES] + [{
+            "sql": "<other>", "n": sum(g["n"] for g in rest),
+            "ms": round(sum(g["ms"] for g in rest), 2), "rows": sum(g["rows"] for g in rest),
+        }]
+    return json.dumps(entries, separators=(",", ":"))  # ASCII-only, safe as a header
@@ -0,0 +1,100 @@
+"""
+Running stock balances (IngredientBalance) kept next to the StockMove ledger.
+
+Every ingredient has a tenant-wide row (branch_id "") and one row per branch
+that has moved it. Ledger writes go through record_moves() in the same
+transaction, so each row equals SUM(stock_move.qty_change) for its key and
+stock checks never aggregate the ledger. rebuild_balances() recomputes them.
+"""
+from collections import defaultdict
+from datetime import datetime, timezone
+from decimal import Decimal
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.db import dialect_insert
+from app.models.core import Ingredient, IngredientBalance, StockMove
+from app.services.loaders import load_by_id
+
+ALL_BRANCHES = ""
+
+# rows per INSERT statement (SQLite bound-parameter limit)
+_CHUNK = 500
+
+
+def _balance_row(ing: Ingredient | None, ingredient_id: str, branch_id: str, qty: Decimal, now: datetime) -> dict:
+    return dict(
+        ingredient_id=ingredient_id,
+        branch_id=branch_id,
+        tenant_id=ing.tenant_id if ing else "",
+        qty=qty,
+        created_at=now,
+        updated_at=now,
+        version=1,
+    )
+
+
+def init_balance(db: Session, ing: Ingredient) -> None:
+    """Zero tenant-wide balance for a new ingredient, so it shows up in low stock. Caller commits."""
+    db.add(IngredientBalance(ingredient_id=ing.id, branch_id=ALL_BRANCHES, tenant_id=ing.tenant_id, qty=0))
+
+
+def record_moves(db: Session, moves: list[StockMove]) -> None:
+    """
+    Apply ledger rows to the balances: one INSERT .. ON CONFLICT DO UPDATE
+    SET qty = qty + delta for the touched (ingredient, branch) keys.
+    Call with the same moves that are being written. Caller commits.
+    """
+    deltas: dict[tuple[str, str], Decimal] = defaultdict(Decimal)
+    for m in moves:
+        q = Decimal(str(m.qty_change or 0))
+        deltas[(m.ingredient_id, ALL_BRANCHES)] += q
+        if m.branch_id:
+            deltas[(m.ingredient_id, m.branch_id)] += q
+    if not deltas:
+        return
+
+    ings = load_by_id(db, Ingredient, (ing_id for ing_id, _ in deltas))
+    now = datetime.now(timezone.utc)
+    table = IngredientBalance.__table__
+    stmt = dialect_insert(db)(table).values([
+        _balance_row(ings.get(ing_id), ing_id, branch_id, qty, now)
+        for (ing_id, branch_id), qty in sorted(deltas.items())  # fixed lock order
+    ])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["ingredient_id", "branch_id"],
+        set_={"qty": table.c.qty + stmt.excluded.qty, "updated_at": now, "version": table.c.version + 1},
+    )
+    db.execute(stmt)
+
+
+def rebuild_balances(db: Session, tenant_id: str | None = None) -> int:
+    """Recompute balances from the full ledger (one grouped scan). Returns the row count. Caller commits."""
+    ing_q = db.query(Ingredient)
+    if tenant_id:
+        ing_q = ing_q.filter(Ingredient.tenant_id == tenant_id)
+    ings = {i.id: i for i in ing_q.all()}
+
+    totals: dict[tuple[str, str], Decimal] = defaultdict(Decimal)
+    for ing_id in ings:
+        totals[(ing_id, ALL_BRANCHES)] = Decimal(0)
+    sums = db.query(StockMove.ingredient_id, StockMove.branch_id, func.coalesce(func.sum(StockMove.qty_change), 0))
+    if tenant_id:
+        sums = sums.join(Ingredient, Ingredient.id == StockMove.ingredient_id).filter(Ingredient.tenant_id == tenant_id)
+    for ing_id, branch_id, qty in sums.group_by(StockMove.ingredient_id, StockMove.branch_id).all():
+        q = Decimal(str(qty))
+        totals[(ing_id, ALL_BRANCHES)] += q
+        if branch_id:
+            totals[(ing_id, branch_id)] += q
+
+    del_q = db.query(IngredientBalance)
+    if tenant_id:
+        del_q = del_q.filter(IngredientBalance.tenant_id == tenant_id)
+    del_q.delete(synchronize_session=False)
+
+    now = datetime.now(timezone.utc)
+    rows = [_balance_row(ings.get(ing_id), ing_id, branch_id, qty, now) for (ing_id, branch_id), qty in totals.items()]
+    for i in range(0, len(rows), _CHUNK):
+        db.execute(IngredientBalance.__table__.insert(), rows[i:i + _CHUNK])
+    return len(rows)
@@ -0,0 +1,107 @@
+"""
+Sync ledger compaction and retention.
+
+compact() folds events up to a watermark into SyncSnapshot (latest event per
+(entity, entity_id), deletes dropped), incrementally from the last watermark.
+New devices bootstrap from the snapshot plus the tail after the watermark,
+so bootstrap cost follows the number of live entities, not the ledger length.
+
+prune() deletes events at or below the watermark that every active device has
+already acknowledged (SyncCheckpoint) and that are older than
+SYNC_RETAIN_DAYS; clients pulling without a device_id have no checkpoint, so
+the age floor is all that protects them. Clients behind the pruned point get
+410 from /sync/pull and must bootstrap again.
+"""
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import func, select, tuple_
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.db import dialect_insert
+from app.models.core import SyncCheckpoint, SyncCompaction, SyncEvent, SyncSnapshot
+
+# events folded per statement
+_CHUNK = 500
+
+
+def compaction_state(db: Session) -> SyncCompaction:
+    state = db.get(SyncCompaction, 1)
+    if state is None:
+        state = SyncCompaction(id=1, watermark=0, pruned_through=0)
+        db.add(state)
+        db.flush()
+    return state
+
+
+def compact(db: Session) -> dict:
+    """Advance the snapshot to the newest event older than SYNC_COMPACT_LAG_S. Caller commits."""
+    state = compaction_state(db)
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=settings.SYNC_COMPACT_LAG_S)
+    ev = SyncEvent.__table__
+    watermark = db.execute(
+        select(func.max(ev.c.seq)).where(ev.c.seq > state.watermark, ev.c.created_at < cutoff)
+    ).scalar()
+    if watermark is None:
+        return {"watermark": state.watermark, "upserted": 0, "deleted": 0}
+
+    # last event per key in (old watermark, new watermark]
+    latest = (
+        select(func.max(ev.c.seq).label("seq"))
+        .where(ev.c.seq > state.watermark, ev.c.seq <= watermark)
+        .group_by(ev.c.entity, ev.c.entity_id)
+        .subquery()
+    )
+    rows = db.execute(
+        select(ev.c.seq, ev.c.entity, ev.c.entity_id, ev.c.op, ev.c.payload, ev.c.device_id, ev.c.tenant_id, ev.c.branch_id, ev.c.updated_at)
+        .join(latest, latest.c.seq == ev.c.seq)
+    ).all()
+
+    upserts = [r._asdict() for r in rows if r.op != "DELETE"]
+    deletes = [(r.entity, r.entity_id) for r in rows if r.op == "DELETE"]
+
+    snap = SyncSnapshot.__table__
+    now = datetime.now(timezone.utc)
+    insert = dialect_insert(db)
+    for i in range(0, len(upserts), _CHUNK):
+        stmt = insert(snap).values([{**r, "created_at": now, "version": 1} for r in upserts[i:i + _CHUNK]])
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=["entity", "entity_id"],
+            set_={c: stmt.excluded[c] for c in ("seq", "op", "payload", "device_id", "tenant_id", "branch_id", "updated_at")},
+        ))
+    for i in range(0, len(deletes), _CHUNK):
+        db.execute(snap.delete().where(tuple_(snap.c.entity, snap.c.entity_id).in_(deletes[i:i + _CHUNK])))
+
+    state.watermark = watermark
+    return {"watermark": watermark, "upserted": len(upserts), "deleted": len(deletes)}
+
+
+def prune(db: Session) -> dict:
+    """
+    Delete events every active device has passed, up to the watermark and
+    never younger than SYNC_RETAIN_DAYS. Checkpoints untouched for
+    SYNC_DEVICE_STALE_DAYS don't count. Caller commits.
+    """
+    state = compaction_state(db)
+    now = datetime.now(timezone.utc)
+    stale = now - timedelta(days=settings.SYNC_DEVICE_STALE_DAYS)
+    slowest = (
+        db.query(func.min(SyncCheckpoint.last_seq))
+        .filter(SyncCheckpoint.updated_at >= stale)
+        .scalar()
+    )
+    # newest event past retention (run from cron: a backward walk of the seq index)
+    aged = (
+        db.query(func.max(SyncEvent.seq))
+        .filter(SyncEvent.seq > state.pruned_through, SyncEvent.created_at < now - timedelta(days=settings.SYNC_RETAIN_DAYS))
+        .scalar()
+    )
+    through = min(state.watermark, aged or 0)
+    if slowest is not None:
+        through = min(through, slowest)
+    if through <= state.pruned_through:
+        return {"pruned": 0, "pruned_through": state.pruned_through}
+
+    n = db.query(SyncEvent).filter(SyncEvent.seq <= through).delete(synchronize_session=False)
+    state.pruned_through = through
+    return {"pruned": n, "pruned_through": through}
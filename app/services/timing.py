@@ -0,0 +1,101 @@
+"""
+Per-request timing: wall time, route template, status, and the number and
+duration of SQL statements the request ran.
+
+RequestIdMiddleware opens a RequestTiming for every HTTP request and keeps it
+in a context variable; the engine hooks below add each statement executed
+while it is current (threadpool endpoints inherit the context). When the
+request ends, the callbacks registered with on_request_end() get it.
+
+    @timing.on_request_end
+    def record(t: timing.RequestTiming) -> None: ...
+"""
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Callable
+
+from sqlalchemy import event
+
+from app.config import settings
+from app.db import engine
+from app.services import sqlprof
+
+UNMATCHED = "<unmatched>"
+
+
+@dataclass(slots=True)
+class RequestTiming:
+    request_id: str
+    method: str
+    path: str
+    start: float = field(default_factory=time.perf_counter)
+    route: str | None = None  # template, e.g. "/orders/{order_id}/items"
+    status: int | None = None
+    duration: float | None = None  # seconds, set when the request ends
+    db_queries: int = 0
+    db_time: float = 0.0  # seconds
+    # (statement, seconds, rows) for every statement, when profiling this request
+    statements: list | None = None
+    scope: dict | None = field(default=None, repr=False)
+
+    def route_template(self) -> str:
+        route = (self.scope or {}).get("route")
+        return getattr(route, "path", None) or UNMATCHED
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.start
+
+    def server_timing(self) -> str:
+        """Server-Timing header value as of now."""
+        return f'app;dur={self.elapsed() * 1000:.1f}, db;dur={self.db_time * 1000:.1f};desc="{self.db_queries} queries"'
+
+
+_current: ContextVar[RequestTiming | None] = ContextVar("request_timing", default=None)
+_listeners: list[Callable[[RequestTiming], None]] = []
+
+
+def current() -> RequestTiming | None:
+    return _current.get()
+
+
+def begin(t: RequestTiming):
+    return _current.set(t)
+
+
+def end(t: RequestTiming, token) -> None:
+    t.duration = t.elapsed()
+    _current.reset(token)
+    for fn in _listeners:
+        fn(t)
+
+
+def on_request_end(fn: Callable[[RequestTiming], None]) -> Callable[[RequestTiming], None]:
+    """Register `fn(timing)` to run after every request. Keep it cheap: it is on the hot path."""
+    _listeners.append(fn)
+    return fn
+
+
+# ── SQL ──────────────────────────────────────────────────────────────────────
+
+@event.listens_for(engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None or settings.SQL_SLOW_QUERY_MS:
+        # on the execution context, not the connection: a failed statement never reaches after_
+        context._timing_t0 = time.perf_counter()
+
+
+@event.listens_for(engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    t0 = getattr(context, "_timing_t0", None)
+    if t0 is None:
+        return
+    duration = time.perf_counter() - t0
+    t = _current.get()
+    if t is not None:
+        t.db_time += duration
+        t.db_queries += 1
+        if t.statements is not None:
+            t.statements.append((statement, duration, cursor.rowcount))
+    if settings.SQL_SLOW_QUERY_MS and duration >= sqlprof.slow_threshold_s():
+        sqlprof.log_slow(t, statement, duration, cursor.rowcount)
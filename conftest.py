@@ -35,3 +35,42 @@ def auth_headers(client, base_url):
 def rng_suffix():
     import random, string
     return "".join(random.choices(string.ascii_lowercase + string.digits, k=6))
+
+# ── In-process app (no live server) ─────────────────────────────────────────
+# For tests that need to look inside the process (query counts, plans): the app
+# runs on a throwaway SQLite file via TestClient.
+
+@pytest.fixture(scope="session")
+def app_client(tmp_path_factory):
+    os.environ["DB_URL"] = f"sqlite:///{tmp_path_factory.mktemp('db') / 'waah.db'}"
+    os.environ.setdefault("APP_SECRET", "test-secret")
+    # tests drive printq.Dispatcher themselves, against a fake agent
+    os.environ["PRINT_DISPATCHER_ENABLED"] = "0"
+    os.environ["AUTO_MIGRATE"] = "1"  # fresh database: migrate at startup
+    from fastapi.testclient import TestClient
+    from app.main import app
+    with TestClient(app) as c:
+        boot = c.post("/admin/dev-bootstrap").json()
+        r = c.post("/auth/login", params={"mobile": "9999999999", "password": "admin"})
+        c.headers["Authorization"] = f"Bearer {r.json()['access_token']}"
+        c.boot = boot
+        yield c
+
+@pytest.fixture()
+def count_queries():
+    """Context manager counting SQL statements sent on app.db.engine."""
+    from contextlib import contextmanager
+    from sqlalchemy import event
+    from app.db import engine
+
+    @contextmanager
+    def _count():
+        n = {"queries": 0}
+        def _on_execute(conn, cursor, statement, parameters, context, executemany):
+            n["queries"] += 1
+        event.listen(engine, "before_cursor_execute", _on_execute)
+        try:
+            yield n
+        finally:
+            event.remove(engine, "before_cursor_execute", _on_execute)
+    return _count
@@ -0,0 +1,98 @@
+# test_idempotency.py
+# Idempotency-Key: a retried mutation replays the stored response, once.
+import uuid
+
+
+def ok(r):
+    assert 200 <= r.status_code < 300, f"{r.request.method} {r.request.url} -> {r.status_code}: {r.text}"
+    return r.json()
+
+
+def _count(model, **filters):
+    from app.db import SessionLocal
+
+    db = SessionLocal()
+    try:
+        return db.query(model).filter_by(**filters).count()
+    finally:
+        db.close()
+
+
+def test_sync_push_retry_is_not_reinserted(app_client):
+    from app.models.core import SyncEvent
+
+    device = str(uuid.uuid4())
+    body = {"device_id": device, "ops": [{"entity": "order", "entity_id": str(uuid.uuid4()), "op": "UPSERT", "payload": {}} for _ in range(3)]}
+    headers = {"Idempotency-Key": "push-1"}
+    first = app_client.post("/sync/push", json=body, headers=headers)
+    retry = app_client.post("/sync/push", json=body, headers=headers)
+    assert ok(first) == ok(retry)
+    assert retry.headers.get("Idempotent-Replayed") == "true"
+    assert _count(SyncEvent, device_id=device) == 3
+
+    # same key from another device is a different request
+    other = dict(body, device_id=str(uuid.uuid4()))
+    assert ok(app_client.post("/sync/push", json=other, headers=headers))["first_seq"] != ok(first)["first_seq"]
+
+
+def test_order_mutations_replay(app_client):
+    from app.models.core import Order, OrderItem, Payment
+
+    b = app_client.boot
+    dev = {"X-Device-Id": f"pos-{uuid.uuid4().hex[:8]}"}
+    order_no = f"IK-{uuid.uuid4().hex[:8]}"
+    body = {"tenant_id": b["tenant_id"], "branch_id": b["branch_id"], "order_no": order_no, "channel": "DINE_IN"}
+    oid = ok(app_client.post("/orders/", json=body, headers={**dev, "Idempotency-Key": "open"}))["id"]
+    assert ok(app_client.post("/orders/", json=body, headers={**dev, "Idempotency-Key": "open"}))["id"] == oid
+    assert _count(Order, order_no=order_no) == 1
+
+    cat = ok(app_client.post("/menu/categories", json={"tenant_id": b["tenant_id"], "branch_id": b["branch_id"], "name": "IK"}))["id"]
+    item = ok(app_client.post("/menu/items", json={"tenant_id": b["tenant_id"], "category_id": cat, "name": "Tea", "gst_rate": 5.0}))["id"]
+    line = {"order_id": oid, "item_id": item, "qty": 1, "unit_price": 20}
+    a = ok(app_client.post(f"/orders/{oid}/items", json=line, headers={**dev, "Idempotency-Key": "line-1"}))
+    assert ok(app_client.post(f"/orders/{oid}/items", json=line, headers={**dev, "Idempotency-Key": "line-1"})) == a
+    assert _count(OrderItem, order_id=oid) == 1
+
+    pay = {"order_id": oid, "mode": "CASH", "amount": 21}
+    p1 = ok(app_client.post(f"/orders/{oid}/pay", json=pay, headers={**dev, "Idempotency-Key": "pay-1"}))
+    assert ok(app_client.post(f"/orders/{oid}/pay", json=pay, headers={**dev, "Idempotency-Key": "pay-1"})) == p1
+    assert _count(Payment, order_id=oid) == 1
+
+    # a key reused on a different endpoint is rejected
+    r = app_client.post(f"/orders/{oid}/pay", json=pay, headers={**dev, "Idempotency-Key": "line-1"})
+    assert r.status_code == 422
+
+
+def test_expired_key_is_reusable(app_client):
+    from datetime import datetime, timedelta, timezone
+    from app.db import SessionLocal
+    from app.models.core import IdempotencyKey, SyncEvent
+
+    device = str(uuid.uuid4())
+    body = {"device_id": device, "ops": [{"entity": "x", "entity_id": "1", "op": "UPSERT"}]}
+    ok(app_client.post("/sync/push", json=body, headers={"Idempotency-Key": "k"}))
+    db = SessionLocal()
+    db.get(IdempotencyKey, (device, "k")).expires_at = datetime.now(timezone.utc) - timedelta(seconds=1)
+    db.commit()
+    db.close()
+    ok(app_client.post("/sync/push", json=body, headers={"Idempotency-Key": "k"}))
+    assert _count(SyncEvent, device_id=device) == 2
+
+
+def test_key_reused_with_a_different_body_is_rejected(app_client):
+    from app.models.core import SyncEvent
+
+    device = str(uuid.uuid4())
+    body = {"device_id": device, "ops": [{"entity": "x", "entity_id": "1", "op": "UPSERT"}]}
+    ok(app_client.post("/sync/push", json=body, headers={"Idempotency-Key": "k"}))
+    changed = dict(body, ops=[{"entity": "x", "entity_id": "2", "op": "UPSERT"}])
+    r = app_client.post("/sync/push", json=changed, headers={"Idempotency-Key": "k"})
+    assert r.status_code == 422
+    assert _count(SyncEvent, device_id=device) == 1
+
+    # same for the Depends(idempotent) endpoints
+    b, dev = app_client.boot, {"X-Device-Id": device}
+    order = {"tenant_id": b["tenant_id"], "branch_id": b["branch_id"], "order_no": f"I-{uuid.uuid4().hex[:8]}", "channel": "DINE_IN"}
+    ok(app_client.post("/orders/", json=order, headers={**dev, "Idempotency-Key": "open"}))
+    r = app_client.post("/orders/", json=dict(order, order_no="other"), headers={**dev, "Idempotency-Key": "open"})
+    assert r.status_code == 422
@@ -0,0 +1,58 @@
+# test_invoice_numbering.py
+# Invoice numbers: a counter per branch, with the branch in the number, so two
+# branches invoicing on the same day never produce the same invoice_no.
+import uuid
+
+
+def test_branches_do_not_share_invoice_numbers(app_client):
+    from app.db import SessionLocal
+    from app.models.core import Branch
+    from app.services.numbering import allocate_invoice_no
+
+    db = SessionLocal()
+    try:
+        tenant = app_client.boot["tenant_id"]
+        code = f"B{uuid.uuid4().hex[:6]}".upper()
+        coded = Branch(tenant_id=tenant, name="Coded", code=code)
+        plain = Branch(tenant_id=tenant, name="Plain")
+        db.add_all([coded, plain])
+        db.flush()
+
+        a = [allocate_invoice_no(db, coded.id) for _ in range(2)]
+        b = [allocate_invoice_no(db, plain.id) for _ in range(2)]
+        db.rollback()
+    finally:
+        db.close()
+
+    assert a[0].startswith(f"INV-{code}-") and a[0].endswith("-0001") and a[1].endswith("-0002")
+    assert b[0].startswith(f"INV-{plain.id[:8].upper()}-") and b[0].endswith("-0001")
+    assert len(set(a + b)) == 4
+
+
+def test_bad_invoice_no_format_is_a_422(app_client):
+    import pytest
+    from fastapi import HTTPException
+    from app.db import SessionLocal
+    from app.models.core import Branch, InvoiceSequence, RestaurantSettings
+    from app.services.numbering import allocate_invoice_no
+
+    b = app_client.boot
+    for bad in ("INV-{store}-{seq}", "INV-{seq:04d", "INV-{date:%Y}-{seq:x.y}"):
+        r = app_client.post("/settings/restaurant", json={"tenant_id": b["tenant_id"], "branch_id": b["branch_id"], "invoice_no_format": bad})
+        assert r.status_code == 422, bad
+
+    # a bad format already stored: a 4xx, and the counter does not move
+    db = SessionLocal()
+    try:
+        branch = Branch(tenant_id=b["tenant_id"], name="Typo")
+        db.add(branch)
+        db.flush()
+        db.add(RestaurantSettings(tenant_id=b["tenant_id"], branch_id=branch.id, name="Typo", invoice_no_format="INV-{store}-{seq}"))
+        db.flush()
+        with pytest.raises(HTTPException) as e:
+            allocate_invoice_no(db, branch.id)
+        assert e.value.status_code == 422
+        assert db.query(InvoiceSequence).filter(InvoiceSequence.branch_id == branch.id).count() == 0
+        db.rollback()
+    finally:
+        db.close()
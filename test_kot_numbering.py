@@ -0,0 +1,65 @@
+# test_kot_numbering.py
+# KOT ticket numbers: 1, 2, 3 ... per (branch, station, business day), with
+# no duplicates when several terminals enter orders at once.
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+
+def ok(r):
+    assert 200 <= r.status_code < 300, f"{r.request.method} {r.request.url} -> {r.status_code}: {r.text}"
+    return r.json()
+
+
+def _station_item(c, name):
+    b = c.boot
+    st = ok(c.post("/settings/stations", json={"tenant_id": b["tenant_id"], "branch_id": b["branch_id"], "name": name}))["id"]
+    cat = ok(c.post("/menu/categories", json={"tenant_id": b["tenant_id"], "branch_id": b["branch_id"], "name": f"Cat-{uuid.uuid4().hex[:6]}"}))["id"]
+    item = ok(c.post("/menu/items", json={"tenant_id": b["tenant_id"], "category_id": cat, "name": name, "kitchen_station_id": st, "gst_rate": 5.0}))["id"]
+    return st, item
+
+
+def _open(c):
+    b = c.boot
+    return ok(c.post("/orders/", json={"tenant_id": b["tenant_id"], "branch_id": b["branch_id"], "order_no": f"N-{uuid.uuid4().hex[:8]}", "channel": "DINE_IN"}))["id"]
+
+
+def _ticket_nos(station_id):
+    from app.db import SessionLocal
+    from app.models.core import KitchenTicket
+
+    db = SessionLocal()
+    try:
+        return sorted(n for (n,) in db.query(KitchenTicket.ticket_no).filter(KitchenTicket.target_station == station_id))
+    finally:
+        db.close()
+
+
+def test_numbers_are_per_station_and_sequential(app_client):
+    c = app_client
+    hot, hot_item = _station_item(c, "Hot")
+    bar, bar_item = _station_item(c, "Bar")
+    o1, o2 = _open(c), _open(c)
+    ok(c.post(f"/orders/{o1}/items:batch", json={"lines": [{"item_id": hot_item, "qty": 1, "unit_price": 10}, {"item_id": bar_item, "qty": 1, "unit_price": 10}]}))
+    ok(c.post(f"/orders/{o1}/items", json={"order_id": o1, "item_id": hot_item, "qty": 1, "unit_price": 10}))  # same ticket
+    ok(c.post(f"/orders/{o2}/items", json={"order_id": o2, "item_id": hot_item, "qty": 1, "unit_price": 10}))
+    ok(c.post("/kot/tickets", params={"order_id": o2, "target_station": bar}))
+    assert _ticket_nos(hot) == [1, 2]
+    assert _ticket_nos(bar) == [1, 2]
+
+
+def test_concurrent_order_entry_never_duplicates(app_client):
+    c = app_client
+    st, item = _station_item(c, "Tandoor")
+    orders = [_open(c) for _ in range(40)]
+
+    def enter(i):
+        oid = orders[i]
+        if i % 4 == 0:
+            return ok(c.post("/kot/tickets", params={"order_id": oid, "target_station": st}))
+        if i % 4 == 1:
+            return ok(c.post(f"/orders/{oid}/items:batch", json={"lines": [{"item_id": item, "qty": 1, "unit_price": 10}] * 2}))
+        return ok(c.post(f"/orders/{oid}/items", json={"order_id": oid, "item_id": item, "qty": 1, "unit_price": 10}))
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(enter, range(len(orders))))
+    assert _ticket_nos(st) == list(range(1, len(orders) + 1))
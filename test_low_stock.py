@@ -0,0 +1,45 @@
+# test_low_stock.py
+# GET /inventory/low_stock: read from the running balances against the
+# ingredient's current min_level, for the tenant or for one branch.
+import uuid
+
+
+def ok(r):
+    assert 200 <= r.status_code < 300, f"{r.request.method} {r.request.url} -> {r.status_code}: {r.text}"
+    return r.json()
+
+
+def _low(c, **params) -> dict:
+    return {r["ingredient_id"]: r for r in ok(c.get("/inventory/low_stock", params=params))}
+
+
+def test_branch_low_stock_includes_ingredients_it_never_moved(app_client):
+    c, b = app_client, app_client.boot
+    stocked = ok(c.post("/inventory/ingredients", json={"tenant_id": b["tenant_id"], "name": f"Oil-{uuid.uuid4().hex[:6]}", "uom": "ml", "min_level": 100}))["id"]
+    never = ok(c.post("/inventory/ingredients", json={"tenant_id": b["tenant_id"], "name": f"Ghee-{uuid.uuid4().hex[:6]}", "uom": "g", "min_level": 50}))["id"]
+    ok(c.post("/inventory/purchase", json={"tenant_id": b["tenant_id"], "branch_id": b["branch_id"], "lines": [{"ingredient_id": stocked, "qty": 500, "unit_cost": 1}]}))
+
+    low = _low(c, branch_id=b["branch_id"])
+    assert never in low and low[never]["qty"] == 0 and low[never]["min_level"] == 50
+    assert stocked not in low
+    assert never in _low(c) and stocked not in _low(c)
+    assert never not in _low(c, branch_id=f"b-{uuid.uuid4().hex[:8]}")  # another tenant's branch
+
+
+def test_low_stock_follows_min_level_changes(app_client):
+    from app.db import SessionLocal
+    from app.models.core import Ingredient
+
+    c, b = app_client, app_client.boot
+    ing = ok(c.post("/inventory/ingredients", json={"tenant_id": b["tenant_id"], "name": f"Dal-{uuid.uuid4().hex[:6]}", "uom": "g", "min_level": 100}))["id"]
+    ok(c.post("/inventory/purchase", json={"tenant_id": b["tenant_id"], "branch_id": b["branch_id"], "lines": [{"ingredient_id": ing, "qty": 300, "unit_cost": 1}]}))
+    assert ing not in _low(c, branch_id=b["branch_id"])
+
+    db = SessionLocal()
+    try:
+        db.get(Ingredient, ing).min_level = 400
+        db.commit()
+    finally:
+        db.close()
+    assert _low(c, branch_id=b["branch_id"])[ing]["min_level"] == 400
+    assert ing in _low(c)
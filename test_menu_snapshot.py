@@ -0,0 +1,55 @@
+# test_menu_snapshot.py
+# GET /menu/snapshot ETag and cache: the fingerprint only moves with the
+# branch's own menu rows, and the per-process cache is bounded.
+import uuid
+
+
+def ok(r):
+    assert 200 <= r.status_code < 300, f"{r.request.method} {r.request.url} -> {r.status_code}: {r.text}"
+    return r.json()
+
+
+def _fingerprint(tenant_id, branch_id):
+    from app.db import SessionLocal
+    from app.routers.menu import _menu_fingerprint
+
+    db = SessionLocal()
+    try:
+        return _menu_fingerprint(db, tenant_id, branch_id)
+    finally:
+        db.close()
+
+
+def _menu(c, tenant_id, branch_id):
+    cat = ok(c.post("/menu/categories", json={"tenant_id": tenant_id, "branch_id": branch_id, "name": f"Cat-{uuid.uuid4().hex[:6]}"}))["id"]
+    return ok(c.post("/menu/items", json={"tenant_id": tenant_id, "category_id": cat, "name": "Idli", "gst_rate": 5.0}))["id"]
+
+
+def test_fingerprint_ignores_other_tenants_and_branches(app_client):
+    c, b = app_client, app_client.boot
+    mine = _menu(c, b["tenant_id"], b["branch_id"])
+    other_tenant = f"t-{uuid.uuid4().hex[:8]}"
+    theirs = _menu(c, other_tenant, f"b-{uuid.uuid4().hex[:8]}")
+    before = _fingerprint(b["tenant_id"], b["branch_id"])
+
+    # another branch's variants, modifier groups and modifiers
+    ok(c.post("/menu/variants", json={"item_id": theirs, "label": "Large", "base_price": 90}))
+    gid = ok(c.post("/menu/modifier_groups", json={"tenant_id": other_tenant, "name": "Chutney", "min_sel": 0, "max_sel": 2}))["id"]
+    ok(c.post("/menu/modifiers", json={"group_id": gid, "name": "Coconut", "price_delta": 5}))
+    ok(c.post(f"/menu/items/{theirs}/modifier_groups", json={"group_id": gid}))
+    assert _fingerprint(b["tenant_id"], b["branch_id"]) == before
+
+    ok(c.post("/menu/variants", json={"item_id": mine, "label": "Large", "base_price": 90}))
+    assert _fingerprint(b["tenant_id"], b["branch_id"]) != before
+
+
+def test_snapshot_cache_evicts_least_recently_served():
+    from app.routers.menu import _SnapshotCache
+
+    cache = _SnapshotCache(maxsize=2)
+    cache.put(("t", "a"), '"a"', b"a")
+    cache.put(("t", "b"), '"b"', b"b")
+    assert cache.get(("t", "a"))  # a is now the most recent
+    cache.put(("t", "c"), '"c"', b"c")
+    assert cache.get(("t", "b")) is None
+    assert cache.get(("t", "a")) and cache.get(("t", "c"))
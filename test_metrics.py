@@ -0,0 +1,46 @@
+# test_metrics.py
+# /metrics: Prometheus text format, per-route latency and SQL histograms, pool gauges.
+import re
+
+
+def _samples(text: str) -> dict[str, float]:
+    out = {}
+    for line in text.splitlines():
+        if line and not line.startswith("#"):
+            name, value = line.rsplit(" ", 1)
+            out[name] = float(value)
+    return out
+
+
+def test_route_histograms_and_pool_gauges(app_client):
+    c = app_client
+    for _ in range(3):
+        assert c.get("/kot/stations/metrics-probe/tickets").status_code == 200
+    r = c.get("/metrics")
+    assert r.status_code == 200 and r.headers["content-type"].startswith("text/plain")
+    s = _samples(r.text)
+
+    labels = 'method="GET",route="/kot/stations/{station_id}/tickets",status="200"'
+    assert s[f"waah_http_request_duration_seconds_count{{{labels}}}"] >= 3
+    assert s[f'waah_http_request_duration_seconds_bucket{{{labels},le="+Inf"}}'] == s[f"waah_http_request_duration_seconds_count{{{labels}}}"]
+    # two statements per call: none in the 1-query bucket, all in the 2-query bucket
+    assert s[f'waah_http_request_db_queries_bucket{{{labels},le="1"}}'] == 0
+    assert s[f'waah_http_request_db_queries_bucket{{{labels},le="2"}}'] >= 3
+    assert s[f"waah_http_request_db_seconds_total{{{labels}}}"] > 0
+
+    assert 'waah_db_pool_connections{state="in_use"}' in s
+    assert s["waah_db_pool_checkout_seconds_count"] > 0
+    assert "# TYPE waah_print_agent_request_seconds histogram" in r.text
+
+
+def test_histogram_buckets_are_cumulative(app_client):
+    from app.services.metrics import Histogram
+
+    h = Histogram("t_seconds", "test", ("route",), buckets=(0.1, 1.0))
+    for v in (0.05, 0.5, 0.5, 3.0):
+        h.observe(v, 'a"b')
+    text = "\n".join(h.render())
+    assert 't_seconds_bucket{route="a\\"b",le="0.1"} 1' in text
+    assert 't_seconds_bucket{route="a\\"b",le="1"} 3' in text
+    assert 't_seconds_bucket{route="a\\"b",le="+Inf"} 4' in text
+    assert re.search(r't_seconds_sum\{route="a\\"b"\} 4\.05\d*', text)
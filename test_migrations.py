@@ -0,0 +1,164 @@
+# test_migrations.py
+# Alembic pipeline: the revisions build exactly the models' schema, legacy
+# create_all databases are adopted and backfilled, the boot check refuses an
+# old schema, and the online backfill helper walks a table in committed batches.
+import pytest
+
+
+def _engine(tmp_path, name="m.db"):
+    from sqlalchemy import create_engine
+    return create_engine(f"sqlite:///{tmp_path / name}")
+
+
+def _diff(engine) -> list:
+    from alembic.autogenerate import compare_metadata
+    from alembic.runtime.migration import MigrationContext
+    from app.db import Base
+
+    with engine.connect() as conn:
+        return compare_metadata(MigrationContext.configure(conn, opts={"compare_type": True}), Base.metadata)
+
+
+def _revision(engine):
+    from app.migrations import current
+    with engine.connect() as conn:
+        return current(conn)
+
+
+def test_revisions_build_the_models_schema(app_client, tmp_path):
+    from app import migrations
+
+    eng = _engine(tmp_path)
+    assert migrations.upgrade(eng) == migrations.head()
+    assert _diff(eng) == []
+
+
+def _legacy_database(eng):
+    """The pre-migrations schema (what the old create_all startup hook built), no alembic_version."""
+    from alembic import command
+    from sqlalchemy import text
+    from app import migrations
+
+    with eng.connect() as conn:
+        command.upgrade(migrations.config(conn), migrations.BASELINE)
+        conn.execute(text("DROP TABLE alembic_version"))
+        conn.commit()
+
+
+def _insert(conn, table, **values):
+    import uuid
+    from datetime import datetime, timezone
+    from sqlalchemy import MetaData, Table
+
+    t = Table(table, MetaData(), autoload_with=conn)
+    now = datetime.now(timezone.utc)
+    defaults = {"id": str(uuid.uuid4()), "created_at": now, "updated_at": now, "version": 1}
+    row = {**{k: v for k, v in defaults.items() if k in t.c}, **values}
+    conn.execute(t.insert().values(**row))
+    return row.get("id")
+
+
+def test_create_all_database_is_stamped_and_upgraded(app_client, tmp_path):
+    from datetime import datetime, timezone
+    from sqlalchemy import inspect, text
+    from sqlalchemy.orm import Session
+    from app import migrations
+    from app.models.core import Order
+    from app.services.billing import compute_bill, order_totals
+    from app.services.reports import aggregate_daily_sales
+
+    eng = _engine(tmp_path)
+    _legacy_database(eng)
+    assert "subtotal" not in {c["name"] for c in inspect(eng).get_columns("order")}
+
+    now = datetime.now(timezone.utc)
+    with eng.begin() as conn:
+        oid = _insert(conn, "order", tenant_id="t1", branch_id="b1", order_no="L-1", channel="DINE_IN", status="CLOSED", closed_at=now)
+        line = dict(order_id=oid, item_id="i1", line_discount=0, cgst=2.5, sgst=2.5, igst=0, taxable_value=0)
+        _insert(conn, "order_item", qty=2, unit_price=105, gst_rate=5, **line)
+        _insert(conn, "order_item", qty=1, unit_price=33.33, gst_rate=12, **line)
+        _insert(conn, "order_item", qty=1, unit_price=999, gst_rate=5, deleted_at=now, **line)
+        _insert(conn, "payment", order_id=oid, mode="CASH", amount=300)
+        # a bucket the old refresh never wrote
+        tid = _insert(conn, "order", tenant_id="t1", branch_id="b1", order_no="L-2", channel="TAKEAWAY", status="CLOSED", closed_at=now)
+        _insert(conn, "order_item", **{**line, "order_id": tid}, qty=1, unit_price=50, gst_rate=5)
+        ing = _insert(conn, "ingredient", tenant_id="t1", name="Rice", uom="g", min_level=500)
+        _insert(conn, "stock_move", ingredient_id=ing, type="PURCHASE", qty_change=1000)
+        _insert(conn, "stock_move", ingredient_id=ing, type="SALE", qty_change=-300, ref_order_id=oid)
+        _insert(conn, "ingredient", tenant_id="t1", name="Salt", uom="g", min_level=0)
+        _insert(conn, "tenant", id="t1", name="Legacy")
+        _insert(conn, "branch", tenant_id="t1", name="Main")
+        _insert(conn, "invoice", order_id=oid, invoice_no=f"INV-{now:%Y%m%d}-0007", round_off=0, reprint_count=0)  # old scheme, all branches
+        _insert(conn, "sync_event", entity="menu_item", entity_id="m1", op="UPSERT", payload="{}", device_id="pos-1")  # unscoped
+        # written by the old refresh, before provider was normalised and before the last order closed
+        _insert(conn, "report_daily_sales", date=now.date(), tenant_id="t1", branch_id="b1", channel="DINE_IN", provider=None,
+                orders_count=0, gross=0, tax=0, cgst=0, sgst=0, igst=0, discounts=0, net=0)
+
+    assert migrations.upgrade(eng) == migrations.head()
+    assert _diff(eng) == []
+
+    with Session(eng) as db:
+        o = db.get(Order, oid)
+        bill = compute_bill(db, oid)
+        assert o.grand_total is not None and order_totals(db, o) == bill
+        assert float(o.paid_total) == 300
+    with eng.connect() as conn:
+        assert conn.execute(text("SELECT branch_id FROM stock_move WHERE type = 'SALE'")).scalar() == "b1"
+        balances = {(i, b): float(q) for i, b, q in conn.execute(text("SELECT ingredient_id, branch_id, qty FROM ingredient_balance"))}
+        assert balances[(ing, "")] == 700 and balances[(ing, "b1")] == -300
+        assert len(balances) == 3  # Salt never moved: tenant-wide row only
+        cols = ("channel", "provider", "orders_count", "gross", "tax", "cgst", "sgst", "igst", "net")
+        rows = conn.execute(text(f"SELECT {', '.join(cols)} FROM report_daily_sales ORDER BY channel")).all()
+    with Session(eng) as db:
+        want = sorted(aggregate_daily_sales(db, now.date(), "b1"), key=lambda w: w["channel"])
+    assert [(*r[:3], *map(float, r[3:])) for r in rows] == [tuple(w[k] for k in cols) for w in want]
+    assert [w["orders_count"] for w in want] == [1, 1]
+
+    with eng.connect() as conn:
+        assert conn.execute(text("SELECT last_no FROM invoice_sequence WHERE period = :p"), {"p": f"{now:%Y%m%d}"}).scalar() == 7
+        assert conn.execute(text("SELECT tenant_id FROM sync_event")).scalar() == "t1"  # the only tenant
+
+
+def test_boot_check_refuses_an_older_schema(app_client, tmp_path):
+    from alembic import command
+    from sqlalchemy import text
+    from app import migrations
+
+    eng = _engine(tmp_path)
+    with eng.connect() as conn:
+        command.upgrade(migrations.config(conn), migrations.BASELINE)
+        conn.commit()
+    with pytest.raises(RuntimeError, match="app.migrations"):
+        migrations.check_schema(eng, auto_migrate=False)
+
+    migrations.check_schema(eng, auto_migrate=True)
+    assert _revision(eng) == migrations.head()
+    migrations.check_schema(eng, auto_migrate=False)
+
+    # the next release already migrated (rolling restart): keep serving
+    with eng.begin() as conn:
+        conn.execute(text("UPDATE alembic_version SET version_num = 'from_the_future'"))
+    migrations.check_schema(eng, auto_migrate=False)
+
+
+def test_batched_backfill_commits_in_batches_and_resumes(app_client, tmp_path):
+    from alembic.operations import Operations
+    from alembic.runtime.migration import MigrationContext
+    from sqlalchemy import text
+    from app.migrations import batched_backfill
+
+    eng = _engine(tmp_path)
+    with eng.begin() as conn:
+        conn.execute(text('CREATE TABLE "order" (id VARCHAR(36) PRIMARY KEY, a INTEGER, b INTEGER)'))
+        conn.execute(text('INSERT INTO "order" (id, a) VALUES (:id, :a)'), [{"id": f"o{i:02d}", "a": i} for i in range(10)])
+        conn.execute(text('UPDATE "order" SET b = 0 WHERE id = \'o04\''))  # already done
+
+    with eng.connect() as conn:
+        with Operations.context(MigrationContext.configure(conn)):
+            assert batched_backfill("order", "b = a * :k", where="b IS NULL", params={"k": 2}, batch_size=3) == 9
+            assert batched_backfill("order", "b = a * :k", where="b IS NULL", params={"k": 2}, batch_size=3) == 0
+
+    with eng.connect() as conn:
+        rows = dict(conn.execute(text('SELECT id, b FROM "order"')).all())
+    assert rows["o04"] == 0
+    assert all(b == 2 * int(k[1:]) for k, b in rows.items() if k != "o04")
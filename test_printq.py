@@ -0,0 +1,235 @@
+# test_printq.py
+# Print queue: endpoints enqueue and return; the dispatcher retries with
+# backoff, dead-letters, and keeps one job in flight per printer.
+import asyncio
+import uuid
+
+import httpx
+
+
+def ok(r):
+    assert 200 <= r.status_code < 300, f"{r.request.method} {r.request.url} -> {r.status_code}: {r.text}"
+    return r.json()
+
+
+def _order(c):
+    b = c.boot
+    cat = ok(c.post("/menu/categories", json={"tenant_id": b["tenant_id"], "branch_id": b["branch_id"], "name": f"Cat-{uuid.uuid4().hex[:6]}"}))["id"]
+    item = ok(c.post("/menu/items", json={"tenant_id": b["tenant_id"], "category_id": cat, "name": "Tea", "gst_rate": 5.0}))["id"]
+    oid = ok(c.post("/orders/", json={"tenant_id": b["tenant_id"], "branch_id": b["branch_id"], "order_no": f"P-{uuid.uuid4().hex[:8]}", "channel": "TAKEAWAY"}))["id"]
+    ok(c.post(f"/orders/{oid}/items", json={"order_id": oid, "item_id": item, "qty": 1, "unit_price": 20}))
+    return oid
+
+
+def _set_jobs(values, ids=None):
+    from app.db import SessionLocal
+    from app.models.core import PrintJob, PrintJobStatus
+
+    db = SessionLocal()
+    q = db.query(PrintJob)
+    q = q.filter(PrintJob.id.in_(ids)) if ids else q.filter(PrintJob.status != PrintJobStatus.DONE)
+    q.update(values, synchronize_session=False)
+    db.commit()
+    db.close()
+
+
+def _clear_queue():
+    # jobs left by other tests share the bootstrap printers
+    from app.models.core import PrintJobStatus
+    _set_jobs({"status": PrintJobStatus.DONE})
+
+
+def _make_due(job_ids):
+    from datetime import datetime, timezone
+    _set_jobs({"next_attempt_at": datetime.now(timezone.utc)}, job_ids)
+
+
+def _dispatch(handler):
+    """One dispatcher pass against a fake agent; waits for the sends to finish."""
+    from app.services.printq import Dispatcher
+
+    async def run():
+        d = Dispatcher()
+        d._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        await d.dispatch()
+        await asyncio.gather(*d._sending)
+        await d._client.aclose()
+    asyncio.run(run())
+
+
+def test_bill_is_queued_then_retried_until_printed(app_client):
+    c = app_client
+    _clear_queue()
+    oid = _order(c)
+    job_id = ok(c.post(f"/print/bill/{oid}"))["job_id"]
+    assert ok(c.get(f"/print/jobs/{job_id}"))["status"] == "QUEUED"
+
+    _dispatch(lambda request: httpx.Response(503))
+    job = ok(c.get(f"/print/jobs/{job_id}"))
+    assert (job["status"], job["attempts"]) == ("QUEUED", 1) and job["last_error"].startswith("HTTP 503")
+    assert job["next_attempt_at"] is not None  # backed off
+
+    _make_due([job_id])
+    _dispatch(lambda request: httpx.Response(200))
+    job = ok(c.get(f"/print/jobs/{job_id}"))
+    assert (job["status"], job["attempts"], job["last_error"]) == ("DONE", 2, None)
+    assert job["printed_at"]
+
+
+def test_rejected_job_is_dead_lettered_and_can_be_retried(app_client):
+    c = app_client
+    _clear_queue()
+    job_id = ok(c.post(f"/print/bill/{_order(c)}"))["job_id"]
+    _dispatch(lambda request: httpx.Response(400, text="bad template"))
+    assert ok(c.get(f"/print/jobs/{job_id}"))["status"] == "DEAD"
+    assert job_id in [j["id"] for j in ok(c.get("/print/jobs", params={"status": "DEAD"}))]
+
+    assert ok(c.post(f"/print/jobs/{job_id}/retry"))["status"] == "QUEUED"
+    assert c.post(f"/print/jobs/{job_id}/retry").status_code == 409
+    _dispatch(lambda request: httpx.Response(200))
+    assert ok(c.get(f"/print/jobs/{job_id}"))["status"] == "DONE"
+
+
+def test_one_job_in_flight_per_printer(app_client):
+    c = app_client
+    _clear_queue()
+    jobs = [ok(c.post(f"/print/bill/{_order(c)}"))["job_id"] for _ in range(3)]
+    _dispatch(lambda request: httpx.Response(200))  # one pass: one job per printer
+    states = [ok(c.get(f"/print/jobs/{j}"))["status"] for j in jobs]
+    assert states.count("DONE") == 1 and states.count("QUEUED") == 2, states
+
+
+def test_claim_limit_spans_workers_and_skips_busy_printers(app_client):
+    from app.db import SessionLocal
+    from app.models.core import Printer
+    from app.services import printq
+
+    b = app_client.boot
+    _clear_queue()
+    db = SessionLocal()
+    try:
+        billing, kitchen = db.get(Printer, b["billing_printer_id"]), db.get(Printer, b["kitchen_printer_id"])
+        backlog = [printq.enqueue(db, billing, "BILL", {"n": i}).id for i in range(printq._CLAIM_BATCH + 20)]
+        late = printq.enqueue(db, kitchen, "KOT", {"order_id": None}).id
+        db.commit()
+
+        # the billing backlog is older than the whole batch, yet the kitchen job goes out too
+        claimed, _ = printq._claim(db)
+        db.commit()
+        assert sorted(j.id for j in claimed) == sorted([backlog[0], late])
+
+        # another worker's pass: the billing printer's slot is taken by the SENDING job
+        claimed, _ = printq._claim(db)
+        db.commit()
+        assert claimed == []
+    finally:
+        db.close()
+    _clear_queue()
+
+
+def test_kot_lines_within_debounce_window_print_as_one_ticket(app_client):
+    import orjson
+    from app.db import SessionLocal
+    from app.models.core import PrintJob
+
+    c = app_client
+    _clear_queue()
+    b = c.boot
+    st = ok(c.post("/settings/stations", json={"tenant_id": b["tenant_id"], "branch_id": b["branch_id"], "name": "Grill", "printer_id": b["kitchen_printer_id"]}))["id"]
+    cat = ok(c.post("/menu/categories", json={"tenant_id": b["tenant_id"], "branch_id": b["branch_id"], "name": f"Cat-{uuid.uuid4().hex[:6]}"}))["id"]
+    item = ok(c.post("/menu/items", json={"tenant_id": b["tenant_id"], "category_id": cat, "name": "Kebab", "kitchen_station_id": st, "gst_rate": 5.0}))["id"]
+    oid = ok(c.post("/orders/", json={"tenant_id": b["tenant_id"], "branch_id": b["branch_id"], "order_no": f"P-{uuid.uuid4().hex[:8]}", "channel": "DINE_IN"}))["id"]
+
+    ok(c.post(f"/orders/{oid}/items", json={"order_id": oid, "item_id": item, "qty": 1, "unit_price": 90}))
+    ok(c.post(f"/orders/{oid}/items", json={"order_id": oid, "item_id": item, "qty": 2, "unit_price": 90}))
+    ok(c.post(f"/orders/{oid}/items:batch", json={"lines": [{"item_id": item, "qty": 3, "unit_price": 90}]}))
+
+    def kot_jobs():
+        db = SessionLocal()
+        try:
+            return [(j.id, j.status.value, orjson.loads(j.payload)) for j in db.query(PrintJob).filter(PrintJob.kind == "KOT").order_by(PrintJob.created_at) if orjson.loads(j.payload)["order_id"] == oid]
+        finally:
+            db.close()
+
+    [(job_id, status, payload)] = kot_jobs()
+    assert status == "QUEUED" and [i["qty"] for i in payload["items"]] == [1, 2, 3]
+    assert payload["station"] == "Grill" and payload["reprint"] is False
+
+    sent = []
+    _dispatch(lambda request: sent.append(request) or httpx.Response(200))
+    assert sent == []  # still inside the debounce window
+    _make_due([job_id])
+    _dispatch(lambda request: sent.append(orjson.loads(request.read())) or httpx.Response(200))
+    assert [p["type"] for p in sent] == ["KOT"] and len(sent[0]["items"]) == 3
+
+    # a line after the KOT went out starts a new one
+    ok(c.post(f"/orders/{oid}/items", json={"order_id": oid, "item_id": item, "qty": 1, "unit_price": 90}))
+    jobs = kot_jobs()
+    assert [s for _, s, _ in jobs] == ["DONE", "QUEUED"] and len(jobs[1][2]["items"]) == 1
+
+
+def test_result_of_a_lost_claim_is_not_recorded(app_client):
+    from app.db import SessionLocal
+    from app.models.core import PrintJob, PrintJobStatus
+    from app.services import printq
+
+    c = app_client
+    _clear_queue()
+    job_id = ok(c.post(f"/print/bill/{_order(c)}"))["job_id"]
+    db = SessionLocal()
+    try:
+        [mine], _ = printq._claim(db)
+        db.commit()
+        # our lease ran out and another worker claimed the job again
+        _set_jobs({"version": mine.version + 1}, [job_id])
+        printq._finish(db, mine, "HTTP 400: late", retry=False)
+        db.commit()
+        assert db.get(PrintJob, job_id).status == PrintJobStatus.SENDING
+
+        _set_jobs({"version": mine.version}, [job_id])
+        printq._finish(db, mine, None, retry=False)
+        db.commit()
+        db.expire_all()
+        assert db.get(PrintJob, job_id).status == PrintJobStatus.DONE
+    finally:
+        db.close()
+
+
+def test_retrying_a_dead_job_needs_reprint(app_client):
+    from app.models.core import PrintJobStatus
+
+    c = app_client
+    mobile = f"8{uuid.uuid4().int % 10**9:09d}"
+    ok(c.post("/users/", json={"name": "Cashier", "mobile": mobile, "password": "pw"}))
+    token = ok(c.post("/auth/login", params={"mobile": mobile, "password": "pw"}))["access_token"]
+    job_id = ok(c.post(f"/print/bill/{_order(c)}"))["job_id"]
+    _set_jobs({"status": PrintJobStatus.DEAD}, [job_id])
+    r = c.post(f"/print/jobs/{job_id}/retry", headers={"Authorization": f"Bearer {token}"})
+    assert r.status_code == 403
+
+
+def test_no_kot_job_for_a_printer_without_connection_url(app_client):
+    import orjson
+    from app.db import SessionLocal
+    from app.models.core import PrintJob
+
+    c, b = app_client, app_client.boot
+    printer = ok(c.post("/settings/printers", json={"tenant_id": b["tenant_id"], "branch_id": b["branch_id"], "name": "Tandoor", "type": "KITCHEN"}))["id"]
+    st = ok(c.post("/settings/stations", json={"tenant_id": b["tenant_id"], "branch_id": b["branch_id"], "name": "Tandoor", "printer_id": printer}))["id"]
+    cat = ok(c.post("/menu/categories", json={"tenant_id": b["tenant_id"], "branch_id": b["branch_id"], "name": f"Cat-{uuid.uuid4().hex[:6]}"}))["id"]
+    item = ok(c.post("/menu/items", json={"tenant_id": b["tenant_id"], "category_id": cat, "name": "Naan", "kitchen_station_id": st, "gst_rate": 5.0}))["id"]
+    oid = ok(c.post("/orders/", json={"tenant_id": b["tenant_id"], "branch_id": b["branch_id"], "order_no": f"P-{uuid.uuid4().hex[:8]}", "channel": "DINE_IN"}))["id"]
+
+    def kot_jobs():
+        db = SessionLocal()
+        try:
+            return [j for j in db.query(PrintJob).filter(PrintJob.kind == "KOT", PrintJob.printer_id == printer) if orjson.loads(j.payload)["order_id"] == oid]
+        finally:
+            db.close()
+
+    ok(c.post(f"/orders/{oid}/items", json={"order_id": oid, "item_id": item, "qty": 1, "unit_price": 40}))
+    assert kot_jobs() == []  # nothing to send it to: no job to dead-letter
+
+    ok(c.patch(f"/settings/printers/{printer}", json={"connection_url": "http://agent.local/print"}))
+    ok(c.post(f"/orders/{oid}/items", json={"order_id": oid, "item_id": item, "qty": 1, "unit_price": 40}))
+    assert len(kot_jobs()) == 1
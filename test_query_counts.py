@@ -0,0 +1,74 @@
+# test_query_counts.py
+# N+1 regressions: these endpoints must issue the same number of SQL
+# statements no matter how many rows they return.
+import uuid
+
+
+def ok(r):
+    assert 200 <= r.status_code < 300, f"{r.request.method} {r.request.url} -> {r.status_code}: {r.text}"
+    return r.json()
+
+
+def _menu(c, n_groups: int, mods_per_group: int = 3):
+    b = c.boot
+    cat = ok(c.post("/menu/categories", json={"tenant_id": b["tenant_id"], "branch_id": b["branch_id"], "name": f"Cat-{uuid.uuid4().hex[:6]}"}))["id"]
+    item = ok(c.post("/menu/items", json={"tenant_id": b["tenant_id"], "category_id": cat, "name": "Pizza", "gst_rate": 5.0}))["id"]
+    mod_ids = []
+    for g in range(n_groups):
+        gid = ok(c.post("/menu/modifier_groups", json={"tenant_id": b["tenant_id"], "name": f"G{g}", "min_sel": 0, "max_sel": 2}))["id"]
+        for m in range(mods_per_group):
+            mod_ids.append(ok(c.post("/menu/modifiers", json={"group_id": gid, "name": f"M{g}.{m}", "price_delta": 10}))["id"])
+        ok(c.post(f"/menu/items/{item}/modifier_groups", json={"group_id": gid}))
+    return item, mod_ids
+
+
+def _order_with_lines(c, item: str, mod_ids: list[str], n_lines: int) -> str:
+    from app.db import SessionLocal
+    from app.models.core import OrderItemModifier
+
+    b = c.boot
+    oid = ok(c.post("/orders/", json={"tenant_id": b["tenant_id"], "branch_id": b["branch_id"], "order_no": f"Q-{uuid.uuid4().hex[:8]}", "channel": "DINE_IN"}))["id"]
+    lines = ok(c.post(f"/orders/{oid}/items:batch", json={"lines": [{"item_id": item, "qty": 1, "unit_price": 100} for _ in range(n_lines)]}))["ids"]
+    db = SessionLocal()
+    for line_id in lines:
+        for mid in mod_ids[:2]:
+            db.add(OrderItemModifier(order_item_id=line_id, modifier_id=mid, price_delta=10))
+    db.commit()
+    db.close()
+    return oid
+
+
+def test_modifiers_full_query_count_is_flat(app_client, count_queries):
+    small, _ = _menu(app_client, n_groups=1)
+    large, _ = _menu(app_client, n_groups=8)
+    counts = []
+    for item in (small, large):
+        with count_queries() as n:
+            groups = ok(app_client.get(f"/menu/items/{item}/modifiers_full"))
+        counts.append(n["queries"])
+        assert all(len(g["modifiers"]) == 3 for g in groups)
+    assert counts[0] == counts[1] == 2
+
+
+def test_print_bill_query_count_is_flat(app_client, count_queries):
+    item, mod_ids = _menu(app_client, n_groups=1)
+    counts = []
+    for n_lines in (2, 40):
+        oid = _order_with_lines(app_client, item, mod_ids, n_lines)
+        with count_queries() as n:
+            ok(app_client.post(f"/print/bill/{oid}"))
+        counts.append(n["queries"])
+    assert counts[0] == counts[1], counts
+
+
+def test_list_users_query_count_is_flat(app_client, count_queries):
+    b = app_client.boot
+    counts = []
+    for batch in (1, 20):
+        for i in range(batch):
+            ok(app_client.post("/users/", json={"tenant_id": b["tenant_id"], "name": f"U{i}", "roles": ["WAITER", "CASHIER"]}))
+        with count_queries() as n:
+            users = ok(app_client.get("/users/", params={"tenant_id": b["tenant_id"]}))
+        counts.append(n["queries"])
+        assert any(set(u["roles"]) == {"WAITER", "CASHIER"} for u in users)
+    assert counts[0] == counts[1], counts
@@ -0,0 +1,161 @@
+# test_query_plans.py
+# Query-plan regressions: the hot endpoints (order entry, order detail,
+# billing, KDS, reporting, sync) must reach the rows of the big tables through
+# an index. Every statement an endpoint sends is re-run under SQLite's
+# EXPLAIN QUERY PLAN with the same parameters; a full scan of a big table fails.
+import re
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import pytest
+
+# tables that grow with traffic (and menu_item / item_variant / modifier, the
+# largest menu tables); scanning the small config tables is fine
+BIG = {
+    "order", "order_item", "order_item_modifier", "kitchen_ticket", "kitchen_ticket_item",
+    "kitchen_ticket_event", "payment", "invoice", "stock_move", "sync_event", "print_job",
+    "user", "menu_item", "item_variant", "modifier", "online_order",
+}
+# "SCAN order_item" is a full scan; "SCAN ... USING [COVERING] INDEX" walks an
+# index in order (keyset pagination) and "SEARCH ..." seeks one
+_FULL_SCAN = re.compile(r"^SCAN (\w+)(?: AS \w+)?$")
+
+
+def ok(r):
+    assert 200 <= r.status_code < 300, f"{r.request.method} {r.request.url} -> {r.status_code}: {r.text}"
+    return r.json()
+
+
+@contextmanager
+def _captured():
+    """Record (statement, parameters) of reads, updates and deletes sent on app.db.engine."""
+    from sqlalchemy import event
+    from app.db import engine
+
+    out: list[tuple[str, tuple]] = []
+
+    def _on_execute(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and statement.lstrip().split(None, 1)[0].upper() in ("SELECT", "UPDATE", "DELETE", "WITH"):
+            out.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", _on_execute)
+    try:
+        yield out
+    finally:
+        event.remove(engine, "before_cursor_execute", _on_execute)
+
+
+def _full_scans(statements) -> list[str]:
+    from app.db import engine
+
+    found = []
+    with engine.connect() as conn:
+        for statement, parameters in statements:
+            for row in conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters):
+                m = _FULL_SCAN.match(row[-1])
+                if m and m.group(1) in BIG:
+                    found.append(f"{row[-1]}  <-  {' '.join(statement.split())[:200]}")
+    return found
+
+
+@pytest.fixture(scope="module")
+def world(app_client):
+    """A branch with a station, a recipe'd item and some traffic, so every flow has rows to find."""
+    c, b = app_client, app_client.boot
+    st = ok(c.post("/settings/stations", json={"tenant_id": b["tenant_id"], "branch_id": b["branch_id"], "name": f"Plan-{uuid.uuid4().hex[:6]}"}))["id"]
+    cat = ok(c.post("/menu/categories", json={"tenant_id": b["tenant_id"], "branch_id": b["branch_id"], "name": f"Cat-{uuid.uuid4().hex[:6]}"}))["id"]
+    item = ok(c.post("/menu/items", json={"tenant_id": b["tenant_id"], "category_id": cat, "name": "Thali", "kitchen_station_id": st, "gst_rate": 5.0}))["id"]
+    ing = ok(c.post("/inventory/ingredients", json={"tenant_id": b["tenant_id"], "name": f"Rice-{uuid.uuid4().hex[:6]}", "uom": "g"}))["id"]
+    ok(c.post("/inventory/recipe", json={"item_id": item, "lines": [{"ingredient_id": ing, "qty": 150}]}))
+    for _ in range(3):
+        oid = ok(c.post("/orders/", json={"tenant_id": b["tenant_id"], "branch_id": b["branch_id"], "order_no": f"P-{uuid.uuid4().hex[:8]}", "channel": "DINE_IN"}))["id"]
+        ok(c.post(f"/orders/{oid}/items:batch", json={"lines": [{"item_id": item, "qty": 1, "unit_price": 90}] * 2}))
+        ok(c.post(f"/orders/{oid}/pay", json={"order_id": oid, "mode": "CASH", "amount": ok(c.get(f"/orders/{oid}"))["totals"]["total"]}))
+    oid = ok(c.post("/orders/", json={"tenant_id": b["tenant_id"], "branch_id": b["branch_id"], "order_no": f"P-{uuid.uuid4().hex[:8]}", "channel": "DINE_IN"}))["id"]
+    return {"station": st, "category": cat, "item": item, "order": oid}
+
+
+def _add_item(c, w):
+    return ok(c.post(f"/orders/{w['order']}/items", json={"order_id": w["order"], "item_id": w["item"], "qty": 1, "unit_price": 90}))
+
+
+def _remove_item(c, w):
+    line = _add_item(c, w)["id"]
+    ok(c.delete(f"/orders/{w['order']}/items/{line}"))
+
+
+def _menu_snapshot(c, w):
+    from app.routers.menu import _invalidate_snapshots
+
+    _invalidate_snapshots()  # build it, not the cached copy
+    ok(c.get("/menu/snapshot", params={"tenant_id": c.boot["tenant_id"], "branch_id": c.boot["branch_id"]}))
+
+
+def _sync_pull(c, w):
+    from app.db import SessionLocal
+    from app.services.sync import compaction_state
+
+    db = SessionLocal()
+    try:
+        since = compaction_state(db).pruned_through  # earlier tests may have pruned
+        db.commit()
+    finally:
+        db.close()
+    ok(c.get("/sync/pull", params={"since": since, "tenant_id": c.boot["tenant_id"], "limit": 100}))
+
+
+def _pay_and_invoice(c, w):
+    b = c.boot
+    oid = ok(c.post("/orders/", json={"tenant_id": b["tenant_id"], "branch_id": b["branch_id"], "order_no": f"P-{uuid.uuid4().hex[:8]}", "channel": "DINE_IN"}))["id"]
+    ok(c.post(f"/orders/{oid}/items", json={"order_id": oid, "item_id": w["item"], "qty": 2, "unit_price": 90}))
+    ok(c.post(f"/orders/{oid}/pay", json={"order_id": oid, "mode": "CASH", "amount": 1000}))
+    ok(c.post(f"/orders/{oid}/invoice"))
+
+
+def _kot_status(c, w):
+    tid = ok(c.get(f"/kot/stations/{w['station']}/tickets"))["tickets"][0]["id"]
+    ok(c.patch(f"/kot/{tid}/status", json={"status": "IN_PROGRESS"}))
+
+
+# the top queries by traffic, as the endpoints issue them
+FLOWS = {
+    "login": lambda c, w: ok(c.post("/auth/login", params={"mobile": "9999999999", "password": "admin"})),
+    "menu_snapshot": _menu_snapshot,
+    "menu_items": lambda c, w: ok(c.get("/menu/items", params={"category_id": w["category"]})),
+    "add_item": _add_item,
+    "add_items_batch": lambda c, w: ok(c.post(f"/orders/{w['order']}/items:batch", json={"lines": [{"item_id": w["item"], "qty": 1, "unit_price": 90}] * 3})),
+    "remove_item": _remove_item,
+    "order_detail": lambda c, w: ok(c.get(f"/orders/{w['order']}")),
+    "print_bill": lambda c, w: ok(c.post(f"/print/bill/{w['order']}")),
+    "pay_and_invoice": _pay_and_invoice,
+    "list_orders_branch_status": lambda c, w: ok(c.get("/orders/", params={"branch_id": c.boot["branch_id"], "status": "OPEN"})),
+    "kds_board": lambda c, w: ok(c.get(f"/kot/stations/{w['station']}/tickets")),
+    "kot_status": _kot_status,
+    "daily_sales_refresh": lambda c, w: ok(c.post("/reports/daily_sales/refresh", params={"day": datetime.now(timezone.utc).date().isoformat(), "branch_id": c.boot["branch_id"]})),
+    "low_stock": lambda c, w: ok(c.get("/inventory/low_stock", params={"branch_id": c.boot["branch_id"]})),
+    "sync_pull": _sync_pull,
+}
+
+
+@pytest.mark.parametrize("flow", list(FLOWS))
+def test_hot_queries_use_indexes(app_client, world, flow):
+    with _captured() as statements:
+        FLOWS[flow](app_client, world)
+    assert statements
+    assert _full_scans(statements) == []
+
+
+def test_partial_indexes_match_their_queries(app_client, world):
+    """The soft-delete / closed-order predicates in the queries must imply the partial indexes'."""
+    plans = []
+    with _captured() as statements:
+        FLOWS["menu_snapshot"](app_client, world)
+        FLOWS["daily_sales_refresh"](app_client, world)
+    from app.db import engine
+    with engine.connect() as conn:
+        for statement, parameters in statements:
+            plans.extend(row[-1] for row in conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters))
+    used = " ".join(plans)
+    for ix in ("ix_menu_category_branch_live", "ix_item_variant_item_live", "ix_order_branch_status_closed", "ix_order_item_order"):
+        assert ix in used, ix
@@ -0,0 +1,88 @@
+# test_running_totals.py
+# Running bill totals on Order: every line mutation keeps them equal to a full
+# recompute, including legacy orders whose totals were never stored (NULL).
+import uuid
+
+import pytest
+
+
+def ok(r):
+    assert 200 <= r.status_code < 300, f"{r.request.method} {r.request.url} -> {r.status_code}: {r.text}"
+    return r.json()
+
+
+def _item(c):
+    b = c.boot
+    cat = ok(c.post("/menu/categories", json={"tenant_id": b["tenant_id"], "branch_id": b["branch_id"], "name": f"Cat-{uuid.uuid4().hex[:6]}"}))["id"]
+    return ok(c.post("/menu/items", json={"tenant_id": b["tenant_id"], "category_id": cat, "name": "Dosa", "gst_rate": 5.0}))["id"]
+
+
+def _legacy(order_id: str) -> None:
+    """Clear the stored totals, as on an order written before they existed."""
+    from app.db import SessionLocal
+    from app.models.core import Order
+
+    db = SessionLocal()
+    try:
+        db.query(Order).filter(Order.id == order_id).update({
+            c: None for c in ("subtotal", "tax_total", "service_charge", "packing_charge", "round_off", "grand_total", "paid_total")
+        })
+        db.commit()
+    finally:
+        db.close()
+
+
+def _stored_matches_recompute(order_id: str) -> dict:
+    from app.db import SessionLocal
+    from app.models.core import Order
+    from app.services.billing import compute_bill, order_totals
+
+    db = SessionLocal()
+    try:
+        o = db.get(Order, order_id)
+        assert o.subtotal is not None and o.grand_total is not None
+        bill = compute_bill(db, order_id)
+        assert order_totals(db, o) == bill
+        return bill
+    finally:
+        db.close()
+
+
+@pytest.mark.parametrize("mutation", ["remove", "discount", "add"])
+def test_legacy_order_totals_follow_line_changes(app_client, mutation):
+    c, b = app_client, app_client.boot
+    item = _item(c)
+    oid = ok(c.post("/orders/", json={"tenant_id": b["tenant_id"], "branch_id": b["branch_id"], "order_no": f"R-{uuid.uuid4().hex[:8]}", "channel": "DINE_IN"}))["id"]
+    lines = [ok(c.post(f"/orders/{oid}/items", json={"order_id": oid, "item_id": item, "qty": 1, "unit_price": p}))["id"] for p in (100, 250)]
+    before = _stored_matches_recompute(oid)
+    _legacy(oid)
+
+    if mutation == "remove":
+        ok(c.delete(f"/orders/{oid}/items/{lines[1]}"))
+    elif mutation == "discount":
+        ok(c.post(f"/orders/{oid}/items/{lines[1]}/apply_discount", json={"discount": 50}))
+    else:
+        ok(c.post(f"/orders/{oid}/items", json={"order_id": oid, "item_id": item, "qty": 2, "unit_price": 40}))
+
+    after = _stored_matches_recompute(oid)
+    assert after["subtotal"] != before["subtotal"]
+
+
+def test_total_writers_lock_the_order(app_client, monkeypatch):
+    from app.routers import orders
+    from app.services.billing import lock_order
+
+    c, b = app_client, app_client.boot
+    item = _item(c)
+    oid = ok(c.post("/orders/", json={"tenant_id": b["tenant_id"], "branch_id": b["branch_id"], "order_no": f"R-{uuid.uuid4().hex[:8]}", "channel": "DINE_IN"}))["id"]
+    locked = []
+    monkeypatch.setattr(orders, "lock_order", lambda db, order_id: locked.append(order_id) or lock_order(db, order_id))
+
+    line = ok(c.post(f"/orders/{oid}/items", json={"order_id": oid, "item_id": item, "qty": 1, "unit_price": 100}))["id"]
+    ok(c.post(f"/orders/{oid}/items:batch", json={"lines": [{"item_id": item, "qty": 1, "unit_price": 50}]}))
+    ok(c.post(f"/orders/{oid}/items/{line}/apply_discount", json={"discount": 10}))
+    ok(c.delete(f"/orders/{oid}/items/{line}"))
+    ok(c.post(f"/orders/{oid}/pay", json={"order_id": oid, "mode": "CASH", "amount": 10}))
+    ok(c.post(f"/orders/{oid}/void"))
+    assert locked == [oid] * 6
+    _stored_matches_recompute(oid)
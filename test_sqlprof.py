@@ -0,0 +1,38 @@
+# test_sqlprof.py
+# Opt-in SQL profiler: fingerprints, the X-SQL-Profile breakdown, slow-query log.
+import json
+import logging
+
+
+def test_fingerprint_groups_query_shapes(app_client):
+    from app.services.sqlprof import fingerprint
+
+    a = fingerprint("SELECT * FROM t WHERE id IN (?, ?, ?) AND name = 'x' LIMIT 10")
+    b = fingerprint("SELECT *\n  FROM t WHERE id IN (%(id_1)s) AND name = 'it''s' LIMIT 500")
+    assert a == b == "SELECT * FROM t WHERE id IN (?+) AND name = ? LIMIT ?"
+    assert fingerprint("INSERT INTO t (a, b) VALUES (?, ?), (?, ?), (?, ?)") == "INSERT INTO t (a, b) VALUES (?+), ..."
+
+
+def test_profile_header_needs_the_token(app_client, monkeypatch):
+    from app.config import settings
+
+    url = "/kot/stations/prof-probe/tickets"
+    assert "X-SQL-Profile" not in app_client.get(url, headers={"X-SQL-Profile": ""}).headers  # off by default
+
+    monkeypatch.setattr(settings, "SQL_PROFILE_TOKEN", "s3cret")
+    assert "X-SQL-Profile" not in app_client.get(url, headers={"X-SQL-Profile": "wrong"}).headers
+    r = app_client.get(url, headers={"X-SQL-Profile": "s3cret"})
+    entries = json.loads(r.headers["X-SQL-Profile"])
+    assert sum(e["n"] for e in entries) == int(r.headers["Server-Timing"].split('desc="')[1].split()[0])
+    assert any("FROM kitchen_ticket_event" in e["sql"] for e in entries)
+    assert all(set(e) == {"sql", "n", "ms", "rows"} for e in entries)
+
+
+def test_slow_query_log_names_the_route(app_client, monkeypatch, caplog):
+    from app.config import settings
+
+    monkeypatch.setattr(settings, "SQL_SLOW_QUERY_MS", 0.000001)  # everything is slow
+    with caplog.at_level(logging.WARNING, logger="app.services.sqlprof"):
+        app_client.get("/kot/stations/slow-probe/tickets", headers={"X-Request-ID": "slow-1"})
+    lines = [r.getMessage() for r in caplog.records if r.name == "app.services.sqlprof"]
+    assert lines and all("route=/kot/stations/{station_id}/tickets request_id=slow-1" in m for m in lines)
@@ -0,0 +1,210 @@
+# test_sync.py
+# /sync endpoints, in-process.
+import uuid
+
+
+def ok(r):
+    assert 200 <= r.status_code < 300, f"{r.request.method} {r.request.url} -> {r.status_code}: {r.text}"
+    return r.json()
+
+
+def _ops(n, **payload):
+    return [{"entity": "menu_item", "entity_id": str(uuid.uuid4()), "op": "UPSERT", "payload": {"i": i, **payload}} for i in range(n)]
+
+
+def _branch(c, tenant_id=None):
+    from app.db import SessionLocal
+    from app.models.core import Branch
+
+    db = SessionLocal()
+    try:
+        b = Branch(tenant_id=tenant_id or c.boot["tenant_id"], name=f"B-{uuid.uuid4().hex[:6]}")
+        db.add(b)
+        db.commit()
+        return b.id
+    finally:
+        db.close()
+
+
+def test_push_returns_seq_range(app_client):
+    device = str(uuid.uuid4())
+    out = ok(app_client.post("/sync/push", json={"device_id": device, "ops": _ops(2500, name="Paneer")}))
+    assert out["stored"] == 2500
+    assert out["last_seq"] - out["first_seq"] + 1 == 2500
+
+    pulled = ok(app_client.get("/sync/pull", params={"since": out["first_seq"] - 1, "limit": 3}))["events"]
+    assert [e["seq"] for e in pulled] == [out["first_seq"], out["first_seq"] + 1, out["first_seq"] + 2]
+    assert pulled[0]["device_id"] == device and '"Paneer"' in pulled[0]["payload"]
+
+
+def test_push_rejects_bad_ops(app_client):
+    assert app_client.post("/sync/push", json={"device_id": "d", "ops": [{"entity": "x"}]}).status_code == 422
+    assert app_client.post("/sync/push", json={"device_id": "d", "ops": "nope"}).status_code == 422
+    assert app_client.post("/sync/push", content=b"{not json", headers={"content-type": "application/json"}).status_code == 422
+
+
+def test_push_empty(app_client):
+    assert ok(app_client.post("/sync/push", json={"device_id": "d", "ops": []})) == {"stored": 0, "first_seq": None, "last_seq": None}
+
+
+def test_pull_ndjson_scoped_and_acknowledged(app_client):
+    import gzip
+    import json
+    from app.db import SessionLocal
+    from app.models.core import SyncCheckpoint
+
+    branch, other_branch = _branch(app_client), _branch(app_client)
+    me, peer = str(uuid.uuid4()), str(uuid.uuid4())
+    mine = ok(app_client.post("/sync/push", json={"device_id": me, "branch_id": branch, "ops": _ops(5)}))
+    theirs = ok(app_client.post("/sync/push", json={"device_id": peer, "branch_id": branch, "ops": _ops(700, note="x" * 40)}))
+    ok(app_client.post("/sync/push", json={"device_id": peer, "branch_id": other_branch, "ops": _ops(5)}))
+
+    since = mine["first_seq"] - 1
+    r = app_client.get(
+        "/sync/pull",
+        params={"since": since, "branch_id": branch, "device_id": me, "format": "ndjson"},
+        headers={"Accept-Encoding": "gzip"},
+    )
+    assert r.status_code == 200 and r.headers["content-type"].startswith("application/x-ndjson")
+    assert r.headers.get("content-encoding") == "gzip"
+    lines = [json.loads(x) for x in r.text.splitlines()]
+    events, trailer = lines[:-1], lines[-1]
+    assert [e["seq"] for e in events] == list(range(theirs["first_seq"], theirs["last_seq"] + 1))
+    assert trailer == {"next_since": theirs["last_seq"]}
+
+    # JSON mode applies the same scoping
+    page = ok(app_client.get("/sync/pull", params={"since": since, "branch_id": branch, "device_id": me, "limit": 10}))
+    assert [e["device_id"] for e in page["events"]] == [peer] * 10
+
+    ok(app_client.get("/sync/pull", params={"since": trailer["next_since"], "branch_id": branch, "device_id": me, "format": "ndjson"}))
+    ok(app_client.get("/sync/pull", params={"since": since, "device_id": me}))  # an older since never moves it back
+    db = SessionLocal()
+    try:
+        assert db.get(SyncCheckpoint, me).last_seq == trailer["next_since"]
+    finally:
+        db.close()
+
+
+def test_compaction_bootstrap_and_prune(app_client, monkeypatch):
+    import json
+    from app.config import settings
+
+    monkeypatch.setattr(settings, "SYNC_COMPACT_LAG_S", -5)  # fold everything, even this instant's pushes
+    monkeypatch.setattr(settings, "SYNC_RETAIN_DAYS", -1)  # and prune it
+    branch, pos1, pos2 = _branch(app_client), str(uuid.uuid4()), str(uuid.uuid4())
+    ids = [str(uuid.uuid4()) for _ in range(3)]
+
+    def push(ops):
+        return ok(app_client.post("/sync/push", json={"device_id": pos1, "branch_id": branch, "ops": ops}))
+
+    for v in range(5):  # 5 superseded versions of each entity
+        push([{"entity": "menu_item", "entity_id": i, "op": "UPSERT", "payload": {"v": v}} for i in ids])
+    push([{"entity": "menu_item", "entity_id": ids[2], "op": "DELETE", "payload": None}])
+    wm = ok(app_client.post("/sync/compact"))["watermark"]
+    tail = push([{"entity": "menu_item", "entity_id": ids[0], "op": "UPSERT", "payload": {"v": 99}}])
+
+    lines = [json.loads(x) for x in app_client.get("/sync/bootstrap", params={"branch_id": branch}).text.splitlines()]
+    events, trailer = lines[:-1], lines[-1]
+    assert trailer == {"next_since": tail["last_seq"], "watermark": wm}
+    events = [e for e in events if e["entity_id"] in ids]  # tenant-wide events from other tests reach every branch
+    state = {}
+    for e in events:
+        if e["op"] == "DELETE":
+            state.pop(e["entity_id"], None)
+        else:
+            state[e["entity_id"]] = json.loads(e["payload"])["v"]
+    assert state == {ids[0]: 99, ids[1]: 4}
+    assert len(events) == 3  # 2 snapshot rows + 1 tail event, not 17
+
+    # devices from other tests went quiet long ago
+    from datetime import datetime, timedelta, timezone
+    from app.db import SessionLocal
+    from app.models.core import SyncCheckpoint
+    db = SessionLocal()
+    db.query(SyncCheckpoint).update({"updated_at": datetime.now(timezone.utc) - timedelta(days=settings.SYNC_DEVICE_STALE_DAYS + 1)})
+    db.commit()
+    db.close()
+
+    # pos2 has only acknowledged up to the first push: nothing past it may go
+    ok(app_client.get("/sync/pull", params={"since": wm - 10, "device_id": pos2}))
+    assert ok(app_client.post("/sync/prune"))["pruned_through"] <= wm - 10
+    ok(app_client.get("/sync/pull", params={"since": wm, "device_id": pos2}))
+    assert ok(app_client.post("/sync/prune"))["pruned_through"] == wm
+    r = app_client.get("/sync/pull", params={"since": wm - 1})
+    assert r.status_code == 410
+    ok(app_client.get("/sync/pull", params={"since": wm}))
+
+
+def test_long_poll_wakes_on_push(app_client):
+    import threading
+    import time
+
+    branch, other_branch = _branch(app_client), _branch(app_client)
+    me, peer = str(uuid.uuid4()), str(uuid.uuid4())
+    head = ok(app_client.post("/sync/push", json={"device_id": me, "branch_id": branch, "ops": _ops(1)}))["last_seq"]
+
+    # nothing new: returns empty after the wait
+    t0 = time.perf_counter()
+    empty = ok(app_client.get("/sync/pull", params={"since": head, "branch_id": branch, "device_id": me, "wait": 0.3}))
+    assert empty == {"events": [], "next_since": head} and time.perf_counter() - t0 >= 0.3
+
+    def later():
+        time.sleep(0.3)
+        app_client.post("/sync/push", json={"device_id": me, "branch_id": branch, "ops": _ops(1)})  # own: no wake
+        app_client.post("/sync/push", json={"device_id": peer, "branch_id": other_branch, "ops": _ops(1)})  # other branch
+        time.sleep(0.3)
+        app_client.post("/sync/push", json={"device_id": peer, "branch_id": branch, "ops": _ops(2)})
+
+    threading.Thread(target=later).start()
+    t0 = time.perf_counter()
+    page = ok(app_client.get("/sync/pull", params={"since": head, "branch_id": branch, "device_id": me, "wait": 10}))
+    elapsed = time.perf_counter() - t0
+    assert [e["device_id"] for e in page["events"]] == [peer, peer]
+    assert 0.5 < elapsed < 5
+
+
+def test_scope_comes_from_the_signed_in_user(app_client):
+    from app.db import SessionLocal
+    from app.models.core import SyncEvent, Tenant
+
+    c, tenant = app_client, app_client.boot["tenant_id"]
+    db = SessionLocal()
+    other = Tenant(name="Other")
+    db.add(other)
+    db.commit()
+    other_id = other.id
+    db.close()
+    foreign_branch = _branch(c, other_id)
+
+    # another tenant's id, or a branch of it, is refused rather than trusted
+    assert c.post("/sync/push", json={"device_id": "d", "tenant_id": other_id, "ops": _ops(1)}).status_code == 403
+    assert c.post("/sync/push", json={"device_id": "d", "branch_id": foreign_branch, "ops": _ops(1)}).status_code == 403
+    assert c.get("/sync/pull", params={"tenant_id": other_id}).status_code == 403
+    assert c.get("/sync/pull", params={"branch_id": foreign_branch}).status_code == 403
+    assert c.get("/sync/bootstrap", params={"branch_id": foreign_branch}).status_code == 403
+
+    # a push without tenant_id is stamped with the user's; without one, a pull still only sees it
+    out = ok(c.post("/sync/push", json={"device_id": str(uuid.uuid4()), "ops": _ops(2)}))
+    db = SessionLocal()
+    try:
+        assert {e.tenant_id for e in db.query(SyncEvent).filter(SyncEvent.seq >= out["first_seq"])} == {tenant}
+        db.add(SyncEvent(entity="menu_item", entity_id="x", op="UPSERT", payload="{}", tenant_id=other_id))
+        db.add(SyncEvent(entity="menu_item", entity_id="y", op="UPSERT", payload="{}"))  # pushed before scoping
+        db.commit()
+    finally:
+        db.close()
+    pulled = ok(c.get("/sync/pull", params={"since": out["first_seq"] - 1}))["events"]
+    assert [e["seq"] for e in pulled] == [out["first_seq"], out["last_seq"]]
+
+
+def test_prune_keeps_recent_events_for_clients_without_a_checkpoint(app_client, monkeypatch):
+    from app.config import settings
+
+    monkeypatch.setattr(settings, "SYNC_COMPACT_LAG_S", -5)
+    monkeypatch.setattr(settings, "SYNC_DEVICE_STALE_DAYS", -1)  # no device holds pruning back
+    out = ok(app_client.post("/sync/push", json={"device_id": str(uuid.uuid4()), "ops": _ops(3)}))
+    assert ok(app_client.post("/sync/compact"))["watermark"] >= out["last_seq"]
+
+    # a POS pulling without device_id: only the age floor protects it
+    assert ok(app_client.post("/sync/prune"))["pruned_through"] < out["first_seq"]
+    assert len(ok(app_client.get("/sync/pull", params={"since": out["first_seq"] - 1}))["events"]) >= 3
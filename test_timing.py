@@ -0,0 +1,36 @@
+# test_timing.py
+# Request id / Server-Timing middleware and the per-request timing record.
+import re
+
+
+def test_server_timing_counts_sql_and_reports_route_template(app_client):
+    from app.services import timing
+
+    seen = []
+    timing.on_request_end(seen.append)
+    try:
+        r = app_client.get("/kot/stations/no-such-station/tickets", headers={"X-Request-ID": "req-123"})
+    finally:
+        timing._listeners.remove(seen.append)
+
+    assert r.status_code == 200
+    assert r.headers["X-Request-ID"] == "req-123"
+    m = re.fullmatch(r'app;dur=[\d.]+, db;dur=[\d.]+;desc="(\d+) queries"', r.headers["Server-Timing"])
+    assert m and int(m.group(1)) >= 2  # last event id + open tickets (sync endpoint: runs in the threadpool)
+
+    [t] = [t for t in seen if t.request_id == "req-123"]
+    assert (t.method, t.route, t.status) == ("GET", "/kot/stations/{station_id}/tickets", 200)
+    assert t.db_queries == int(m.group(1)) and t.duration >= t.db_time
+
+
+def test_unmatched_path_and_generated_request_id(app_client):
+    from app.services import timing
+
+    seen = []
+    timing.on_request_end(seen.append)
+    try:
+        r = app_client.get("/no/such/route")
+    finally:
+        timing._listeners.remove(seen.append)
+    assert r.status_code == 404 and len(r.headers["X-Request-ID"]) == 36
+    assert [(t.route, t.status) for t in seen] == [(timing.UNMATCHED, 404)]